@@ -0,0 +1,91 @@
+"""Measures the peak memory of large synthesis runs
+
+Each scenario runs in a fresh interpreter, so that its peak RSS isn't inflated
+by the previous ones: a fan-out over a manifest of synthetic tenants, and the
+definition of many application stacks kept in memory at once. The peak of the
+Python allocations is traced with tracemalloc in a separate run, as tracing
+itself inflates the RSS. Results are printed as JSON, or written to --output.
+With --baseline, the run fails when a peak grew over the baseline by more than
+--threshold.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from reporting import add_arguments, write_report
+
+SRC_CORE = Path(__file__).resolve().parent.parent / "src" / "troposphere_playground"
+
+SCENARIO_CODE = {
+    "fan_out": """
+import csv, tempfile
+from pathlib import Path
+from fanout import fan_out
+workdir = Path(tempfile.mkdtemp())
+manifest = workdir / "tenants.csv"
+with manifest.open("w", newline="") as manifest_file:
+    writer = csv.writer(manifest_file)
+    writer.writerow(["tenant"])
+    writer.writerows([f"tenant{index}"] for index in range(COUNT))
+os.chdir(workdir)
+summary = fan_out(manifest, jobs=1)
+assert not summary.failures, summary.failures
+""",
+    "app_stacks": """
+from stacks.application_stack import AppStack
+stacks = [
+    AppStack(f"tenant{index}-app", "app", tag_prefix=f"tenant{index}") for index in range(COUNT)
+]
+for stack in stacks:
+    stack.stack_definition()
+""",
+}
+
+RUNNER = """
+import json, os, resource, sys, tracemalloc
+# Absolute, the stack modules are imported lazily, after the fan-out changes directory
+sys.path[0] = os.getcwd()
+if TRACE:
+    tracemalloc.start()
+{code}
+result = {{"peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}}
+if TRACE:
+    result["traced_peak_kb"] = tracemalloc.get_traced_memory()[1] // 1024
+sys.stdout.write(json.dumps(result))
+"""
+
+
+def run_scenario(name: str, count: int, trace: bool) -> dict:
+    code = f"COUNT = {count}\nTRACE = {trace}\n" + RUNNER.format(code=SCENARIO_CODE[name])
+    process = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=SRC_CORE,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(process.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tenants", type=int, default=200, help="fan-out tenants")
+    parser.add_argument("--stacks", type=int, default=500, help="app stacks kept in memory")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    results = {}
+    for name, count in (("fan_out", args.tenants), ("app_stacks", args.stacks)):
+        results[f"{name}_{count}"] = {
+            **run_scenario(name, count, trace=False),
+            "traced_peak_kb": run_scenario(name, count, trace=True)["traced_peak_kb"],
+        }
+
+    write_report(args, "memory", results, metrics=("peak_rss_kb", "traced_peak_kb"))
+
+
+if __name__ == "__main__":
+    main()
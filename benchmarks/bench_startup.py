@@ -0,0 +1,73 @@
+"""Measures the startup cost of the CLI for each stack selection
+
+Each scenario runs in a fresh interpreter under `-X importtime`. The import time
+is the sum of the self times reported by the interpreter, the wall time covers
+the whole process. Results are printed as JSON, or written to --output. With
+--baseline, the run fails when a scenario's wall or import time grew over the
+baseline by more than --threshold.
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from reporting import add_arguments, write_report
+
+SRC_CORE = Path(__file__).resolve().parent.parent / "src" / "troposphere_playground"
+
+SCENARIOS = {
+    "cli": None,
+    "vpc": ["vpc"],
+    "ecr": ["ecr"],
+    "app": ["app"],
+    "all": ["vpc", "ecr", "app"],
+}
+
+
+def run_scenario(stacks) -> dict:
+    """Imports the entry point and builds the selected stacks in a fresh interpreter"""
+    code = "import main"
+    if stacks is not None:
+        code += f"; main.build_stacks({stacks!r})"
+
+    start = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=SRC_CORE,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    wall_time = time.perf_counter() - start
+
+    modules = 0
+    import_us = 0
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        import_us += int(line.split("|")[0].split(":")[1])
+        modules += 1
+    return {"wall_s": wall_time, "import_s": import_us / 1e6, "modules": modules}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5, help="runs per scenario")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    results = {}
+    for name, stacks in SCENARIOS.items():
+        runs = [run_scenario(stacks) for _ in range(args.repeat)]
+        results[name] = {
+            "wall_s": min(run["wall_s"] for run in runs),
+            "import_s": min(run["import_s"] for run in runs),
+            "modules": runs[0]["modules"],
+        }
+    write_report(args, "startup", results, metrics=("wall_s", "import_s"))
+
+
+if __name__ == "__main__":
+    main()
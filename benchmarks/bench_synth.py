@@ -0,0 +1,175 @@
+"""Benchmarks the synthesis and serialization hot paths
+
+Every benchmark runs on freshly built stacks, since a stack's template can only
+be synthesized once. Results are printed as JSON, or written to --output. With
+--baseline, the run fails when a benchmark got slower than the baseline by more
+than --threshold, see `reporting.py`.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from functools import partial
+from pathlib import Path
+from typing import Callable, Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src" / "troposphere_playground"))
+
+from troposphere import Output, Ref, Template  # noqa: E402
+from troposphere.ec2 import SecurityGroup, SecurityGroupRule  # noqa: E402
+
+from cidr import allocate_many  # noqa: E402
+from constructs.fragments import fragment_cache  # noqa: E402
+from serialization import OUTPUT_FORMATS, render, write_yaml  # noqa: E402
+from stacks.application_stack import AppStack  # noqa: E402
+from stacks.ecr_stack import EcrStack  # noqa: E402
+from stacks.vpc_stack import VpcStack  # noqa: E402
+from utils import export_cf_template_stream, export_cf_template_to_file, tag  # noqa: E402
+
+from reporting import add_arguments, write_report  # noqa: E402
+
+SYNTHETIC_SIZES = (10, 100, 1000)
+# VPCs allocated at once, with 3 public and 3 private subnets each
+ALLOCATED_VPCS = 10000
+
+
+def synthetic_template(resources: int) -> Template:
+    """Builds a template with the given number of tagged security groups
+
+    Resources are added to the template directly, as the larger sizes go over
+    the CloudFormation resource limit enforced by `Template.add_resource`.
+    """
+    template = Template()
+    template.set_version("2010-09-09")
+    template.set_description(f"Synthetic stack with {resources} resources")
+    for index in range(resources):
+        group = SecurityGroup(
+            f"SecurityGroup{index}",
+            GroupDescription=f"Synthetic security group {index}",
+            VpcId="vpc-12345678",
+            SecurityGroupIngress=[
+                SecurityGroupRule(
+                    IpProtocol="tcp", FromPort="443", ToPort="443", CidrIp="10.0.0.0/8"
+                )
+            ],
+            Tags=tag(f"synthetic-{index}"),
+        )
+        template.resources[group.title] = group
+        if index % 10 == 0:
+            template.add_output(Output(f"SecurityGroup{index}Id", Value=Ref(group)))
+    return template
+
+
+def measure(setup: Callable, run: Callable, repeat: int) -> Dict[str, float]:
+    """Times `run(setup())`, excluding the setup, over `repeat` runs
+
+    Runs rendering a string also report their throughput over the best time.
+    """
+    timings = []
+    for _ in range(repeat):
+        argument = setup()
+        start = time.perf_counter()
+        output = run(argument)
+        timings.append(time.perf_counter() - start)
+    result = {
+        "min_s": min(timings),
+        "median_s": statistics.median(timings),
+        "repeat": repeat,
+    }
+    if isinstance(output, str):
+        result["output_bytes"] = len(output.encode())
+        result["throughput_mb_s"] = result["output_bytes"] / min(timings) / 1e6
+    return result
+
+
+def benchmarks() -> Dict[str, tuple]:
+    """The benchmarks, as (setup, run) pairs keyed by name"""
+    cases = {
+        "vpc_stack.synth": (lambda: VpcStack("bench-vpc", "vpc"), lambda s: s.synth()),
+        "app_stack.synth": (lambda: AppStack("bench-app", "app"), lambda s: s.synth()),
+        "ecr_stack.synth": (lambda: EcrStack("bench-ecr", "ecr"), lambda s: s.synth()),
+    }
+
+    def tenant_app_stack(reuse_fragments: bool) -> AppStack:
+        if not reuse_fragments:
+            fragment_cache.clear()
+        return AppStack("bench-app", "app", tag_prefix=f"t{time.perf_counter_ns()}")
+
+    cases["app_stack.definition"] = (
+        lambda: tenant_app_stack(reuse_fragments=False),
+        lambda s: s.stack_definition(),
+    )
+    cases["app_stack.definition.reused_fragments"] = (
+        lambda: tenant_app_stack(reuse_fragments=True),
+        lambda s: s.stack_definition(),
+    )
+
+    app_template = AppStack("bench-app", "app")
+    app_template.synth()
+    cases["app_template.to_yaml"] = (lambda: app_template.template, Template.to_yaml)
+    cases["app_template.to_json"] = (lambda: app_template.template, Template.to_json)
+    for output_format in OUTPUT_FORMATS:
+        cases[f"app_template.render.{output_format}"] = (
+            lambda: app_template.template,
+            partial(render, output_format=output_format),
+        )
+
+    app_content = app_template.template.to_yaml()
+    cases["export_cf_template_to_file.changed"] = (
+        lambda: app_content + f"# {time.perf_counter_ns()}\n",
+        lambda content: export_cf_template_to_file("bench-app.yaml", content),
+    )
+    cases["export_cf_template_to_file.unchanged"] = (
+        lambda: app_content,
+        lambda content: export_cf_template_to_file("bench-app.yaml", content),
+    )
+
+    for size in SYNTHETIC_SIZES:
+        template = synthetic_template(size)
+        cases[f"synthetic_{size}.build"] = (lambda size=size: size, synthetic_template)
+        cases[f"synthetic_{size}.to_yaml"] = (lambda t=template: t, Template.to_yaml)
+        cases[f"synthetic_{size}.to_json"] = (lambda t=template: t, Template.to_json)
+        for output_format in OUTPUT_FORMATS:
+            cases[f"synthetic_{size}.render.{output_format}"] = (
+                lambda t=template: t,
+                partial(render, output_format=output_format),
+            )
+        cases[f"synthetic_{size}.export_stream"] = (
+            lambda t=template: t,
+            lambda t: export_cf_template_stream("bench-synthetic.yaml", partial(write_yaml, t)),
+        )
+
+    vpc_cidrs = [f"10.{index >> 8 & 255}.{index & 255}.0/24" for index in range(ALLOCATED_VPCS)]
+    cases[f"cidr.allocate_many_{ALLOCATED_VPCS}"] = (
+        lambda: vpc_cidrs,
+        lambda cidrs: allocate_many(cidrs, 3, 3),
+    )
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5, help="runs per benchmark")
+    parser.add_argument("--filter", default="", help="only run benchmarks containing this")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            for name, (setup, run) in benchmarks().items():
+                if args.filter in name:
+                    results[name] = measure(setup, run, args.repeat)
+        finally:
+            os.chdir(cwd)
+
+    write_report(args, "synth", results, metrics=("min_s",))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Writes the benchmark reports and compares them against a saved baseline
+
+Every benchmark script takes the same --output, --baseline and --threshold
+options. A run fails when any of the compared metrics of a benchmark grew over
+its baseline value by more than the threshold.
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adds the --output, --baseline and --threshold options"""
+    parser.add_argument("--output", type=Path, help="write the JSON results to this file")
+    parser.add_argument("--baseline", type=Path, help="JSON results to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="allowed growth ratio over the baseline (default: 0.2, i.e. 20%%)",
+    )
+
+
+def compare(
+    results: Dict[str, dict],
+    baseline: Dict[str, dict],
+    threshold: float,
+    metrics: Sequence[str],
+) -> List[str]:
+    """Returns the benchmark metrics over the baseline by more than the threshold
+
+    The ratio of every compared metric is recorded in its result, as
+    `<metric>_baseline_ratio`.
+    """
+    regressions = []
+    for name, result in results.items():
+        for metric in metrics:
+            if not baseline.get(name, {}).get(metric):
+                continue
+            ratio = result[metric] / baseline[name][metric]
+            result[f"{metric}_baseline_ratio"] = ratio
+            if ratio > 1 + threshold:
+                regressions.append(f"{name}.{metric}")
+    return regressions
+
+
+def write_report(
+    args: argparse.Namespace,
+    benchmark: str,
+    results: Dict[str, dict],
+    metrics: Sequence[str],
+    **details: Any,
+) -> None:
+    """Compares the results against the baseline, then writes the report
+
+    Exits with status 1 after writing the report when there are regressions.
+    """
+    regressions = []
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())["results"]
+        regressions = compare(results, baseline, args.threshold, metrics)
+
+    report = {
+        "benchmark": benchmark,
+        "python": sys.version.split()[0],
+        **details,
+        "threshold": args.threshold,
+        "regressions": regressions,
+        "results": results,
+    }
+    serialized = json.dumps(report, indent=2) + "\n"
+    if args.output:
+        args.output.write_text(serialized)
+    else:
+        sys.stdout.write(serialized)
+
+    if regressions:
+        sys.stderr.write(f"Regressions over {args.threshold:.0%}: {', '.join(regressions)}\n")
+        sys.exit(1)
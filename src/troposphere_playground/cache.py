@@ -0,0 +1,197 @@
+"""Content-addressed on-disk cache of synthesized templates
+"""
+
+import ast
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional, Set
+
+import constants
+from constants import CACHE_MAX_BYTES, TEMPLATE_CACHE_FOLDER
+from utils import write_file_atomically
+
+PACKAGE_DIR = Path(__file__).resolve().parent
+# The distributions the templates are rendered with, awacs isn't pinned
+SYNTHESIS_DEPENDENCIES = ("troposphere", "awacs", "cfn-flip", "PyYAML")
+
+
+def package_modules(package_dir: Path = PACKAGE_DIR) -> Dict[str, Path]:
+    """Maps the name of every module of the package to its source file"""
+    modules = {}
+    for path in sorted(package_dir.rglob("*.py")):
+        parts = list(path.relative_to(package_dir).with_suffix("").parts)
+        if parts[-1] == "__init__":
+            parts.pop()
+        if parts:
+            modules[".".join(parts)] = path
+    return modules
+
+
+def module_imports(path: Path, modules: Dict[str, Path]) -> Set[str]:
+    """Returns the package modules a source file imports, inside functions too"""
+    imports = set()
+    for node in ast.walk(ast.parse(path.read_text(), filename=str(path))):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names = [node.module] + [f"{node.module}.{alias.name}" for alias in node.names]
+        else:
+            continue
+        imports.update(name for name in names if name in modules)
+    return imports
+
+
+@lru_cache(maxsize=None)
+def module_digest(module_name: str) -> str:
+    """Hashes the source of a module and of every package module it imports
+
+    Imports are read from the sources rather than from the module globals, so
+    the modules imported inside functions are hashed too. Digests are kept
+    for the life of the process, `clear_module_digests` drops them once
+    modules are reloaded.
+
+    Args:
+        module_name (str): the name of an imported module of this package
+
+    Returns:
+        str: the hex digest of the sources
+    """
+    modules = package_modules()
+    modules.setdefault(module_name, Path(sys.modules[module_name].__file__))
+    seen: Set[str] = set()
+    pending = [module_name]
+    while pending:
+        name = pending.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        pending.extend(module_imports(modules[name], modules) - seen)
+
+    digest = hashlib.sha256()
+    for name in sorted(seen):
+        digest.update(name.encode())
+        digest.update(modules[name].read_bytes())
+    return digest.hexdigest()
+
+
+def clear_module_digests() -> None:
+    """Forgets the source digests, for modules reloaded with a new source"""
+    module_digest.cache_clear()
+
+
+def constants_values() -> Dict[str, object]:
+    return {
+        name: value for name, value in vars(constants).items() if name.isupper()
+    }
+
+
+@lru_cache(maxsize=None)
+def dependency_versions() -> Dict[str, str]:
+    """The installed versions of SYNTHESIS_DEPENDENCIES, read without importing them"""
+    # importlib.metadata alone costs more to import than most CLI runs need
+    from importlib.metadata import version
+
+    return {name: version(name) for name in SYNTHESIS_DEPENDENCIES}
+
+
+class SynthesisCache:
+    """Caches synthesized templates keyed on everything their content depends on
+
+    Entries are plain files named after their key, with the extension of their
+    template format. Reading an entry refreshes its
+    modification time, so the oldest entries are the least recently used ones and
+    get evicted first once the folder grows over `max_bytes`. Storing an entry
+    doesn't evict, `evict` lists the folder and is called once at the end of a
+    run instead, however many templates the run stored.
+    """
+
+    def __init__(self, folder: str = TEMPLATE_CACHE_FOLDER, max_bytes: int = CACHE_MAX_BYTES):
+        """The constructor
+
+        Args:
+            folder (str): the cache folder, relative to the working directory
+            max_bytes (int): the maximum total size of the cached entries
+        """
+        self.folder = Path(folder)
+        self.max_bytes = max_bytes
+
+    def key(self, stack) -> str:
+        """Computes the cache key of a stack
+
+        Args:
+            stack (BaseStack): the stack, before synthesis
+
+        Returns:
+            str: the hex digest identifying the stack's synthesized content
+        """
+        stack_class = type(stack)
+        inputs = {
+            "class": f"{stack_class.__module__}.{stack_class.__qualname__}",
+            "parameters": stack.cache_parameters(),
+            "constants": constants_values(),
+            "sources": module_digest(stack_class.__module__),
+            "dependencies": dependency_versions(),
+        }
+        serialized = json.dumps(inputs, sort_keys=True, default=repr)
+        return hashlib.sha256(serialized.encode()).hexdigest()
+
+    def _entry(self, key: str, suffix: str) -> Path:
+        return self.folder / f"{key}{suffix}"
+
+    def get(self, key: str, suffix: str) -> Optional[str]:
+        """Returns the cached template content, or None on a cache miss
+
+        Args:
+            key (str): the cache key of the stack
+            suffix (str): the extension of the template format, e.g. ".json"
+        """
+        entry = self._entry(key, suffix)
+        try:
+            content = entry.read_text()
+            os.utime(entry)
+        except FileNotFoundError:
+            return None
+        return content
+
+    def put(self, key: str, content: str, suffix: str) -> None:
+        """Stores the template content"""
+        self.folder.mkdir(parents=True, exist_ok=True)
+        write_file_atomically(self._entry(key, suffix), content.encode())
+
+    def put_file(self, key: str, path: Path) -> None:
+        """Stores the content of a template file"""
+        self.folder.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=self.folder, prefix=f".{key}.")
+        os.close(fd)
+        shutil.copyfile(path, tmp_name)
+        os.replace(tmp_name, self._entry(key, Path(path).suffix))
+
+    def evict(self) -> None:
+        """Removes the least recently used entries until the size bound is met"""
+        if not self.folder.is_dir():
+            return
+        entries = []
+        for entry in self.folder.iterdir():
+            # Skips the temporary files of entries being stored
+            if entry.name.startswith("."):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries, key=lambda item: item[0]):
+            if total <= self.max_bytes:
+                break
+            logging.debug(f"Evicting {entry.name} from the synthesis cache")
+            entry.unlink(missing_ok=True)
+            total -= size
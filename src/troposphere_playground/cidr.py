@@ -0,0 +1,178 @@
+"""Carves VPC CIDR blocks into per-AZ public and private subnets
+
+Addresses are handled as plain integers rather than `ipaddress` objects: a
+subnet is a (start, prefix length) pair, allocating subnets is an arithmetic
+progression over the VPC range, and overlap checks are a single sort and sweep
+over (start, end) ranges. This keeps allocating tens of thousands of subnets
+across many VPCs in the milliseconds.
+
+The lower half of a VPC holds the public subnets and the upper half the
+private ones, so either kind can grow without renumbering the other.
+"""
+
+from dataclasses import dataclass
+from typing import Iterable, List, Sequence, Tuple
+
+from constants import SUBNET_PREFIX_LENGTH
+
+
+@dataclass
+class SubnetPlan:
+    """The subnet CIDR blocks of a VPC, one per AZ"""
+
+    vpc_cidr: str
+    public: List[str]
+    private: List[str]
+
+
+def parse_cidr(cidr: str) -> Tuple[int, int]:
+    """Parses an IPv4 CIDR block into its network address and prefix length
+
+    Raises:
+        ValueError: when the CIDR block is malformed or has host bits set
+    """
+    try:
+        address, prefix = cidr.split("/")
+        octets = [int(octet) for octet in address.split(".")]
+        prefix_length = int(prefix)
+    except ValueError:
+        raise ValueError(f"Invalid CIDR block '{cidr}'")
+    if len(octets) != 4 or not all(0 <= octet <= 255 for octet in octets):
+        raise ValueError(f"Invalid CIDR block '{cidr}'")
+    if not 0 <= prefix_length <= 32:
+        raise ValueError(f"Invalid CIDR block '{cidr}'")
+
+    network = octets[0] << 24 | octets[1] << 16 | octets[2] << 8 | octets[3]
+    if network & ((1 << (32 - prefix_length)) - 1):
+        raise ValueError(f"CIDR block '{cidr}' has host bits set")
+    return network, prefix_length
+
+
+_OCTETS = [str(octet) for octet in range(256)]
+
+
+def format_cidr(network: int, prefix_length: int) -> str:
+    return (
+        f"{_OCTETS[network >> 24]}.{_OCTETS[network >> 16 & 255]}."
+        f"{_OCTETS[network >> 8 & 255]}.{_OCTETS[network & 255]}/{prefix_length}"
+    )
+
+
+def _subnet_ranges(
+    vpc_cidr: str, public_count: int, private_count: int, prefix_length: int
+) -> Tuple[range, range]:
+    """The network addresses of the public and private subnets of a VPC"""
+    network, vpc_prefix_length = parse_cidr(vpc_cidr)
+    if prefix_length <= vpc_prefix_length:
+        raise ValueError(f"/{prefix_length} subnets don't fit in the halves of {vpc_cidr}")
+
+    half = 1 << (31 - vpc_prefix_length)
+    size = 1 << (32 - prefix_length)
+    capacity = half // size
+    if max(public_count, private_count) > capacity:
+        raise ValueError(
+            f"{vpc_cidr} only fits {capacity} public and {capacity} private "
+            f"/{prefix_length} subnets"
+        )
+    return (
+        range(network, network + public_count * size, size),
+        range(network + half, network + half + private_count * size, size),
+    )
+
+
+def _plan(vpc_cidr: str, public: range, private: range, prefix_length: int) -> SubnetPlan:
+    return SubnetPlan(
+        vpc_cidr=vpc_cidr,
+        public=[format_cidr(network, prefix_length) for network in public],
+        private=[format_cidr(network, prefix_length) for network in private],
+    )
+
+
+def allocate_subnets(
+    vpc_cidr: str,
+    public_count: int,
+    private_count: int,
+    prefix_length: int = SUBNET_PREFIX_LENGTH,
+) -> SubnetPlan:
+    """Allocates non-overlapping public and private subnets in a VPC
+
+    Args:
+        vpc_cidr (str): the VPC CIDR block
+        public_count (int): the number of public subnets, one per AZ
+        private_count (int): the number of private subnets, one per AZ
+        prefix_length (int): the prefix length of every subnet
+
+    Raises:
+        ValueError: when the subnets don't fit in their half of the VPC
+
+    Returns:
+        SubnetPlan: the subnet CIDR blocks
+    """
+    public, private = _subnet_ranges(vpc_cidr, public_count, private_count, prefix_length)
+    return _plan(vpc_cidr, public, private, prefix_length)
+
+
+def find_overlaps(cidrs: Iterable[str]) -> List[Tuple[str, str]]:
+    """Finds the overlapping CIDR blocks with a single sort and sweep
+
+    Args:
+        cidrs (Iterable[str]): the CIDR blocks
+
+    Returns:
+        List[Tuple[str, str]]: each overlapping block, paired with the block it
+            overlaps that starts before it
+    """
+    ranges = []
+    for cidr in cidrs:
+        network, prefix_length = parse_cidr(cidr)
+        ranges.append((network, network + (1 << (32 - prefix_length)), cidr))
+    ranges.sort()
+
+    overlaps = []
+    widest_end, widest = -1, None
+    for start, end, cidr in ranges:
+        if start < widest_end:
+            overlaps.append((widest, cidr))
+        if end > widest_end:
+            widest_end, widest = end, cidr
+    return overlaps
+
+
+def allocate_many(
+    vpc_cidrs: Sequence[str],
+    public_count: int,
+    private_count: int,
+    prefix_length: int = SUBNET_PREFIX_LENGTH,
+) -> List[SubnetPlan]:
+    """Allocates the subnets of many VPCs and checks the VPCs for overlaps in bulk
+
+    Args:
+        vpc_cidrs (Sequence[str]): the VPC CIDR blocks
+        public_count (int): the number of public subnets per VPC
+        private_count (int): the number of private subnets per VPC
+        prefix_length (int): the prefix length of every subnet
+
+    Raises:
+        ValueError: when subnets don't fit in their VPC, or VPCs overlap
+
+    Returns:
+        List[SubnetPlan]: the subnet plan of each VPC, in order
+    """
+    allocations = [
+        _subnet_ranges(vpc_cidr, public_count, private_count, prefix_length)
+        for vpc_cidr in vpc_cidrs
+    ]
+
+    # The subnets of a VPC never overlap by construction, the VPCs themselves
+    # may, which would keep them from being peered or routed to each other
+    overlaps = find_overlaps(vpc_cidrs)
+    if overlaps:
+        raise ValueError(
+            "Overlapping VPC CIDR blocks: "
+            + ", ".join(f"{first} and {second}" for first, second in overlaps)
+        )
+
+    return [
+        _plan(vpc_cidr, public, private, prefix_length)
+        for vpc_cidr, (public, private) in zip(vpc_cidrs, allocations)
+    ]
@@ -4,14 +4,101 @@ TAG_PREFIX = "tropo"
 
 # Stack data
 EXPORT_FOLDER = "dist"
+# Template format: "yaml", "json" or "json-min" (JSON without whitespace)
+OUTPUT_FORMAT = "yaml"
+# Write buffer size when streaming templates to disk
+STREAM_BUFFER_SIZE = 64 * 1024
 
 # VPC
 VPC_CIDR = "10.0.0.0/24"
-# Number of AZs per public subnet (1-3)
-AZ_PUBLIC_NUMBER = 1
-# Number of AZs per private subnet (1-3)
+# Prefix length of the public and private subnets
+SUBNET_PREFIX_LENGTH = 28
+# AZ suffixes, in the order subnets are spread over them
+AZ_LETTERS = "abc"
+# Number of AZs per public subnet (2-3, the load balancer needs two)
+AZ_PUBLIC_NUMBER = 2
+# Number of AZs per private subnet (1-3), at most AZ_PUBLIC_NUMBER as each
+# private subnet egresses through the NAT gateway of its AZ's public subnet.
+# Every private AZ adds a NAT gateway, billed hourly and per GB processed
 AZ_PRIVATE_NUMBER = 1
+# Services the private subnets reach through interface endpoints rather than
+# the NAT gateways, S3 always has a gateway endpoint
+VPC_INTERFACE_ENDPOINTS = ("ecr.api", "ecr.dkr", "logs")
+
+# ALB performance profile
+# Health checks: a new task gets traffic after ALB_HEALTHY_THRESHOLD checks,
+# ALB_HEALTH_CHECK_INTERVAL seconds apart
+ALB_HEALTH_CHECK_PATH = "/healthcheck"
+ALB_HEALTH_CHECK_INTERVAL = 10
+ALB_HEALTH_CHECK_TIMEOUT = 5
+ALB_HEALTHY_THRESHOLD = 2
+ALB_UNHEALTHY_THRESHOLD = 2
+# Seconds in-flight requests get to complete when a task is scaled in
+ALB_DEREGISTRATION_DELAY = 30
+# Seconds a new task's share of requests ramps up over, 0 disables slow start
+ALB_SLOW_START = 0
+# "round_robin" or "least_outstanding_requests", which doesn't support slow start
+ALB_ALGORITHM = "least_outstanding_requests"
+ALB_HTTP2 = True
+ALB_IDLE_TIMEOUT = 60
+# The longest idle timeout Elastic Load Balancing allows
+ALB_MAX_IDLE_TIMEOUT = 4000
+# Drops the requests with invalid header fields instead of routing them
+ALB_DROP_INVALID_HEADERS = True
 
 # FARGATE
 ECR_REPO_NAME = "tropo-repository"
 ECR_IMAGE_VERSION = "latest"
+# The image build context is the Dockerfile's folder, only these paths are copied
+DOCKERFILE = "Dockerfile"
+IMAGE_CONTEXT_PATHS = ("artifacts", "httpd")
+# The httpd config generated for the task size, relative to the Dockerfile
+HTTPD_CONFIG = "httpd/tuning.conf"
+# Event MPM sizing: threads per process, and the memory (MiB) reserved for the
+# container and taken per process and per thread, bounding the process count
+# along with the processes per vCPU
+HTTPD_THREADS_PER_CHILD = 25
+HTTPD_RESERVED_MEMORY = 128
+HTTPD_PROCESS_MEMORY = 16
+HTTPD_THREAD_MEMORY = 1
+HTTPD_PROCESSES_PER_VCPU = 4
+# Seconds static assets are cached by browsers
+HTTPD_ASSET_MAX_AGE = 365 * 24 * 3600
+# Concurrent image pushes, one per repository
+IMAGE_PUSH_WORKERS = 4
+# Task size, validated against the Fargate CPU and memory pairings
+FARGATE_CPU = "256"
+FARGATE_MEMORY = "512"
+# Container logs: days kept in CloudWatch, and size of the buffer the
+# non-blocking awslogs driver holds logs in while CloudWatch is slow, logs
+# over it are dropped rather than blocking the container's writes
+LOG_RETENTION_DAYS = 14
+LOG_MAX_BUFFER_SIZE = "25m"
+
+# Service auto scaling, the service starts with the minimum count of tasks
+SCALING_MIN_CAPACITY = 1
+SCALING_MAX_CAPACITY = 4
+# Target tracking values: average CPU and memory utilization (%), and ALB
+# requests per task per minute
+SCALING_CPU_TARGET = 60.0
+SCALING_MEMORY_TARGET = 70.0
+SCALING_REQUESTS_TARGET = 500.0
+# Seconds between scaling activities, scaling in more cautiously than out
+SCALE_IN_COOLDOWN = 300
+SCALE_OUT_COOLDOWN = 60
+
+# Construct shapes whose fragments are kept per process
+FRAGMENT_CACHE_SIZE = 256
+
+# Synthesis cache
+CACHE_FOLDER = ".synth-cache"
+# Synthesized templates, in the cache folder
+TEMPLATE_CACHE_FOLDER = f"{CACHE_FOLDER}/templates"
+# Upper bound of the cache folder size, least recently used entries are evicted
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Digests of the pushed images, in the cache folder
+IMAGE_CACHE_FILE = "images.json"
+
+# Publishing
+# Concurrent template uploads, each over its own keep-alive connection
+PUBLISH_WORKERS = 8
@@ -1,24 +1,163 @@
+import re
 from dataclasses import dataclass
+from typing import List
 from troposphere import Join, Ref, Template, ImportValue, GetAtt, Output
 from troposphere.ec2 import SecurityGroupRule, SecurityGroup
 import troposphere.elasticloadbalancingv2 as elb
 
 from constructs.base_construct import BaseConstruct, BaseConstructProps
+from constants import (
+    ALB_ALGORITHM,
+    ALB_DEREGISTRATION_DELAY,
+    ALB_DROP_INVALID_HEADERS,
+    ALB_HEALTH_CHECK_INTERVAL,
+    ALB_HEALTH_CHECK_PATH,
+    ALB_HEALTH_CHECK_TIMEOUT,
+    ALB_HEALTHY_THRESHOLD,
+    ALB_HTTP2,
+    ALB_IDLE_TIMEOUT,
+    ALB_MAX_IDLE_TIMEOUT,
+    ALB_SLOW_START,
+    ALB_UNHEALTHY_THRESHOLD,
+    TAG_PREFIX,
+)
 from utils import tag
 
+ALB_ALGORITHMS = ("round_robin", "least_outstanding_requests")
+# Load balancer and target group names are unique per account and region
+ELB_NAME_PATTERN = re.compile(r"^(?!-)(?!internal-)[A-Za-z0-9-]{1,32}(?<!-)$")
+# The names of the TAG_PREFIX stacks, kept as changing a name replaces the resource
+DEFAULT_ELB_NAMES = {"alb": "ApplicationLB", "fargate": "FargateTarget"}
 
-@dataclass
+
+def elb_name(tag_prefix: str, suffix: str) -> str:
+    """Names a load balancer or target group after the tag prefix, e.g. "acme-alb"
+
+    The TAG_PREFIX stacks keep their DEFAULT_ELB_NAMES.
+
+    Raises:
+        ValueError: when the name isn't up to 32 alphanumerics and hyphens
+    """
+    if tag_prefix == TAG_PREFIX:
+        return DEFAULT_ELB_NAMES[suffix]
+    name = f"{tag_prefix}-{suffix}"
+    if not ELB_NAME_PATTERN.match(name):
+        raise ValueError(
+            f"Invalid load balancer name '{name}', expected up to 32 alphanumerics "
+            "and hyphens, shorten the tag prefix"
+        )
+    return name
+
+
+def validate_elb_names(tag_prefix: str) -> None:
+    """Checks the names of the load balancer and target group of a tag prefix
+
+    Raises:
+        ValueError: when a name isn't up to 32 alphanumerics and hyphens
+    """
+    for suffix in DEFAULT_ELB_NAMES:
+        elb_name(tag_prefix, suffix)
+
+
+@dataclass(frozen=True)
+class AlbProfile:
+    """How the load balancer checks, ramps up, balances and drains the tasks
+
+    The limits are those of Elastic Load Balancing, checked on creation so that
+    invalid profiles fail the synthesis rather than the deployment.
+    """
+
+    health_check_path: str = ALB_HEALTH_CHECK_PATH
+    health_check_interval: int = ALB_HEALTH_CHECK_INTERVAL
+    health_check_timeout: int = ALB_HEALTH_CHECK_TIMEOUT
+    healthy_threshold: int = ALB_HEALTHY_THRESHOLD
+    unhealthy_threshold: int = ALB_UNHEALTHY_THRESHOLD
+    deregistration_delay: int = ALB_DEREGISTRATION_DELAY
+    slow_start: int = ALB_SLOW_START
+    algorithm: str = ALB_ALGORITHM
+    http2: bool = ALB_HTTP2
+    idle_timeout: int = ALB_IDLE_TIMEOUT
+    drop_invalid_headers: bool = ALB_DROP_INVALID_HEADERS
+
+    def __post_init__(self):
+        for name, lowest, highest in (
+            ("health_check_interval", 5, 300),
+            ("health_check_timeout", 2, 120),
+            ("healthy_threshold", 2, 10),
+            ("unhealthy_threshold", 2, 10),
+            ("deregistration_delay", 0, 3600),
+            ("idle_timeout", 1, ALB_MAX_IDLE_TIMEOUT),
+        ):
+            if not lowest <= getattr(self, name) <= highest:
+                raise ValueError(
+                    f"Invalid ALB {name} {getattr(self, name)}, expected {lowest}-{highest}"
+                )
+        if self.health_check_timeout >= self.health_check_interval:
+            raise ValueError(
+                f"ALB health_check_timeout {self.health_check_timeout} must be shorter "
+                f"than the health_check_interval {self.health_check_interval}"
+            )
+        if not self.health_check_path.startswith("/"):
+            raise ValueError(f"Invalid ALB health_check_path '{self.health_check_path}'")
+        if self.slow_start and not 30 <= self.slow_start <= 900:
+            raise ValueError(f"Invalid ALB slow_start {self.slow_start}, expected 0 or 30-900")
+        if self.algorithm not in ALB_ALGORITHMS:
+            raise ValueError(
+                f"Invalid ALB algorithm '{self.algorithm}', expected one of "
+                f"{', '.join(ALB_ALGORITHMS)}"
+            )
+        if self.slow_start and self.algorithm != "round_robin":
+            raise ValueError(f"ALB slow_start requires round_robin, not {self.algorithm}")
+
+    def target_group_attributes(self) -> List[elb.TargetGroupAttribute]:
+        return [
+            elb.TargetGroupAttribute(Key=key, Value=_attribute_value(value))
+            for key, value in (
+                ("deregistration_delay.timeout_seconds", self.deregistration_delay),
+                ("load_balancing.algorithm.type", self.algorithm),
+                ("slow_start.duration_seconds", self.slow_start),
+            )
+        ]
+
+    def load_balancer_attributes(self) -> List[elb.LoadBalancerAttributes]:
+        return [
+            elb.LoadBalancerAttributes(Key=key, Value=_attribute_value(value))
+            for key, value in (
+                ("idle_timeout.timeout_seconds", self.idle_timeout),
+                ("routing.http.drop_invalid_header_fields.enabled", self.drop_invalid_headers),
+                ("routing.http2.enabled", self.http2),
+            )
+        ]
+
+
+def _attribute_value(value) -> str:
+    """Attribute values are strings, booleans in lowercase"""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+@dataclass(frozen=True)
 class AlbConstructProps(BaseConstructProps):
+    __slots__ = ("vpc", "alb_subnets", "profile")
+
     vpc: ImportValue
-    alb_subnet_1: ImportValue
-    alb_subnet_2: ImportValue
+    alb_subnets: List[ImportValue]
+    profile: AlbProfile
+
+    def __post_init__(self):
+        validate_elb_names(self.tag_prefix)
 
 
 class AlbConstruct(BaseConstruct):
+    __slots__ = ("alb_security_group", "alb", "fargate_target_group", "listener")
+    # No fragment parameters: elb_name picks the names after the tag prefix value
+
     def __init__(self, template: Template, props: AlbConstructProps):
         super().__init__(template, props)
 
     def construct_definition(self):
+        profile = self.props.profile
         self.alb_security_group = self.template.add_resource(
             SecurityGroup(
                 "ALBSecurityGroup",
@@ -38,34 +177,36 @@ class AlbConstruct(BaseConstruct):
         self.alb = self.template.add_resource(
             elb.LoadBalancer(
                 "ApplicationLB",
-                Name="ApplicationLB",
+                Name=elb_name(self.props.tag_prefix, "alb"),
                 Scheme="internet-facing",
-                Subnets=[self.props.alb_subnet_1, self.props.alb_subnet_2],
+                Subnets=self.props.alb_subnets,
                 SecurityGroups=[Ref(self.alb_security_group)],
-                Tags=tag("alb"),
+                LoadBalancerAttributes=self.props.profile.load_balancer_attributes(),
+                Tags=tag("alb", self.props.tag_prefix),
             )
         )
 
         self.fargate_target_group = self.template.add_resource(
             elb.TargetGroup(
                 "FargateTargetGroup",
-                HealthCheckIntervalSeconds="120",
+                HealthCheckIntervalSeconds=str(profile.health_check_interval),
                 HealthCheckProtocol="HTTP",
-                HealthCheckPath="/healthcheck",
-                HealthCheckTimeoutSeconds="30",
-                HealthyThresholdCount="2",
+                HealthCheckPath=profile.health_check_path,
+                HealthCheckTimeoutSeconds=str(profile.health_check_timeout),
+                HealthyThresholdCount=str(profile.healthy_threshold),
                 Matcher=elb.Matcher(HttpCode="200-399"),
-                Name="FargateTarget",
+                Name=elb_name(self.props.tag_prefix, "fargate"),
                 Port="80",
                 Protocol="HTTP",
-                UnhealthyThresholdCount="4",
+                UnhealthyThresholdCount=str(profile.unhealthy_threshold),
+                TargetGroupAttributes=profile.target_group_attributes(),
                 TargetType="ip",
                 VpcId=self.props.vpc,
                 DependsOn="ApplicationLB",
             )
         )
 
-        Listener = self.template.add_resource(
+        self.listener = self.template.add_resource(
             elb.Listener(
                 "FargateListener",
                 Port="80",
@@ -1,14 +1,36 @@
 from dataclasses import dataclass
-from troposphere import Template
+from typing import Dict, Tuple
+from troposphere import BaseAWSObject, Template
 
+from constructs.fragments import fragment_cache
+from instrumentation import phase
 
-@dataclass
+
+@dataclass(frozen=True)
 class BaseConstructProps:
-    pass
+    # Slotted by hand rather than with `dataclass(slots=True)` to support 3.9,
+    # subclasses list their own fields in their `__slots__` too
+    __slots__ = ("tag_prefix",)
+
+    tag_prefix: str
 
 
 class BaseConstruct:
-    """The base construct to be used as a boilerplate"""
+    """The base construct to be used as a boilerplate
+
+    Constructs only live while adding their resources to the template: the
+    resources they expose to the rest of the stack are the attributes declared
+    in their `__slots__`, kept by the ConstructRegistry once they are released.
+
+    Constructs listing `fragment_parameters` reuse the rendered fragment of an
+    identical construct instead of running `construct_definition`, see
+    `constructs/fragments.py`. Their exposed attributes then hold the logical
+    IDs of the resources.
+    """
+
+    __slots__ = ("props", "template")
+    # The props interpolated as they are into the resources, never branched on
+    fragment_parameters: Tuple[str, ...] = ()
 
     def __init__(self, template: Template, props: BaseConstructProps) -> None:
         """The constructor
@@ -18,7 +40,27 @@ class BaseConstruct:
         """
         self.props = props
         self.template = template
-        self.construct_definition()
+        with phase(type(self).__name__, "construct") as phase_args:
+            resources = len(template.resources)
+            phase_args["reused"] = fragment_cache.define(self)
+            phase_args["resources"] = len(template.resources) - resources
+
+    @classmethod
+    def exposed_names(cls) -> Tuple[str, ...]:
+        """The names of the resources the construct exposes, from its `__slots__`"""
+        return tuple(
+            name
+            for klass in reversed(cls.__mro__[: cls.__mro__.index(BaseConstruct)])
+            for name in klass.__dict__.get("__slots__", ())
+        )
+
+    def exposed(self) -> Dict[str, str]:
+        """The logical IDs of the resources the construct exposes, by name"""
+        exposed = {}
+        for name in self.exposed_names():
+            resource = getattr(self, name)
+            exposed[name] = resource.title if isinstance(resource, BaseAWSObject) else resource
+        return exposed
 
     def construct_definition():
         pass
@@ -0,0 +1,88 @@
+import re
+from dataclasses import dataclass
+from typing import List, Tuple
+from troposphere import GetAtt, Join, Ref, Template
+from troposphere.ec2 import SecurityGroup, SecurityGroupRule, VPCEndpoint
+
+from constructs.base_construct import BaseConstruct, BaseConstructProps
+from intrinsics import REGION, intrinsic
+from utils import tag
+
+
+@dataclass(frozen=True)
+class EndpointsConstructProps(BaseConstructProps):
+    __slots__ = ("vpc", "private_subnets", "private_route_tables", "interface_services")
+
+    # Logical IDs of the VPC resources
+    vpc: str
+    private_subnets: List[str]
+    private_route_tables: List[str]
+    # Services reached through interface endpoints, e.g. "ecr.api"
+    interface_services: Tuple[str, ...]
+
+
+def endpoint_title(service: str) -> str:
+    """The logical ID of a service's endpoint, e.g. "EcrApiEndpoint" for "ecr.api" """
+    return "".join(word.capitalize() for word in re.split(r"[^0-9A-Za-z]+", service)) + "Endpoint"
+
+
+class EndpointsConstruct(BaseConstruct):
+    """Keeps the private subnets' AWS service traffic off the NAT gateways
+
+    Image layers are pulled from S3 through a gateway endpoint on the private
+    route tables, which is free. The other services, such as the ECR API and
+    registry or CloudWatch Logs, get an interface endpoint in every private
+    subnet, reachable over HTTPS from within the VPC.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, template: Template, props: EndpointsConstructProps):
+        super().__init__(template, props)
+
+    def service_name(self, service: str) -> Join:
+        return intrinsic(Join, "", ["com.amazonaws.", REGION, f".{service}"])
+
+    def construct_definition(self):
+        self.template.add_resource(
+            VPCEndpoint(
+                "S3Endpoint",
+                ServiceName=self.service_name("s3"),
+                VpcEndpointType="Gateway",
+                VpcId=Ref(self.props.vpc),
+                RouteTableIds=[
+                    Ref(route_table) for route_table in self.props.private_route_tables
+                ],
+            )
+        )
+        if not self.props.interface_services:
+            return
+
+        endpoint_security_group = self.template.add_resource(
+            SecurityGroup(
+                "EndpointSecurityGroup",
+                GroupDescription="VPC Endpoints Security Group",
+                VpcId=Ref(self.props.vpc),
+                SecurityGroupIngress=[
+                    SecurityGroupRule(
+                        IpProtocol="tcp",
+                        FromPort="443",
+                        ToPort="443",
+                        CidrIp=GetAtt(self.props.vpc, "CidrBlock"),
+                    ),
+                ],
+                Tags=tag("endpoints", self.props.tag_prefix),
+            )
+        )
+        for service in self.props.interface_services:
+            self.template.add_resource(
+                VPCEndpoint(
+                    endpoint_title(service),
+                    ServiceName=self.service_name(service),
+                    VpcEndpointType="Interface",
+                    PrivateDnsEnabled=True,
+                    VpcId=Ref(self.props.vpc),
+                    SubnetIds=[Ref(subnet) for subnet in self.props.private_subnets],
+                    SecurityGroupIds=[Ref(endpoint_security_group)],
+                )
+            )
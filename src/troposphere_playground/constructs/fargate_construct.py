@@ -1,5 +1,8 @@
+import re
 from dataclasses import dataclass
-from troposphere import GetAtt, Ref, Template, ImportValue, Join, AWS_ACCOUNT_ID, AWS_REGION
+from typing import Dict, List, Optional, Tuple
+
+from troposphere import GetAtt, Ref, Template, ImportValue, Join
 from troposphere.ecs import (
     Cluster,
     ContainerDefinition,
@@ -13,28 +16,113 @@ from troposphere.ecs import (
 )
 from troposphere.ec2 import SecurityGroup, SecurityGroupRule
 from troposphere.iam import Role, PolicyType
-from troposphere.elasticloadbalancingv2 import TargetGroup
 from troposphere.logs import LogGroup
 
 from constructs.base_construct import BaseConstruct, BaseConstructProps
-from constants import ECR_REPO_NAME, ECR_IMAGE_VERSION
+from constants import ECR_IMAGE_VERSION
+from intrinsics import ACCOUNT_ID, REGION, intrinsic
 from utils import tag
 
+# The retention periods CloudWatch Logs supports, in days
+LOG_RETENTION_PERIODS = frozenset(
+    {1, 3, 5, 7, 14, 30, 60, 90, 120, 150, 180, 365, 400, 545, 731}
+    | {1096, 1827, 2192, 2557, 2922, 3288, 3653}
+)
+# A Docker size, e.g. "25m" or "1g"
+_BUFFER_SIZE = re.compile(r"^[1-9][0-9]*[kmg]?$", re.IGNORECASE)
+
+
+# The memory sizes (MiB) Fargate supports for each task CPU size (CPU units),
+# as (lowest, highest, step)
+FARGATE_TASK_SIZES: Dict[int, Tuple[int, int, int]] = {
+    256: (512, 2048, 512),
+    512: (1024, 4096, 1024),
+    1024: (2048, 8192, 1024),
+    2048: (4096, 16384, 1024),
+    4096: (8192, 30720, 1024),
+    8192: (16384, 61440, 4096),
+    16384: (32768, 122880, 8192),
+}
+
 
-@dataclass
+def validate_task_size(cpu: str, memory: str) -> None:
+    """Checks that Fargate supports the task CPU and memory pairing
+
+    Raises:
+        ValueError: when the CPU size or its memory size isn't supported
+    """
+    if not cpu.isdigit() or int(cpu) not in FARGATE_TASK_SIZES:
+        sizes = ", ".join(str(size) for size in FARGATE_TASK_SIZES)
+        raise ValueError(f"Unsupported Fargate CPU '{cpu}', expected one of {sizes}")
+    lowest, highest, step = FARGATE_TASK_SIZES[int(cpu)]
+    if not memory.isdigit() or int(memory) not in range(lowest, highest + 1, step):
+        raise ValueError(
+            f"Unsupported Fargate memory '{memory}' for {cpu} CPU, "
+            f"expected {lowest} to {highest} in steps of {step}"
+        )
+
+
+@dataclass(frozen=True)
 class FargateConstructProps(BaseConstructProps):
+    __slots__ = (
+        "vpc",
+        "fargate_subnets",
+        "alb_target_group",
+        "alb_security_group",
+        "ecr_repo_name",
+        "image_digest",
+        "cpu",
+        "memory",
+        "desired_count",
+        "log_retention_days",
+        "log_max_buffer_size",
+    )
+
     vpc: ImportValue
-    fargate_subnet: ImportValue
-    alb_target_group: TargetGroup
-    alb_security_group: SecurityGroup
+    # One per private AZ, the service spreads its tasks across them
+    fargate_subnets: List[ImportValue]
+    # Logical IDs of the ALB resources
+    alb_target_group: str
+    alb_security_group: str
+    ecr_repo_name: str
+    # Pins the image by digest, e.g. "sha256:...", None for the ECR_IMAGE_VERSION tag
+    image_digest: Optional[str]
+    cpu: str
+    memory: str
+    # None when a scalable target owns the task count, so that stack updates
+    # don't reset a scaled-out service
+    desired_count: Optional[int]
+    log_retention_days: int
+    log_max_buffer_size: str
+
+    def __post_init__(self):
+        validate_task_size(self.cpu, self.memory)
+        if self.log_retention_days not in LOG_RETENTION_PERIODS:
+            raise ValueError(
+                f"Unsupported log retention of {self.log_retention_days} days, expected one "
+                f"of {', '.join(str(days) for days in sorted(LOG_RETENTION_PERIODS))}"
+            )
+        if not _BUFFER_SIZE.match(self.log_max_buffer_size):
+            raise ValueError(
+                f"Invalid log max buffer size '{self.log_max_buffer_size}', expected e.g. 25m"
+            )
 
 
 class FargateConstruct(BaseConstruct):
+    __slots__ = ("cluster", "fargate_service")
+    fragment_parameters = ("tag_prefix", "vpc", "fargate_subnets", "ecr_repo_name")
+
     def __init__(self, template: Template, props: FargateConstructProps):
         super().__init__(template, props)
 
+    def image_reference(self):
+        """The separator and the digest or tag following the image repository"""
+        if self.props.image_digest:
+            return "@", self.props.image_digest
+        return ":", ECR_IMAGE_VERSION
+
     def construct_definition(self):
-        cluster = self.template.add_resource(Cluster("TropoCluster"))
+        self.cluster = self.template.add_resource(Cluster("TropoCluster"))
 
         # Create the Task Role
         task_role = self.template.add_resource(
@@ -118,46 +206,69 @@ class FargateConstruct(BaseConstruct):
             )
         )
 
+        log_group = self.template.add_resource(
+            LogGroup(
+                "TropoLogGroup",
+                RetentionInDays=self.props.log_retention_days,
+                Tags=tag("log-group", self.props.tag_prefix),
+            )
+        )
+
         task_definition = self.template.add_resource(
             TaskDefinition(
                 "TropoServer",
                 RequiresCompatibilities=["FARGATE"],
-                Cpu="256",
-                Memory="512",
+                Cpu=self.props.cpu,
+                Memory=self.props.memory,
                 NetworkMode="awsvpc",
                 TaskRoleArn=Ref(task_role),
                 ExecutionRoleArn=Ref(task_execution_role),
                 ContainerDefinitions=[
                     ContainerDefinition(
                         Name="tropo-app",
-                        Image=Join(
+                        Image=intrinsic(
+                            Join,
                             "",
                             [
-                                Ref(AWS_ACCOUNT_ID),
+                                ACCOUNT_ID,
                                 ".dkr.ecr.",
-                                Ref(AWS_REGION),
+                                REGION,
                                 ".amazonaws.com/",
-                                ECR_REPO_NAME,
-                                ":",
-                                ECR_IMAGE_VERSION,
+                                self.props.ecr_repo_name,
+                                *self.image_reference(),
                             ],
                         ),
                         PortMappings=[PortMapping(ContainerPort=80)],
+                        # Non-blocking, so that a slow CloudWatch never stalls
+                        # httpd writing its logs
+                        LogConfiguration=LogConfiguration(
+                            LogDriver="awslogs",
+                            Options={
+                                "awslogs-group": Ref(log_group),
+                                "awslogs-region": REGION,
+                                "awslogs-stream-prefix": "tropo-app",
+                                "mode": "non-blocking",
+                                "max-buffer-size": self.props.log_max_buffer_size,
+                            },
+                        ),
                         # EntryPoint=["sh", "-c"],
                         # Command=[
                         #     "echo Welcome to the Cloud Team >  /usr/local/apache2/htdocs/index.html && httpd-foreground"
                         # ],
                     )
                 ],
-                Tags=tag("fargate-task-definition"),
+                Tags=tag("fargate-task-definition", self.props.tag_prefix),
             )
         )
 
-        fargate_service = self.template.add_resource(
+        service_count = {}
+        if self.props.desired_count is not None:
+            service_count["DesiredCount"] = self.props.desired_count
+        self.fargate_service = self.template.add_resource(
             Service(
                 "TropoService",
-                Cluster=Ref(cluster),
-                DesiredCount=1,
+                Cluster=Ref(self.cluster),
+                **service_count,
                 TaskDefinition=Ref(task_definition),
                 LaunchType="FARGATE",
                 LoadBalancers=[
@@ -170,11 +281,12 @@ class FargateConstruct(BaseConstruct):
                 NetworkConfiguration=NetworkConfiguration(
                     AwsvpcConfiguration=AwsvpcConfiguration(
                         AssignPublicIp="ENABLED",
-                        Subnets=[self.props.fargate_subnet],
+                        Subnets=self.props.fargate_subnets,
                         SecurityGroups=[Ref(fargate_security_group)],
                     )
                 ),
-                Tags=tag("fargate-service"),
-                DependsOn="FargateListener",
+                Tags=tag("fargate-service", self.props.tag_prefix),
+                # Tasks need the execution policy to pull the image and log
+                DependsOn=["FargateListener", fargate_execution_policy.title],
             )
         )
@@ -0,0 +1,295 @@
+"""Pre-rendered construct fragments, reused across constructs of the same shape
+
+A fragment is what a construct adds to its template: its resources and outputs
+rendered to dicts, and the logical IDs of the resources it exposes. Constructs
+opt in by listing their `fragment_parameters`, the props that vary between
+otherwise identical constructs, e.g. the tag prefix or the imported VPC, and
+that `construct_definition` only interpolates into values, never branches on
+or transforms.
+
+A shape is keyed on the construct class, the source digest of its module and of
+every package module it imports, the values of `constants.py`, its other props,
+and the kind of each parameter. Its fragment is defined once, on a scratch
+template, with a placeholder token for each parameter. Constructs of the shape
+then copy the fragment with their own values in place of the tokens.
+
+The first construct of a shape is defined as usual and checked against the
+fragment: shapes whose fragment doesn't match, or whose tokens were transformed
+or interpolated where a whole value is expected, are always defined.
+"""
+
+import json
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from troposphere import AWSHelperFn, Template, encode_to_dict
+
+from cache import constants_values, module_digest
+from constants import FRAGMENT_CACHE_SIZE
+
+# Location of a value in a fragment, as the keys and indexes leading to it
+Slot = Tuple[Any, ...]
+
+
+class Placeholder(AWSHelperFn):
+    """Stands for a parameter that isn't a string, renders to its token"""
+
+    def __init__(self, token: str) -> None:
+        self.data = token
+
+
+class RenderedResource:
+    """A resource or output of a template, already rendered to its dict form"""
+
+    __slots__ = ("title", "rendered")
+
+    def __init__(self, title: str, rendered: Dict[str, Any]) -> None:
+        self.title = title
+        self.rendered = rendered
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self.rendered
+
+
+def _token(index: int) -> str:
+    # Mixed case, so that lowercased or capitalized tokens are caught too
+    return f"FragmentParam{index}X"
+
+
+def _kind(value: Any) -> Any:
+    """What a parameter value is, as far as its placeholder is concerned"""
+    if isinstance(value, (list, tuple)):
+        return ("list", tuple(_kind(item) for item in value))
+    if value is None or value == "":
+        # Passed as they are, they can't be interpolated
+        return repr(value)
+    return "str" if isinstance(value, str) else "helper"
+
+
+def _placeholder(value: Any, tokens: Dict[str, Any]) -> Any:
+    """Replaces a parameter value by its placeholders, recording their values"""
+    if isinstance(value, (list, tuple)):
+        return [_placeholder(item, tokens) for item in value]
+    if value is None or value == "":
+        return value
+    token = _token(len(tokens))
+    tokens[token] = value
+    return token if isinstance(value, str) else Placeholder(token)
+
+
+def _plain(value: Any) -> Any:
+    return encode_to_dict(value) if isinstance(value, AWSHelperFn) else repr(value)
+
+
+def _walk(node: Any, path: Slot = ()):
+    """Yields the path and value of every string of a fragment, dict keys included"""
+    if isinstance(node, dict):
+        for key, value in node.items():
+            yield path + (None,), key
+            yield from _walk(value, path + (key,))
+    elif isinstance(node, list):
+        for index, value in enumerate(node):
+            yield from _walk(value, path + (index,))
+    elif isinstance(node, str):
+        yield path, node
+
+
+def _replace(node: Any, path: Slot, value: Any) -> Any:
+    """Returns a copy of the node with the value at the path replaced
+
+    Only the containers along the path are copied, the rest is shared.
+    """
+    if not path:
+        return value
+    key, rest = path[0], path[1:]
+    copy = dict(node) if isinstance(node, dict) else list(node)
+    copy[key] = _replace(node[key], rest, value)
+    return copy
+
+
+def _is_identifier(path: Slot) -> bool:
+    """Whether the string at the path is a logical ID of the fragment"""
+    return path[0] == "exposed" or (path[0] in ("resources", "outputs") and path[2:] == (0,))
+
+
+class Shape:
+    """The fragment of a construct shape, with the slots holding its tokens"""
+
+    __slots__ = ("fragment", "slots")
+
+    def __init__(self, fragment: Dict[str, Any], slots: List[Slot]) -> None:
+        self.fragment = fragment
+        self.slots = slots
+
+    @classmethod
+    def define(cls, construct, parameters: Dict[str, Any], kinds: Dict[str, str]):
+        """Defines the fragment of the construct with its parameters as placeholders
+
+        Args:
+            construct (BaseConstruct): the construct, with its actual props
+            parameters (Dict[str, Any]): the placeholder props, by name
+            kinds (Dict[str, str]): the kind of each token, "str" or "helper"
+
+        Returns:
+            Optional[Shape]: the shape, None when its fragment can't be reused
+        """
+        scratch = object.__new__(type(construct))
+        scratch.template = Template()
+        try:
+            scratch.props = type(construct.props)(**{**_fields(construct.props), **parameters})
+            scratch.construct_definition()
+        except Exception as e:
+            # e.g. a parameter validated against a pattern, the construct is defined as usual
+            logging.debug(f"{type(construct).__name__} can't be defined with placeholders: {e}")
+            return None
+        template = scratch.template
+        # Fragments only hold resources and outputs
+        if template.parameters or template.conditions or template.mappings or template.rules:
+            return None
+        fragment = {**_rendered(template, 0, 0), "exposed": scratch.exposed()}
+        if not kinds:
+            return cls(fragment, [])
+
+        pattern = re.compile("|".join(re.escape(token) for token in kinds), re.IGNORECASE)
+        slots = []
+        for path, value in _walk(fragment):
+            matches = [match.group() for match in pattern.finditer(value)]
+            if not matches:
+                continue
+            for token in matches:
+                if token not in kinds:
+                    # Transformed, e.g. lowercased
+                    return None
+                if kinds[token] == "helper" and (value != token or _is_identifier(path)):
+                    # Interpolated into a string rather than used as a whole value
+                    return None
+            if None in path:
+                # Parameters in dict keys can't be substituted
+                return None
+            slots.append(path)
+        return cls(fragment, slots)
+
+    def render(self, tokens: Dict[str, Any]) -> Dict[str, Any]:
+        """The fragment with the actual parameter values in place of the tokens"""
+        if not self.slots:
+            return self.fragment
+        values = {
+            token: value if isinstance(value, str) else encode_to_dict(value)
+            for token, value in tokens.items()
+        }
+        pattern = re.compile("|".join(re.escape(token) for token in values))
+        fragment = self.fragment
+        for path in self.slots:
+            value = fragment
+            for key in path:
+                value = value[key]
+            if value in values:
+                value = values[value]
+            else:
+                value = pattern.sub(lambda match: values[match.group()], value)
+            fragment = _replace(fragment, path, value)
+        return fragment
+
+
+def _fields(props) -> Dict[str, Any]:
+    return {name: getattr(props, name) for name in type(props).__dataclass_fields__}
+
+
+def _rendered(template: Template, resources: int, outputs: int) -> Dict[str, Any]:
+    return {
+        "resources": [
+            [title, encode_to_dict(item)]
+            for title, item in list(template.resources.items())[resources:]
+        ],
+        "outputs": [
+            [title, encode_to_dict(item)]
+            for title, item in list(template.outputs.items())[outputs:]
+        ],
+    }
+
+
+class FragmentCache:
+    """Reuses the fragments of constructs of the same shape"""
+
+    def __init__(self, max_shapes: int = FRAGMENT_CACHE_SIZE) -> None:
+        """The constructor
+
+        Args:
+            max_shapes (int): the shapes kept, the cache is reset when it is reached
+        """
+        self.max_shapes = max_shapes
+        self._shapes: Dict[str, Optional[Shape]] = {}
+
+    def clear(self) -> None:
+        self._shapes.clear()
+
+    def define(self, construct) -> bool:
+        """Adds the construct's resources and outputs to its template
+
+        Args:
+            construct (BaseConstruct): the construct, with its props and template
+
+        Returns:
+            bool: whether a cached fragment was reused rather than defined
+        """
+        construct_class = type(construct)
+        if not construct_class.fragment_parameters:
+            construct.construct_definition()
+            return False
+
+        props = _fields(construct.props)
+        tokens: Dict[str, Any] = {}
+        parameters = {
+            name: _placeholder(props.pop(name), tokens)
+            for name in construct_class.fragment_parameters
+        }
+        key = json.dumps(
+            {
+                "class": f"{construct_class.__module__}.{construct_class.__qualname__}",
+                "sources": module_digest(construct_class.__module__),
+                "constants": constants_values(),
+                "props": props,
+                "parameters": {
+                    name: _kind(getattr(construct.props, name)) for name in parameters
+                },
+            },
+            sort_keys=True,
+            default=_plain,
+        )
+
+        template: Template = construct.template
+        if key in self._shapes:
+            shape = self._shapes[key]
+            if shape is None:
+                construct.construct_definition()
+                return False
+            fragment = shape.render(tokens)
+            for title, rendered in fragment["resources"]:
+                template.add_resource(RenderedResource(title, rendered))
+            for title, rendered in fragment["outputs"]:
+                template.add_output(RenderedResource(title, rendered))
+            for name, title in fragment["exposed"].items():
+                setattr(construct, name, title)
+            return True
+
+        kinds = {
+            token: "str" if isinstance(value, str) else "helper" for token, value in tokens.items()
+        }
+        shape = Shape.define(construct, parameters, kinds)
+        resources, outputs = len(template.resources), len(template.outputs)
+        construct.construct_definition()
+        if shape is not None:
+            expected = shape.render(tokens)
+            actual = {**_rendered(template, resources, outputs), "exposed": construct.exposed()}
+            if expected != actual:
+                logging.debug(f"{construct_class.__name__} fragments can't be reused")
+                shape = None
+        if len(self._shapes) >= self.max_shapes:
+            self._shapes.clear()
+        self._shapes[key] = shape
+        return False
+
+
+# Shared by the constructs of every template of the process
+fragment_cache = FragmentCache()
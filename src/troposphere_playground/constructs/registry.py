@@ -0,0 +1,104 @@
+from typing import Any, Dict, FrozenSet, Iterable, Type
+
+import troposphere
+from troposphere import BaseAWSObject, Template
+
+from constructs.base_construct import BaseConstruct, BaseConstructProps
+
+# Every troposphere object keeps its own set of its class property names and
+# its own list of the resource attribute names, only used for membership tests
+_RESOURCE_ATTRIBUTES = (
+    "Condition",
+    "CreationPolicy",
+    "DeletionPolicy",
+    "DependsOn",
+    "Metadata",
+    "UpdatePolicy",
+    "UpdateReplacePolicy",
+)
+_propnames: Dict[type, FrozenSet[str]] = {}
+# Compaction replaces instance attributes that are troposphere internals, so it
+# only runs on the releases it was checked against, leaving objects untouched
+# on the others
+COMPACTABLE_VERSIONS = frozenset({"4.1.0"})
+
+
+def compact(objects: Iterable[Any]) -> None:
+    """Shares the property and attribute names of troposphere objects per class
+
+    Does nothing unless the installed troposphere is one of COMPACTABLE_VERSIONS.
+
+    Args:
+        objects (Iterable[Any]): template resources or outputs, their nested
+            properties are compacted as well
+    """
+    if troposphere.__version__ not in COMPACTABLE_VERSIONS:
+        return
+    pending = list(objects)
+    while pending:
+        node = pending.pop()
+        if isinstance(node, BaseAWSObject):
+            attributes = node.__dict__
+            propnames = _propnames.get(type(node))
+            if propnames is None:
+                propnames = _propnames[type(node)] = frozenset(attributes["propnames"])
+            attributes["propnames"] = propnames
+            attributes["attributes"] = _RESOURCE_ATTRIBUTES
+            pending.extend(node.properties.values())
+        elif isinstance(node, list):
+            pending.extend(node)
+        elif isinstance(node, dict):
+            pending.extend(node.values())
+
+
+class ConstructRegistry:
+    """The resources exposed by the constructs of a template, by construct name
+
+    Defining a construct through the registry keeps only the logical IDs of
+    the resources it exposes: the construct object, along with its props, is
+    released as soon as its resources are in the template, and those resources
+    are compacted.
+    """
+
+    __slots__ = ("template", "_exposed")
+
+    def __init__(self, template: Template) -> None:
+        self.template = template
+        self._exposed: Dict[str, Dict[str, str]] = {}
+
+    def define(
+        self, construct_class: Type[BaseConstruct], props: BaseConstructProps
+    ) -> Dict[str, str]:
+        """Adds a construct's resources to the template
+
+        Args:
+            construct_class (Type[BaseConstruct]): the construct to define
+            props (BaseConstructProps): the construct props
+
+        Raises:
+            ValueError: when a construct of the same class was already defined
+
+        Returns:
+            Dict[str, str]: the logical IDs of the resources exposed by the
+                construct, by name
+        """
+        name = construct_class.__name__
+        if name in self._exposed:
+            raise ValueError(f"Construct {name} is already defined")
+        resources, outputs = len(self.template.resources), len(self.template.outputs)
+        construct = construct_class(self.template, props)
+        compact(list(self.template.resources.values())[resources:])
+        compact(list(self.template.outputs.values())[outputs:])
+        self._exposed[name] = construct.exposed()
+        return self._exposed[name]
+
+    def compact(self) -> None:
+        """Compacts every resource and output of the template"""
+        compact(self.template.resources.values())
+        compact(self.template.outputs.values())
+
+    def __getitem__(self, name: str) -> Dict[str, str]:
+        return self._exposed[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._exposed
@@ -0,0 +1,147 @@
+from dataclasses import dataclass
+from troposphere import GetAtt, Join, Ref, Template
+from troposphere.applicationautoscaling import (
+    PredefinedMetricSpecification,
+    ScalableTarget,
+    ScalingPolicy,
+    TargetTrackingScalingPolicyConfiguration,
+)
+
+from constructs.base_construct import BaseConstruct, BaseConstructProps
+from constants import SCALE_IN_COOLDOWN, SCALE_OUT_COOLDOWN
+from intrinsics import ACCOUNT_ID, PARTITION, intrinsic
+
+# The service-linked role Application Auto Scaling creates to scale ECS services
+ECS_SCALING_ROLE = (
+    "role/aws-service-role/ecs.application-autoscaling.amazonaws.com/"
+    "AWSServiceRoleForApplicationAutoScaling_ECSService"
+)
+
+
+@dataclass(frozen=True)
+class ScalingConstructProps(BaseConstructProps):
+    __slots__ = (
+        "cluster",
+        "fargate_service",
+        "alb",
+        "alb_target_group",
+        "alb_listener",
+        "min_capacity",
+        "max_capacity",
+        "cpu_target",
+        "memory_target",
+        "requests_target",
+    )
+
+    # Logical IDs of the ECS and ALB resources
+    cluster: str
+    fargate_service: str
+    alb: str
+    alb_target_group: str
+    alb_listener: str
+    min_capacity: int
+    max_capacity: int
+    # Target tracking values, in % for CPU and memory, per task per minute for requests
+    cpu_target: float
+    memory_target: float
+    requests_target: float
+
+    def __post_init__(self):
+        if not 0 <= self.min_capacity <= self.max_capacity or self.max_capacity < 1:
+            raise ValueError(
+                f"Invalid scaling capacity {self.min_capacity}-{self.max_capacity}, "
+                "expected 0 <= min <= max and max >= 1"
+            )
+        for name in ("cpu_target", "memory_target"):
+            if not 0 < getattr(self, name) <= 100:
+                raise ValueError(f"Invalid {name} {getattr(self, name)}, expected 0-100%")
+        if self.requests_target <= 0:
+            raise ValueError(f"Invalid requests_target {self.requests_target}, expected > 0")
+
+
+class ScalingConstruct(BaseConstruct):
+    """Scales the Fargate service on its CPU, memory and ALB request count
+
+    Each metric has its own target tracking policy, Application Auto Scaling
+    scaling out as soon as any of them is over its target, and scaling in
+    only when all of them are under theirs.
+    """
+
+    __slots__ = ("scalable_target",)
+    fragment_parameters = ("tag_prefix",)
+
+    def __init__(self, template: Template, props: ScalingConstructProps):
+        super().__init__(template, props)
+
+    def target_tracking_policy(
+        self, title: str, metric: PredefinedMetricSpecification, target_value: float, **kwargs
+    ) -> ScalingPolicy:
+        return self.template.add_resource(
+            ScalingPolicy(
+                title,
+                PolicyName=f"{self.props.tag_prefix}-{title}",
+                PolicyType="TargetTrackingScaling",
+                ScalingTargetId=Ref(self.scalable_target),
+                TargetTrackingScalingPolicyConfiguration=TargetTrackingScalingPolicyConfiguration(
+                    PredefinedMetricSpecification=metric,
+                    TargetValue=target_value,
+                    ScaleInCooldown=SCALE_IN_COOLDOWN,
+                    ScaleOutCooldown=SCALE_OUT_COOLDOWN,
+                ),
+                **kwargs,
+            )
+        )
+
+    def construct_definition(self):
+        self.scalable_target = self.template.add_resource(
+            ScalableTarget(
+                "FargateScalableTarget",
+                RoleARN=intrinsic(
+                    Join, "", ["arn:", PARTITION, ":iam::", ACCOUNT_ID, f":{ECS_SCALING_ROLE}"]
+                ),
+                MinCapacity=self.props.min_capacity,
+                MaxCapacity=self.props.max_capacity,
+                ResourceId=Join(
+                    "/",
+                    [
+                        "service",
+                        Ref(self.props.cluster),
+                        GetAtt(self.props.fargate_service, "Name"),
+                    ],
+                ),
+                ScalableDimension="ecs:service:DesiredCount",
+                ServiceNamespace="ecs",
+            )
+        )
+
+        self.target_tracking_policy(
+            "FargateCpuScalingPolicy",
+            PredefinedMetricSpecification(
+                PredefinedMetricType="ECSServiceAverageCPUUtilization"
+            ),
+            self.props.cpu_target,
+        )
+        self.target_tracking_policy(
+            "FargateMemoryScalingPolicy",
+            PredefinedMetricSpecification(
+                PredefinedMetricType="ECSServiceAverageMemoryUtilization"
+            ),
+            self.props.memory_target,
+        )
+        # The request count of the target group is only known once the
+        # listener attaches it to the load balancer
+        self.target_tracking_policy(
+            "FargateRequestsScalingPolicy",
+            PredefinedMetricSpecification(
+                PredefinedMetricType="ALBRequestCountPerTarget",
+                ResourceLabel=Join(
+                    "/",
+                    [
+                        GetAtt(self.props.alb, "LoadBalancerFullName"),
+                        GetAtt(self.props.alb_target_group, "TargetGroupFullName"),
+                    ],
+                ),
+            ),
+            self.props.requests_target,
+            DependsOn=self.props.alb_listener,
+        )
@@ -0,0 +1,253 @@
+"""Synthesizes per-tenant variants of the stacks from a tenant manifest
+
+The manifest is a CSV file with a header row, or a JSON lines file, with one
+tenant per row. The `tenant` column is required and names the tenant's export
+folder, `dist/<tenant>/`. The other columns override the stack defaults from
+`constants.py` and may be left empty:
+
+* `tag_prefix`: the prefix of the template names, resources tags and exports
+  (default: the tenant name)
+* `vpc_cidr`: the VPC CIDR block (default: VPC_CIDR)
+* `ecr_repo_name`: the ECR repository name (default: `<tag_prefix>-repository`,
+  in lowercase)
+
+Resources named per account and region, the ECR repository, load balancer and
+target group, are named after the tag prefix, so tenants deployed to the same
+account and region don't collide.
+
+The manifest is read lazily and at most a few tasks per worker are in flight,
+so memory stays constant however many tenants the manifest holds, but for the
+paths of the exported templates, kept for validation and publishing. Before any
+synthesis, the subnets of every tenant VPC with its own `vpc_cidr` are
+allocated in bulk, failing on VPCs that can't hold them or that overlap each
+other. Tenants left on the default VPC_CIDR share it on purpose and aren't
+checked against each other.
+"""
+
+import csv
+import json
+import logging
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from cache import SynthesisCache
+from cidr import allocate_many
+from constants import AZ_PRIVATE_NUMBER, AZ_PUBLIC_NUMBER, EXPORT_FOLDER, OUTPUT_FORMAT
+from constructs.alb_construct import validate_elb_names
+from intrinsics import clear_interned
+from stacks.registry import STACK_REGISTRY
+from utils import ExportResult
+
+MANIFEST_COLUMNS = ("tenant", "tag_prefix", "vpc_cidr", "ecr_repo_name")
+# Tag prefixes default to the tenant name, and load balancer names only allow hyphens
+TENANT_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9-]*$")
+# Tasks queued per worker, enough to keep the workers busy
+TASKS_PER_WORKER = 4
+
+
+class ManifestError(Exception):
+    """Raised when a manifest row is invalid"""
+
+
+@dataclass
+class FanOutSummary:
+    """The outcome of a fan-out run"""
+
+    tenants: int = 0
+    written: int = 0
+    unchanged: int = 0
+    failures: List[str] = field(default_factory=list)
+    # The exported templates, by tenant
+    results: Dict[str, List[ExportResult]] = field(default_factory=dict)
+
+
+def _rows(path: Path) -> Iterator[Dict[str, str]]:
+    with open(path, newline="") as file:
+        if path.suffix == ".csv":
+            yield from csv.DictReader(file)
+            return
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_manifest(path: Path) -> Iterator[Dict[str, str]]:
+    """Reads the tenant manifest lazily, row by row
+
+    Args:
+        path (Path): the .csv or .jsonl manifest file
+
+    Raises:
+        ManifestError: when a row has unknown columns, or an invalid tenant name
+            or tag prefix, e.g. too long for the load balancer names
+
+    Yields:
+        Dict[str, str]: the non-empty values of each row
+    """
+    for number, row in enumerate(_rows(Path(path)), start=1):
+        unknown = set(row) - set(MANIFEST_COLUMNS)
+        if unknown:
+            raise ManifestError(f"Row {number}: unknown columns {', '.join(sorted(unknown))}")
+        tenant = row.get("tenant") or ""
+        if not TENANT_PATTERN.match(tenant):
+            raise ManifestError(f"Row {number}: invalid tenant name '{tenant}'")
+        # Ends up in the template filenames and the export names too
+        tag_prefix = row.get("tag_prefix")
+        if tag_prefix and not TENANT_PATTERN.match(tag_prefix):
+            raise ManifestError(f"Row {number}: invalid tag prefix '{tag_prefix}'")
+        try:
+            validate_elb_names(tag_prefix or tenant)
+        except ValueError as e:
+            raise ManifestError(f"Row {number}: {e}") from e
+        yield {key: value for key, value in row.items() if value not in (None, "")}
+
+
+def check_tenant_networks(path: Path) -> None:
+    """Allocates the subnets of the tenant VPCs with their own CIDR block, in bulk
+
+    Raises:
+        ManifestError: when a VPC CIDR block is invalid, too small for its
+            subnets, or overlaps the block of another tenant
+    """
+    vpc_cidrs = [row["vpc_cidr"] for row in read_manifest(path) if "vpc_cidr" in row]
+    try:
+        allocate_many(vpc_cidrs, AZ_PUBLIC_NUMBER, AZ_PRIVATE_NUMBER)
+    except ValueError as e:
+        raise ManifestError(f"Tenant VPCs: {e}") from e
+
+
+def tenant_overrides(row: Dict[str, str]) -> Dict[str, str]:
+    """The stack overrides of a manifest row, with the per-tenant defaults
+
+    Returns:
+        Dict[str, str]: the overrides, with the tag prefix and ECR repository
+            name always set
+    """
+    overrides = dict(row)
+    tenant = overrides.pop("tenant")
+    overrides.setdefault("tag_prefix", tenant)
+    overrides.setdefault("ecr_repo_name", f"{overrides['tag_prefix'].lower()}-repository")
+    return overrides
+
+
+def tenant_tasks(
+    rows: Iterator[Dict[str, str]], stack_names: List[str]
+) -> Iterator[Tuple[str, Dict[str, str]]]:
+    """Pairs each stack with each manifest row, one task per tenant stack"""
+    for row in rows:
+        for name in stack_names:
+            yield name, row
+
+
+def export_tenant_stack(
+    name: str,
+    row: Dict[str, str],
+    cache: Optional[SynthesisCache] = None,
+    output_format: str = OUTPUT_FORMAT,
+    image_digest: Optional[str] = None,
+) -> ExportResult:
+    """Builds and exports a stack for a tenant, used as the process pool task
+
+    The stack is built in the worker, so only the small manifest row crosses
+    process boundaries.
+
+    Args:
+        name (str): the registry name of the stack
+        row (Dict[str, str]): the tenant manifest row
+        cache (SynthesisCache): the synthesis cache, None to always synthesize
+        output_format (str): the template format, "yaml", "json" or "json-min"
+        image_digest (str): the pushed image digest, None for the ECR_IMAGE_VERSION tag
+
+    Returns:
+        ExportResult: the template absolute filepath and whether it was written
+    """
+    overrides = tenant_overrides(row)
+    if image_digest:
+        overrides["image_digest"] = image_digest
+    stack = STACK_REGISTRY[name].build(
+        name,
+        export_folder=f"{EXPORT_FOLDER}/{row['tenant']}",
+        output_format=output_format,
+        **overrides,
+    )
+    try:
+        return stack.export(cache=cache)
+    finally:
+        # Tenant values, e.g. the tags, would otherwise pile up over the run
+        clear_interned()
+
+
+def fan_out(
+    manifest: Path,
+    stack_names: Optional[List[str]] = None,
+    jobs: int = 1,
+    cache: Optional[SynthesisCache] = None,
+    output_format: str = OUTPUT_FORMAT,
+    image_digest: Optional[str] = None,
+) -> FanOutSummary:
+    """Synthesizes the selected stacks for every tenant of the manifest
+
+    Args:
+        manifest (Path): the .csv or .jsonl tenant manifest
+        stack_names (List[str]): the registry names of the stacks, None for all
+        jobs (int): the number of worker processes, 1 synthesizes sequentially
+        cache (SynthesisCache): the synthesis cache, None to always synthesize
+        output_format (str): the template format, "yaml", "json" or "json-min"
+        image_digest (str): the pushed image digest, None for the ECR_IMAGE_VERSION tag
+
+    Raises:
+        ManifestError: when a manifest row is invalid, or tenant VPCs overlap
+
+    Returns:
+        FanOutSummary: the number of tenants, written and unchanged templates,
+            the failed tenant stacks, and the exported templates
+    """
+    stack_names = stack_names or list(STACK_REGISTRY)
+    if "vpc" in stack_names:
+        check_tenant_networks(manifest)
+    summary = FanOutSummary()
+
+    def rows() -> Iterator[Dict[str, str]]:
+        for row in read_manifest(manifest):
+            summary.tenants += 1
+            yield row
+
+    def record(task: Tuple[str, Dict[str, str]], outcome) -> None:
+        name, row = task
+        try:
+            result = outcome()
+        except Exception as e:
+            logging.error(f"Stack {name} of tenant {row['tenant']} failed: {e}", exc_info=e)
+            summary.failures.append(f"{row['tenant']}/{name}")
+            return
+        summary.results.setdefault(row["tenant"], []).append(result)
+        if result.written:
+            summary.written += 1
+        else:
+            summary.unchanged += 1
+
+    tasks = tenant_tasks(rows(), stack_names)
+    if jobs <= 1:
+        for task in tasks:
+            record(task, lambda: export_tenant_stack(*task, cache, output_format, image_digest))
+        return summary
+
+    # Only paid for when running in parallel
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending = {}
+        for task in tasks:
+            if len(pending) >= jobs * TASKS_PER_WORKER:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    record(pending.pop(future), future.result)
+            future = executor.submit(
+                export_tenant_stack, *task, cache, output_format, image_digest
+            )
+            pending[future] = task
+        for future in list(pending):
+            record(pending.pop(future), future.result)
+    return summary
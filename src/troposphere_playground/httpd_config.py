@@ -0,0 +1,208 @@
+"""Generates the httpd config layer of the application image, for its task size
+
+The config is included at the end of the stock `httpd:2.4` one and tunes:
+
+* the event MPM, sized for the Fargate task's CPU and memory, so that httpd
+  never runs more workers than the task's memory can hold. Every stack runs
+  the same image, so tasks whose size calls for another sizing are rejected
+* keep-alive, held a little longer than the ALB_IDLE_TIMEOUT of the load
+  balancer so that httpd never closes a connection the load balancer is about
+  to reuse. Stacks whose AlbProfile keeps idle connections longer are rejected
+* compression of the text responses with mod_deflate
+* caching: static assets are cached for HTTPD_ASSET_MAX_AGE, HTML pages are
+  revalidated with their ETag, and health checks are never cached
+
+Run this module to regenerate HTTPD_CONFIG next to the Dockerfile.
+"""
+
+import hashlib
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+
+from constants import (
+    ALB_IDLE_TIMEOUT,
+    DOCKERFILE,
+    FARGATE_CPU,
+    FARGATE_MEMORY,
+    HTTPD_ASSET_MAX_AGE,
+    HTTPD_CONFIG,
+    HTTPD_PROCESS_MEMORY,
+    HTTPD_PROCESSES_PER_VCPU,
+    HTTPD_RESERVED_MEMORY,
+    HTTPD_THREAD_MEMORY,
+    HTTPD_THREADS_PER_CHILD,
+)
+from constructs.fargate_construct import validate_task_size
+from utils import file_digest, write_file_atomically
+
+# Processes kept at least, so that recycling one never drops all the workers
+MIN_PROCESSES = 2
+# Seconds httpd keeps idle connections open past the load balancer's idle timeout
+KEEP_ALIVE_MARGIN = 5
+COMPRESSED_TYPES = (
+    "text/html",
+    "text/plain",
+    "text/css",
+    "text/javascript",
+    "application/javascript",
+    "application/json",
+    "image/svg+xml",
+)
+ASSET_EXTENSIONS = ("css", "js", "png", "jpe?g", "gif", "svg", "ico", "webp", "woff2?")
+
+
+@dataclass(frozen=True)
+class MpmSettings:
+    """The event MPM directives"""
+
+    server_limit: int
+    threads_per_child: int
+
+    @property
+    def max_request_workers(self) -> int:
+        return self.server_limit * self.threads_per_child
+
+    def directives(self) -> str:
+        return "\n".join(
+            f"    {name} {value}"
+            for name, value in (
+                ("StartServers", MIN_PROCESSES),
+                ("ServerLimit", self.server_limit),
+                ("ThreadLimit", self.threads_per_child),
+                ("ThreadsPerChild", self.threads_per_child),
+                ("MaxRequestWorkers", self.max_request_workers),
+                ("MinSpareThreads", self.threads_per_child),
+                ("MaxSpareThreads", self.max_request_workers),
+                ("MaxConnectionsPerChild", 0),
+            )
+        )
+
+
+def mpm_settings(
+    cpu: str, memory: str, threads_per_child: int = HTTPD_THREADS_PER_CHILD
+) -> MpmSettings:
+    """Sizes the event MPM for a Fargate task
+
+    The process count is bounded by HTTPD_PROCESSES_PER_VCPU, and by the
+    memory left once HTTPD_RESERVED_MEMORY is set aside, each process taking
+    HTTPD_PROCESS_MEMORY plus HTTPD_THREAD_MEMORY per thread.
+
+    Args:
+        cpu (str): the task CPU units, e.g. "256"
+        memory (str): the task memory in MiB, e.g. "512"
+        threads_per_child (int): the worker threads of each process
+
+    Raises:
+        ValueError: when Fargate doesn't support the CPU and memory pairing
+
+    Returns:
+        MpmSettings: the MPM sizing
+    """
+    validate_task_size(cpu, memory)
+    process_memory = HTTPD_PROCESS_MEMORY + threads_per_child * HTTPD_THREAD_MEMORY
+    by_memory = (int(memory) - HTTPD_RESERVED_MEMORY) // process_memory
+    by_cpu = int(cpu) * HTTPD_PROCESSES_PER_VCPU // 1024
+    return MpmSettings(
+        server_limit=max(MIN_PROCESSES, min(by_memory, by_cpu)),
+        threads_per_child=threads_per_child,
+    )
+
+
+def validate_image_task_size(
+    cpu: str, memory: str, idle_timeout: int = ALB_IDLE_TIMEOUT
+) -> None:
+    """Checks that a task and its load balancer suit the image's httpd config
+
+    The image's config is rendered for FARGATE_CPU, FARGATE_MEMORY and
+    ALB_IDLE_TIMEOUT, and is shared by every stack.
+
+    Args:
+        cpu (str): the task CPU units, e.g. "256"
+        memory (str): the task memory in MiB, e.g. "512"
+        idle_timeout (int): the load balancer idle timeout in seconds
+
+    Raises:
+        ValueError: when Fargate doesn't support the CPU and memory pairing,
+            when the task calls for another MPM sizing than the image's, or
+            when the load balancer keeps idle connections longer than httpd
+    """
+    if mpm_settings(cpu, memory) != mpm_settings(FARGATE_CPU, FARGATE_MEMORY):
+        raise ValueError(
+            f"The image's httpd config is sized for a {FARGATE_CPU} CPU / {FARGATE_MEMORY} MiB "
+            f"task, not {cpu} CPU / {memory} MiB: change FARGATE_CPU and FARGATE_MEMORY, "
+            f"then regenerate it with `make httpd-config`"
+        )
+    if idle_timeout > ALB_IDLE_TIMEOUT:
+        raise ValueError(
+            f"The image's httpd config keeps idle connections for "
+            f"{ALB_IDLE_TIMEOUT + KEEP_ALIVE_MARGIN}s, under the {idle_timeout}s ALB idle "
+            f"timeout: change ALB_IDLE_TIMEOUT, then regenerate it with `make httpd-config`"
+        )
+
+
+def render_config(
+    cpu: str = FARGATE_CPU, memory: str = FARGATE_MEMORY, idle_timeout: int = ALB_IDLE_TIMEOUT
+) -> str:
+    """Renders the httpd config for a task size and load balancer idle timeout"""
+    mpm = mpm_settings(cpu, memory)
+    return f"""# Generated by httpd_config.py for a {cpu} CPU / {memory} MiB task, do not edit
+
+<IfModule !deflate_module>
+    LoadModule deflate_module modules/mod_deflate.so
+</IfModule>
+<IfModule !headers_module>
+    LoadModule headers_module modules/mod_headers.so
+</IfModule>
+
+# Event MPM sized for the task, at most {mpm.max_request_workers} concurrent requests
+<IfModule mpm_event_module>
+{mpm.directives()}
+</IfModule>
+
+# Connections outlive the load balancer's {idle_timeout}s idle timeout
+KeepAlive On
+KeepAliveTimeout {idle_timeout + KEEP_ALIVE_MARGIN}
+MaxKeepAliveRequests 1000
+
+# mod_deflate adds the Vary: Accept-Encoding header itself
+AddOutputFilterByType DEFLATE {" ".join(COMPRESSED_TYPES)}
+
+FileETag MTime Size
+<FilesMatch "\\.html$">
+    Header set Cache-Control "no-cache"
+</FilesMatch>
+<FilesMatch "\\.({"|".join(ASSET_EXTENSIONS)})$">
+    Header set Cache-Control "public, max-age={HTTPD_ASSET_MAX_AGE}, immutable"
+</FilesMatch>
+# Location sections are merged last, health checks are never cached
+<Location "/healthcheck">
+    Header set Cache-Control "no-store"
+</Location>
+"""
+
+
+def write_config(path: Path, content: str) -> bool:
+    """Writes the config unless the file already holds it
+
+    Returns:
+        bool: whether the file was written
+    """
+    path = Path(path)
+    if file_digest(path) == hashlib.sha256(content.encode()).hexdigest():
+        return False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    write_file_atomically(path, content.encode())
+    return True
+
+
+def main():
+    """Regenerates the httpd config next to the Dockerfile"""
+    logging.basicConfig(level=logging.INFO)
+    path = Path(DOCKERFILE).parent / HTTPD_CONFIG
+    written = write_config(path, render_config())
+    logging.info(f"{path}: {'written' if written else 'unchanged'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""Builds the httpd image and pushes it to its repositories, pinned by digest
+
+The image is tagged after the digest of its build inputs, the Dockerfile and
+the IMAGE_CONTEXT_PATHS it copies, so an unchanged `artifacts/` maps to the
+same tag. The image digest of every pushed repository and tag is recorded in
+the image cache. Every repository is inspected first, and one whose tag is in
+the registry, with the cached digest when one was recorded, is neither rebuilt
+nor pushed again. Otherwise the image is built once, Docker's layer cache
+serving the unchanged layers, and pushed to every repository concurrently.
+
+The digest is what the task definitions reference, `repository@sha256:...`,
+so Fargate tasks pull the exact image that was pushed, and hosts that already
+hold it never pull it again, unlike with a mutable `latest` tag.
+
+Docker is driven through its CLI, by a runner that can be swapped for a
+registry stand-in.
+"""
+
+import hashlib
+import json
+import logging
+import re
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from constants import (
+    CACHE_FOLDER,
+    DOCKERFILE,
+    IMAGE_CACHE_FILE,
+    IMAGE_CONTEXT_PATHS,
+    IMAGE_PUSH_WORKERS,
+)
+from utils import write_file_atomically
+
+# Runs a docker CLI command, given without the leading "docker", and returns its output
+Runner = Callable[[List[str]], str]
+
+_PUSHED_DIGEST = re.compile(r"digest: (sha256:[0-9a-f]{64})")
+# How registries report a tag they don't hold, as opposed to auth or network failures
+_MISSING_IMAGE = re.compile(r"manifest unknown|not found|\b404\b", re.IGNORECASE)
+
+
+class ImageBuildError(Exception):
+    """Raised when the image can't be built or pushed"""
+
+
+@dataclass
+class ImageBuild:
+    """The outcome of the build stage"""
+
+    tag: str
+    digest: str
+    built: bool
+    pushed: List[str] = field(default_factory=list)
+
+    def image(self, repository: str) -> str:
+        """The digest-pinned reference of the image in a repository"""
+        return f"{repository}@{self.digest}"
+
+
+def run_docker(args: List[str]) -> str:
+    """Runs a docker CLI command
+
+    Raises:
+        ImageBuildError: when the command fails
+    """
+    process = subprocess.run(["docker", *args], capture_output=True, text=True)
+    if process.returncode:
+        raise ImageBuildError(f"docker {' '.join(args)} failed: {process.stderr.strip()}")
+    return process.stdout
+
+
+def context_digest(dockerfile: Path, context_paths=IMAGE_CONTEXT_PATHS) -> str:
+    """Hashes the Dockerfile and the files of the context paths it copies
+
+    Files are hashed in path order along with their path relative to the
+    context, the Dockerfile's folder, so renames change the digest too.
+    """
+    dockerfile = Path(dockerfile)
+    context = dockerfile.parent
+    digest = hashlib.sha256(dockerfile.read_bytes())
+    for context_path in context_paths:
+        root = context / context_path
+        files = [root] if root.is_file() else sorted(p for p in root.rglob("*") if p.is_file())
+        for path in files:
+            digest.update(b"\0" + path.relative_to(context).as_posix().encode() + b"\0")
+            digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def image_tag(dockerfile: Path, context_paths=IMAGE_CONTEXT_PATHS) -> str:
+    """The content-addressed tag of the image, e.g. "ctx-3f2a..." """
+    return f"ctx-{context_digest(dockerfile, context_paths)[:24]}"
+
+
+class ImageCache:
+    """The digests of the pushed images, by repository and tag
+
+    Stored as a single JSON file in the cache folder.
+    """
+
+    def __init__(self, folder: str = CACHE_FOLDER, filename: str = IMAGE_CACHE_FILE):
+        self.path = Path(folder) / filename
+        try:
+            self.digests: Dict[str, str] = json.loads(self.path.read_text())
+        except FileNotFoundError:
+            self.digests = {}
+
+    def get(self, reference: str) -> Optional[str]:
+        return self.digests.get(reference)
+
+    def put(self, reference: str, digest: str) -> None:
+        self.digests[reference] = digest
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        write_file_atomically(
+            self.path, (json.dumps(self.digests, indent=2, sort_keys=True) + "\n").encode()
+        )
+
+
+def remote_digest(reference: str, runner: Runner = run_docker) -> Optional[str]:
+    """The digest of an image in its registry, None when it isn't there
+
+    Raises:
+        ImageBuildError: when the registry can't be inspected, e.g. on
+            authentication or network failures
+    """
+    try:
+        output = runner(
+            ["buildx", "imagetools", "inspect", "--format", "{{.Manifest.Digest}}", reference]
+        )
+    except ImageBuildError as e:
+        if _MISSING_IMAGE.search(str(e)):
+            return None
+        raise
+    return output.strip() or None
+
+
+def push_image(reference: str, runner: Runner = run_docker) -> str:
+    """Pushes a tagged image and returns its digest in the registry
+
+    Raises:
+        ImageBuildError: when the push output doesn't report the digest
+    """
+    match = _PUSHED_DIGEST.search(runner(["push", reference]))
+    if match is None:
+        raise ImageBuildError(f"docker push {reference} reported no digest")
+    return match.group(1)
+
+
+def build_image(
+    repositories: List[str],
+    dockerfile: Path = Path(DOCKERFILE),
+    runner: Runner = run_docker,
+    cache: Optional[ImageCache] = None,
+    workers: int = IMAGE_PUSH_WORKERS,
+) -> ImageBuild:
+    """Builds the image if needed and pushes it to the repositories lacking it
+
+    Args:
+        repositories (List[str]): the repository URIs, e.g.
+            "123456789012.dkr.ecr.eu-west-1.amazonaws.com/tropo-repository"
+        dockerfile (Path): the Dockerfile, its folder is the build context
+        runner (Runner): runs the docker CLI commands
+        cache (ImageCache): the digests of the pushed images, loaded from the
+            cache folder when None
+        workers (int): the number of concurrent inspections and pushes
+
+    Raises:
+        ImageBuildError: when a docker command fails, or when the repositories
+            hold different images for the same tag
+
+    Returns:
+        ImageBuild: the image tag and digest, whether it was built, and the
+            repositories it was pushed to
+    """
+    if not repositories:
+        raise ImageBuildError("No repository to push the image to")
+    cache = cache if cache is not None else ImageCache()
+    tag = image_tag(dockerfile)
+    references = [f"{repository}:{tag}" for repository in dict.fromkeys(repositories)]
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(references))) as executor:
+        inspected = executor.map(partial(remote_digest, runner=runner), references)
+        digests = dict(zip(references, inspected))
+    for reference, digest in digests.items():
+        cached = cache.get(reference)
+        if digest is not None and cached is not None and digest != cached:
+            # The tag was pushed over since, the cached image is what the tag stands for
+            logging.warning(f"{reference} is {digest} in the registry, not {cached}")
+            digests[reference] = None
+
+    unpushed = [reference for reference, digest in digests.items() if digest is None]
+    if unpushed:
+        logging.info(f"Building image {tag} for {len(unpushed)} repositories")
+        args = ["build", "--file", str(dockerfile)]
+        for reference in unpushed:
+            args += ["--tag", reference]
+        runner(args + [str(Path(dockerfile).parent)])
+        with ThreadPoolExecutor(max_workers=min(workers, len(unpushed))) as executor:
+            pushed = executor.map(partial(push_image, runner=runner), unpushed)
+            digests.update(zip(unpushed, pushed))
+    else:
+        logging.info(f"Image {tag} is up to date in every repository")
+
+    for reference, digest in digests.items():
+        cache.put(reference, digest)
+    cache.save()
+
+    distinct = set(digests.values())
+    if len(distinct) != 1:
+        raise ImageBuildError(f"Repositories hold different images for {tag}: {sorted(distinct)}")
+    return ImageBuild(
+        tag=tag,
+        digest=distinct.pop(),
+        built=bool(unpushed),
+        pushed=[reference.rsplit(":", 1)[0] for reference in unpushed],
+    )
@@ -0,0 +1,137 @@
+"""Per-phase timing and memory instrumentation of the stack synthesis
+
+Phases are recorded by the active tracer, if any, and cost nothing otherwise.
+Each phase records its wall time and, when memory tracing is on, the peak
+memory allocated while it ran, measured with tracemalloc. Phases nest: a
+stack's definition phase contains one phase per construct.
+
+Events can be written as JSON lines, or as a Chrome trace file to open in
+chrome://tracing or https://ui.perfetto.dev.
+"""
+
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class Tracer:
+    """Records the phases run while it is active"""
+
+    def __init__(self, trace_memory: bool = True) -> None:
+        """The constructor
+
+        Args:
+            trace_memory (bool): whether to record the peak memory of each phase
+        """
+        self.trace_memory = trace_memory
+        self.events: List[Dict[str, Any]] = []
+        # The peak memory of the enclosing phases, innermost last
+        self._peaks: List[int] = []
+
+    @contextmanager
+    def phase(self, name: str, category: str, **args: Any) -> Iterator[Dict[str, Any]]:
+        """Records a phase
+
+        Args:
+            name (str): the phase name, e.g. the construct or stack name
+            category (str): the phase kind, e.g. "construct" or "serialization"
+            **args: extra values recorded with the phase
+
+        Yields:
+            Dict[str, Any]: the phase args, to add values known once the phase ran
+        """
+        tracing_memory = self.trace_memory and tracemalloc.is_tracing()
+        if tracing_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], peak)
+            tracemalloc.reset_peak()
+            self._peaks.append(0)
+
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            duration = time.perf_counter() - start
+            event = {
+                "name": name,
+                "cat": category,
+                "ts_us": round(start * 1e6),
+                "dur_us": round(duration * 1e6),
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": args,
+            }
+            if tracing_memory:
+                peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+                event["peak_bytes"] = peak - current
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+            self.events.append(event)
+
+    def write_jsonl(self, path: Path) -> None:
+        """Writes the events as JSON lines, in the order the phases ended"""
+        with open(path, "w") as file:
+            for event in self.events:
+                file.write(json.dumps(event, default=str) + "\n")
+
+    def write_chrome_trace(self, path: Path) -> None:
+        """Writes the events in the Chrome trace event format"""
+        trace_events = []
+        for event in self.events:
+            args = dict(event["args"])
+            if "peak_bytes" in event:
+                args["peak_bytes"] = event["peak_bytes"]
+            trace_events.append(
+                {
+                    "name": event["name"],
+                    "cat": event["cat"],
+                    "ph": "X",
+                    "ts": event["ts_us"],
+                    "dur": event["dur_us"],
+                    "pid": event["pid"],
+                    "tid": event["tid"],
+                    "args": args,
+                }
+            )
+        with open(path, "w") as file:
+            json.dump({"traceEvents": trace_events}, file, default=str)
+
+
+_active_tracer: Optional[Tracer] = None
+
+
+def start_tracing(tracer: Tracer) -> None:
+    """Makes the tracer record every phase until `stop_tracing` is called"""
+    global _active_tracer
+    _active_tracer = tracer
+    if tracer.trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def stop_tracing() -> Optional[Tracer]:
+    """Stops recording phases and returns the tracer that recorded them"""
+    global _active_tracer
+    tracer, _active_tracer = _active_tracer, None
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    return tracer
+
+
+@contextmanager
+def phase(name: str, category: str, **args: Any) -> Iterator[Dict[str, Any]]:
+    """Records a phase with the active tracer, does nothing without one
+
+    Yields:
+        Dict[str, Any]: the phase args, to add values known once the phase ran
+    """
+    if _active_tracer is None:
+        yield args
+        return
+    with _active_tracer.phase(name, category, **args) as phase_args:
+        yield phase_args
@@ -0,0 +1,93 @@
+"""Interned intrinsic functions and tag sets shared across constructs
+
+Intrinsics such as `Ref(AWS_REGION)` or a resource's `Tags` are rebuilt with the
+same content for every resource that uses them. `intrinsic` builds each distinct
+value once and hands out the same immutable instance afterwards, rendered to its
+dict form a single time.
+
+Interning never changes the synthesized templates: an interned value renders
+exactly the dict of the helper it was built from, and `encode_to_dict` copies
+that dict into the template, so shared instances can't be told apart from
+fresh ones in the output.
+"""
+
+from typing import Any, Dict, Hashable, Tuple
+
+from troposphere import (
+    AWS_ACCOUNT_ID,
+    AWS_PARTITION,
+    AWS_REGION,
+    AWS_STACK_ID,
+    AWSHelperFn,
+    BaseAWSObject,
+    Ref,
+    encode_to_dict,
+)
+
+# Upper bound of distinct interned values, the table is reset when it is reached
+INTERN_TABLE_SIZE = 16384
+
+
+class Interned(AWSHelperFn):
+    """An immutable intrinsic function or tag set, rendered once"""
+
+    def __init__(self, helper: AWSHelperFn) -> None:
+        self.helper_class = type(helper)
+        self.data = encode_to_dict(helper)
+
+    def to_dict(self) -> Any:
+        return self.data
+
+    def __repr__(self) -> str:
+        return f"Interned({self.helper_class.__name__}, {self.data!r})"
+
+
+_interned: Dict[Tuple[Hashable, ...], Interned] = {}
+
+
+def _freeze(value: Any) -> Hashable:
+    """Turns an intrinsic argument into a hashable value with the same rendering"""
+    if isinstance(value, BaseAWSObject):
+        # Helpers only ever reference resources by their logical ID
+        return ("resource", value.title)
+    if isinstance(value, AWSHelperFn):
+        return _freeze(encode_to_dict(value))
+    if isinstance(value, dict):
+        return ("dict", tuple((_freeze(key), _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return ("list", tuple(_freeze(item) for item in value))
+    # Scalars that compare equal can render differently, e.g. True, 1 and 1.0
+    return (type(value), value)
+
+
+def intrinsic(helper_class: type, *args: Any, **kwargs: Any) -> Interned:
+    """Returns the shared instance of `helper_class(*args, **kwargs)`
+
+    Args:
+        helper_class (type): the troposphere helper, e.g. Ref, Join or Tags
+        *args, **kwargs: the helper arguments
+
+    Returns:
+        Interned: the interned helper, usable wherever the helper itself is
+    """
+    key = (helper_class, _freeze(args), _freeze(kwargs))
+    interned = _interned.get(key)
+    if interned is None:
+        if len(_interned) >= INTERN_TABLE_SIZE:
+            _interned.clear()
+        interned = _interned[key] = Interned(helper_class(*args, **kwargs))
+    return interned
+
+
+def clear_interned() -> None:
+    """Forgets the interned values, e.g. those of a tenant the fan-out is done with
+
+    Instances already handed out stay valid, later calls build new ones.
+    """
+    _interned.clear()
+
+
+ACCOUNT_ID = intrinsic(Ref, AWS_ACCOUNT_ID)
+PARTITION = intrinsic(Ref, AWS_PARTITION)
+REGION = intrinsic(Ref, AWS_REGION)
+STACK_ID = intrinsic(Ref, AWS_STACK_ID)
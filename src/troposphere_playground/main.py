@@ -1,39 +1,426 @@
-"""Synthesizes YAML Cloudformation templates for each stack
+"""Synthesizes YAML or JSON Cloudformation templates for each stack
 """
 
+import argparse
+import json
 import logging
-from constants import TAG_PREFIX
-from stacks.vpc_stack import VpcStack
-from stacks.base_stack import BaseStack
-from stacks.application_stack import AppStack
-from stacks.ecr_stack import EcrStack
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
+from cache import SynthesisCache
+from constants import DOCKERFILE, ECR_REPO_NAME, EXPORT_FOLDER, HTTPD_CONFIG, OUTPUT_FORMAT
+from instrumentation import Tracer, start_tracing, stop_tracing
+from scheduler import deploy_plan
+from serialization import OUTPUT_FORMATS
+from stacks.registry import STACK_REGISTRY, build_stacks
+from utils import ExportResult, export_cf_template_to_file
+from validation import validate_files
 
-STACKS: BaseStack = [
-    VpcStack(
-        template_name=f"{TAG_PREFIX}-vpc",
-        template_description="Base network infrastructure",
-    ),
-    EcrStack(template_name=f"{TAG_PREFIX}-ecr", template_description="ECR Repository"),
-    AppStack(
-        template_name=f"{TAG_PREFIX}-app",
-        template_description="Application infrastructure",
-    ),
-]
+if TYPE_CHECKING:
+    from stacks.base_stack import BaseStack
 
 
-def synthesize_stacks():
-    for stack in STACKS:
-        stack.export()
+class StackSynthesisError(Exception):
+    """Raised when one or more stacks failed to synthesize in parallel mode"""
 
+    def __init__(self, failures: List[str]) -> None:
+        self.failures = failures
+        super().__init__(f"Failed stacks: {', '.join(failures)}")
 
-def main():
+
+def export_stack(
+    stack: "BaseStack", cache: Optional[SynthesisCache] = None
+) -> ExportResult:
+    """Synthesizes and exports a single stack, used as the process pool task
+
+    Args:
+        stack (BaseStack): the stack to export
+        cache (SynthesisCache): the synthesis cache, None to always synthesize
+
+    Returns:
+        ExportResult: the exported template filepath and whether it was written
+    """
+    return stack.export(cache=cache)
+
+
+def traced_export_stack(
+    stack: "BaseStack", cache: Optional[SynthesisCache] = None, trace_memory: bool = True
+) -> Tuple[ExportResult, List[Dict[str, Any]]]:
+    """Exports a single stack while tracing its phases, used as the process pool task
+
+    Returns:
+        Tuple[ExportResult, List[Dict[str, Any]]]: the export result and the
+            events recorded in the worker process
+    """
+    tracer = Tracer(trace_memory=trace_memory)
+    start_tracing(tracer)
+    try:
+        return export_stack(stack, cache), tracer.events
+    finally:
+        stop_tracing()
+
+
+def synthesize_stacks(
+    stacks: List["BaseStack"],
+    jobs: int = 1,
+    cache: Optional[SynthesisCache] = None,
+    tracer: Optional[Tracer] = None,
+) -> List[ExportResult]:
+    """Synthesizes and exports the given stacks
+
+    Stacks are independent at synthesis time, so with more than one job they
+    are synthesized in a process pool. Results are always returned in the
+    order of the given stacks, regardless of which worker finishes first.
+
+    Args:
+        stacks (List[BaseStack]): the stacks to synthesize
+        jobs (int): the number of worker processes, 1 synthesizes sequentially
+        cache (SynthesisCache): the synthesis cache, None to always synthesize
+        tracer (Tracer): records the phases of every stack, None to not trace
+
+    Raises:
+        StackSynthesisError: when any stack failed in parallel mode, after
+            every stack has been attempted
+
+    Returns:
+        List[ExportResult]: the exported template filepaths and write outcomes
+    """
+    if jobs <= 1:
+        if tracer is not None:
+            start_tracing(tracer)
+        try:
+            results = [export_stack(stack, cache) for stack in stacks]
+        finally:
+            if tracer is not None:
+                stop_tracing()
+        log_export_summary(results)
+        return results
+
+    # Only paid for when running in parallel
+    from concurrent.futures import ProcessPoolExecutor
+
+    results = []
+    failures = []
+    with ProcessPoolExecutor(max_workers=min(jobs, len(stacks))) as executor:
+        if tracer is None:
+            futures = [executor.submit(export_stack, stack, cache) for stack in stacks]
+        else:
+            futures = [
+                executor.submit(traced_export_stack, stack, cache, tracer.trace_memory)
+                for stack in stacks
+            ]
+        for stack, future in zip(stacks, futures):
+            try:
+                if tracer is None:
+                    results.append(future.result())
+                else:
+                    result, events = future.result()
+                    results.append(result)
+                    tracer.events.extend(events)
+            except Exception as e:
+                logging.error(
+                    f"Stack {stack.template_name} generation failed: {e}", exc_info=e
+                )
+                failures.append(stack.template_name)
+
+    log_export_summary(results)
+    if failures:
+        raise StackSynthesisError(failures)
+    return results
+
+
+def synthesize_tenants(
+    manifest: Path,
+    stack_names: Optional[List[str]] = None,
+    jobs: int = 1,
+    cache: Optional[SynthesisCache] = None,
+    output_format: str = OUTPUT_FORMAT,
+    image_digest: Optional[str] = None,
+) -> Dict[str, List[ExportResult]]:
+    """Synthesizes the stacks for every tenant of the manifest
+
+    Raises:
+        StackSynthesisError: when any tenant stack failed, after every tenant
+            stack has been attempted
+
+    Returns:
+        Dict[str, List[ExportResult]]: the exported templates, by tenant
+    """
+    from fanout import fan_out
+
+    summary = fan_out(
+        manifest,
+        stack_names,
+        jobs=jobs,
+        cache=cache,
+        output_format=output_format,
+        image_digest=image_digest,
+    )
+    logging.info(
+        f"Tenants: {summary.tenants}, templates written: {summary.written}, "
+        f"unchanged: {summary.unchanged}"
+    )
+    if summary.failures:
+        raise StackSynthesisError(summary.failures)
+    return summary.results
+
+
+def log_export_summary(results: List[ExportResult]) -> None:
+    written = sum(1 for result in results if result.written)
+    logging.info(f"Templates written: {written}, unchanged: {len(results) - written}")
+
+
+def export_deploy_order(
+    results: List[ExportResult], check_imports: bool = True, export_folder: str = EXPORT_FOLDER
+) -> ExportResult:
+    """Exports the deploy order of the synthesized stacks to deploy-order.json
+
+    Args:
+        results (List[ExportResult]): the exported templates
+        check_imports (bool): whether every import must be exported by one of
+            the templates, False when only a subset of the stacks is exported
+        export_folder (str): the folder to export to, relative to the working directory
+
+    Returns:
+        ExportResult: the deploy order absolute filepath and whether it was written
+    """
+    plan = deploy_plan([result.path for result in results], check_imports)
+    for index, level in enumerate(plan["levels"], start=1):
+        logging.info(f"Deploy level {index}: {', '.join(level)}")
+    return export_cf_template_to_file(
+        template_filename="deploy-order.json",
+        template_content=json.dumps(plan, indent=2) + "\n",
+        export_folder=export_folder,
+    )
+
+
+def log_template_diffs(results: List[ExportResult], previous_folder: Path) -> None:
+    """Logs the structural changes of the exported templates over previous artifacts
+
+    Args:
+        results (List[ExportResult]): the exported templates
+        previous_folder (Path): the folder holding the previous templates
+    """
+    from template_diff import diff_files
+
+    for result in results:
+        diff = diff_files(previous_folder / result.path.name, result.path)
+        if not diff.changed:
+            logging.info(f"{result.path.name}: no changes")
+            continue
+        logging.info(f"{result.path.name}: {diff.summary()}")
+        for logical_id in diff.added:
+            logging.info(f"  + {logical_id}")
+        for logical_id in diff.removed:
+            logging.info(f"  - {logical_id}")
+        for change in diff.modified:
+            logging.info(
+                f"  ~ {change.logical_id} ({change.action}): {', '.join(change.properties)}"
+            )
+
+
+def build_stack_image(registry: str, manifest: Optional[Path] = None) -> str:
+    """Builds the application image and pushes it to the stacks' repositories
+
+    Args:
+        registry (str): the registry host, e.g.
+            "123456789012.dkr.ecr.eu-west-1.amazonaws.com" or "localhost:5000"
+        manifest (Path): the tenant manifest, whose repositories get the image
+            too, None for the default repository only
+
+    Returns:
+        str: the image digest the task definitions are pinned to
+    """
+    from httpd_config import render_config, write_config
+    from image_build import build_image
+
+    # The image embeds the httpd config generated for the current task size
+    write_config(Path(DOCKERFILE).parent / HTTPD_CONFIG, render_config())
+    names = [ECR_REPO_NAME]
+    if manifest:
+        from fanout import read_manifest, tenant_overrides
+
+        names = [tenant_overrides(row)["ecr_repo_name"] for row in read_manifest(manifest)]
+    image = build_image([f"{registry}/{name}" for name in names])
+    logging.info(f"Image {image.tag}: {image.digest}, pushed to {len(image.pushed)} repositories")
+    return image.digest
+
+
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"{value} is not a positive integer")
+    return number
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=positive_int,
+        default=1,
+        help="number of stacks to synthesize in parallel (default: 1, sequential)",
+    )
+    parser.add_argument(
+        "-s",
+        "--stack",
+        dest="stacks",
+        action="append",
+        choices=STACK_REGISTRY.keys(),
+        help="synthesize only this stack, can be repeated (default: all stacks)",
+    )
+    parser.add_argument(
+        "-f",
+        "--format",
+        dest="output_format",
+        choices=OUTPUT_FORMATS.keys(),
+        default=OUTPUT_FORMAT,
+        help=f"template format, json-min leaves out all whitespace (default: {OUTPUT_FORMAT})",
+    )
+    parser.add_argument(
+        "--manifest",
+        type=Path,
+        metavar="FILE",
+        help="synthesize the stacks for every tenant of this .csv or .jsonl manifest",
+    )
+    parser.add_argument(
+        "--image-registry",
+        metavar="REGISTRY",
+        help="build and push the Dockerfile image to this registry, pinning tasks to its digest",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="always synthesize, bypassing the synthesis cache",
+    )
+    parser.add_argument(
+        "--deploy-order",
+        action="store_true",
+        help="write the cross-stack deploy order to deploy-order.json",
+    )
+    parser.add_argument(
+        "--diff-against",
+        type=Path,
+        metavar="DIR",
+        help="log the resources added, removed and modified since the templates in DIR",
+    )
+    parser.add_argument(
+        "--publish",
+        metavar="S3_URL",
+        help="upload the changed templates to this s3://bucket/prefix",
+    )
+    parser.add_argument(
+        "--publish-endpoint",
+        metavar="URL",
+        help="publish to this S3-compatible endpoint instead of AWS S3",
+    )
+    parser.add_argument(
+        "--trace",
+        type=Path,
+        metavar="FILE",
+        help="write the per-stack phase timings and peak memory to this file",
+    )
+    parser.add_argument(
+        "--trace-format",
+        choices=["jsonl", "chrome"],
+        default="jsonl",
+        help="JSON lines, or a Chrome trace for chrome://tracing (default: jsonl)",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="keep running and re-synthesize the stacks affected by source changes",
+    )
+    args = parser.parse_args(argv)
+    if args.watch:
+        # Watch mode only re-synthesizes and validates the templates
+        for option in ("manifest", "deploy_order", "diff_against", "publish", "trace"):
+            if getattr(args, option):
+                parser.error(f"--watch can't be combined with --{option.replace('_', '-')}")
+    if args.manifest and args.trace:
+        # Tenant stacks are built in the fan-out workers, outside of the tracer
+        parser.error("--manifest can't be combined with --trace")
+    return args
+
+
+def main(argv: Optional[List[str]] = None):
     """Entry point for the application"""
+    args = parse_args(argv)
     logging.basicConfig(level=logging.DEBUG)
     try:
-        synthesize_stacks()
+        cache = None if args.no_cache else SynthesisCache()
+        image_digest = None
+        if args.image_registry:
+            image_digest = build_stack_image(args.image_registry, args.manifest)
+        if args.watch:
+            from watch import Watcher
+
+            try:
+                Watcher(
+                    stack_names=args.stacks,
+                    output_format=args.output_format,
+                    cache=cache,
+                    image_digest=image_digest,
+                ).run()
+            except KeyboardInterrupt:
+                pass
+            return
+        if args.manifest:
+            tenant_results = synthesize_tenants(
+                args.manifest,
+                args.stacks,
+                jobs=args.jobs,
+                cache=cache,
+                output_format=args.output_format,
+                image_digest=image_digest,
+            )
+        else:
+            tracer = Tracer() if args.trace else None
+            stacks = build_stacks(
+                args.stacks, output_format=args.output_format, image_digest=image_digest
+            )
+            results = synthesize_stacks(stacks, jobs=args.jobs, cache=cache, tracer=tracer)
+            if tracer is not None:
+                if args.trace_format == "chrome":
+                    tracer.write_chrome_trace(args.trace)
+                else:
+                    tracer.write_jsonl(args.trace)
+            # A single run is the tenant exporting to the root of the export folder
+            tenant_results = {"": results}
+        if cache is not None:
+            # Once per run, the workers storing entries hold copies of the cache
+            cache.evict()
+
+        all_stacks = set(args.stacks or STACK_REGISTRY) == set(STACK_REGISTRY)
+        results = [result for templates in tenant_results.values() for result in templates]
+        # Validated together, so tenants exporting the same names are caught too
+        validate_files(
+            [result.path for result in results], jobs=args.jobs, check_imports=all_stacks
+        )
+        logging.info(f"Validated {len(results)} templates")
+        artifacts = [result.path for result in results]
+        for tenant, templates in tenant_results.items():
+            if args.diff_against:
+                log_template_diffs(templates, args.diff_against / tenant)
+            if args.deploy_order:
+                export_folder = f"{EXPORT_FOLDER}/{tenant}" if tenant else EXPORT_FOLDER
+                artifacts.append(
+                    export_deploy_order(templates, all_stacks, export_folder=export_folder).path
+                )
+        if args.publish:
+            from publish import publish_templates
+
+            publish_templates(
+                artifacts,
+                args.publish,
+                endpoint=args.publish_endpoint,
+                root=Path.cwd() / EXPORT_FOLDER,
+            )
     except Exception as e:
         logging.exception(f"Stack YAML generation failed: {e}")
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,307 @@
+"""Publishes the exported templates to an S3 bucket
+
+Templates are uploaded concurrently from a thread pool, each thread reusing a
+single keep-alive connection to the endpoint. Every object carries the SHA-256
+digest of its content in its metadata, so templates whose digest matches the
+published object are skipped after a HEAD request. Templates are uploaded with
+a single PUT: CloudFormation caps them well below the smallest S3 part size.
+
+Requests are signed with AWS Signature Version 4, using the credentials of the
+standard AWS_* environment variables. Any S3-compatible endpoint (e.g. MinIO
+or LocalStack) can stand in for S3 with `endpoint`, addressed in path style.
+"""
+
+import datetime
+import hashlib
+import hmac
+import http.client
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote, urlsplit
+
+from constants import PUBLISH_WORKERS
+from utils import file_digest
+
+DIGEST_METADATA = "x-amz-meta-sha256"
+CONTENT_TYPES = {".yaml": "application/x-yaml", ".json": "application/json"}
+# Requests safe to send again when the connection drops before the response
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "PUT", "DELETE"})
+
+
+class PublishError(Exception):
+    """Raised when S3 rejects a request"""
+
+    def __init__(self, method: str, key: str, status: int, body: bytes) -> None:
+        self.status = status
+        super().__init__(f"{method} {key} failed with {status}: {body.decode(errors='replace')}")
+
+
+@dataclass(frozen=True)
+class Credentials:
+    access_key: str
+    secret_key: str
+    session_token: Optional[str] = None
+
+    @classmethod
+    def from_environ(cls) -> "Credentials":
+        """Reads the credentials from the standard AWS environment variables
+
+        Raises:
+            KeyError: when the access key or secret key is not set
+        """
+        return cls(
+            access_key=os.environ["AWS_ACCESS_KEY_ID"],
+            secret_key=os.environ["AWS_SECRET_ACCESS_KEY"],
+            session_token=os.environ.get("AWS_SESSION_TOKEN"),
+        )
+
+
+@dataclass
+class PublishResult:
+    """The outcome of publishing a template"""
+
+    key: str
+    uploaded: bool
+
+
+def parse_destination(destination: str) -> Tuple[str, str]:
+    """Splits an `s3://bucket/prefix` destination into its bucket and key prefix
+
+    Raises:
+        ValueError: when the destination is not an s3:// URL with a bucket
+    """
+    parsed = urlsplit(destination)
+    if parsed.scheme != "s3" or not parsed.netloc:
+        raise ValueError(
+            f"Invalid publish destination '{destination}', expected s3://bucket/prefix"
+        )
+    prefix = parsed.path.strip("/")
+    return parsed.netloc, f"{prefix}/" if prefix else ""
+
+
+def _query_string(query: Dict[str, str]) -> str:
+    """The canonical query string, which S3 also accepts as the request query"""
+    return "&".join(
+        f"{quote(name, safe='-_.~')}={quote(value, safe='-_.~')}"
+        for name, value in sorted(query.items())
+    )
+
+
+def _hmac(key: bytes, message: str) -> bytes:
+    return hmac.new(key, message.encode(), hashlib.sha256).digest()
+
+
+class S3Client:
+    """A minimal S3 client signing its requests with Signature Version 4
+
+    Each thread keeps its own keep-alive connection until the client is
+    closed. Idempotent requests are retried once on a fresh connection when
+    the endpoint closed it.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        region: str,
+        credentials: Credentials,
+        endpoint: Optional[str] = None,
+    ) -> None:
+        self.bucket = bucket
+        self.region = region
+        self.credentials = credentials
+        if endpoint:
+            parsed = urlsplit(endpoint)
+            self.secure = parsed.scheme == "https"
+            self.host = parsed.netloc
+            self.base_path = f"/{bucket}"
+        else:
+            self.secure = True
+            self.host = f"{bucket}.s3.{region}.amazonaws.com"
+            self.base_path = ""
+        self._local = threading.local()
+        self._connections: List[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+
+    def _connection(self, fresh: bool = False) -> http.client.HTTPConnection:
+        connection = getattr(self._local, "connection", None)
+        if connection is not None and not fresh:
+            return connection
+        if connection is not None:
+            connection.close()
+        else:
+            connection_class = (
+                http.client.HTTPSConnection if self.secure else http.client.HTTPConnection
+            )
+            connection = self._local.connection = connection_class(self.host, timeout=60)
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def close(self) -> None:
+        """Closes the connections of every thread"""
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+
+    def sign(
+        self,
+        method: str,
+        path: str,
+        query: Dict[str, str],
+        headers: Dict[str, str],
+        body: bytes,
+        now: Optional[datetime.datetime] = None,
+    ) -> Dict[str, str]:
+        """Returns the request headers with the Signature Version 4 authorization"""
+        now = now or datetime.datetime.now(datetime.timezone.utc)
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        scope = f"{now:%Y%m%d}/{self.region}/s3/aws4_request"
+
+        headers = {
+            **{name.lower(): value.strip() for name, value in headers.items()},
+            "host": self.host,
+            "x-amz-content-sha256": hashlib.sha256(body).hexdigest(),
+            "x-amz-date": amz_date,
+        }
+        if self.credentials.session_token:
+            headers["x-amz-security-token"] = self.credentials.session_token
+        signed_headers = ";".join(sorted(headers))
+        canonical_request = "\n".join(
+            [
+                method,
+                quote(path, safe="/~"),
+                _query_string(query),
+                "".join(f"{name}:{headers[name]}\n" for name in sorted(headers)),
+                signed_headers,
+                headers["x-amz-content-sha256"],
+            ]
+        )
+        string_to_sign = "\n".join(
+            [
+                "AWS4-HMAC-SHA256",
+                amz_date,
+                scope,
+                hashlib.sha256(canonical_request.encode()).hexdigest(),
+            ]
+        )
+
+        signing_key = f"AWS4{self.credentials.secret_key}".encode()
+        for part in (f"{now:%Y%m%d}", self.region, "s3", "aws4_request"):
+            signing_key = _hmac(signing_key, part)
+        signature = hmac.new(signing_key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+        headers["authorization"] = (
+            f"AWS4-HMAC-SHA256 Credential={self.credentials.access_key}/{scope}, "
+            f"SignedHeaders={signed_headers}, Signature={signature}"
+        )
+        return headers
+
+    def request(
+        self,
+        method: str,
+        key: str,
+        query: Optional[Dict[str, str]] = None,
+        body: bytes = b"",
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Tuple[int, http.client.HTTPMessage, bytes]:
+        """Sends a signed request for an object of the bucket
+
+        Raises:
+            PublishError: when the response status is not 2xx, or 404 for HEAD
+
+        Returns:
+            Tuple[int, HTTPMessage, bytes]: the response status, headers and body
+        """
+        query = query or {}
+        path = f"{self.base_path}/{key}"
+        signed = self.sign(method, path, query, headers or {}, body)
+        url = quote(path, safe="/~")
+        if query:
+            url += f"?{_query_string(query)}"
+
+        for attempt in range(2):
+            connection = self._connection(fresh=attempt > 0)
+            try:
+                connection.request(method, url, body=body, headers=signed)
+                response = connection.getresponse()
+                content = response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                if attempt or method not in IDEMPOTENT_METHODS:
+                    raise
+
+        if response.status >= 300 and not (method == "HEAD" and response.status == 404):
+            raise PublishError(method, key, response.status, content)
+        return response.status, response.headers, content
+
+    def object_digest(self, key: str) -> Optional[str]:
+        """Returns the content digest of a published object, None if it doesn't exist"""
+        status, headers, _ = self.request("HEAD", key)
+        return None if status == 404 else headers.get(DIGEST_METADATA)
+
+    def put_object(self, key: str, body: bytes, headers: Dict[str, str]) -> None:
+        self.request("PUT", key, body=body, headers=headers)
+
+
+def publish_file(client: S3Client, path: Path, key: str) -> PublishResult:
+    """Uploads a template unless the published object has the same content"""
+    digest = file_digest(path)
+    if client.object_digest(key) == digest:
+        return PublishResult(key=key, uploaded=False)
+
+    headers = {
+        "Content-Type": CONTENT_TYPES.get(path.suffix, "application/octet-stream"),
+        DIGEST_METADATA: digest,
+    }
+    client.put_object(key, path.read_bytes(), headers)
+    return PublishResult(key=key, uploaded=True)
+
+
+def publish_templates(
+    paths: List[Path],
+    destination: str,
+    endpoint: Optional[str] = None,
+    workers: int = PUBLISH_WORKERS,
+    client: Optional[S3Client] = None,
+    root: Optional[Path] = None,
+) -> List[PublishResult]:
+    """Publishes the templates under the destination, skipping unchanged ones
+
+    Args:
+        paths (List[Path]): the template filepaths
+        destination (str): the `s3://bucket/prefix` to publish to
+        endpoint (str): the URL of an S3-compatible endpoint, None for AWS S3
+        workers (int): the number of concurrent uploads
+        client (S3Client): the client to publish with, built from the
+            environment when None
+        root (Path): the folder whose layout is kept under the prefix, e.g.
+            `dist` publishes `dist/acme/acme-vpc.yaml` as `acme/acme-vpc.yaml`,
+            None to publish the templates under their filename
+
+    Returns:
+        List[PublishResult]: the published keys and whether they were uploaded,
+            in the order of the paths
+    """
+    bucket, prefix = parse_destination(destination)
+    if client is None:
+        region = os.environ.get("AWS_REGION") or os.environ.get("AWS_DEFAULT_REGION", "us-east-1")
+        client = S3Client(bucket, region, Credentials.from_environ(), endpoint=endpoint)
+
+    def publish(path: Path) -> PublishResult:
+        path = Path(path)
+        name = path.name if root is None else path.relative_to(root).as_posix()
+        return publish_file(client, path, f"{prefix}{name}")
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(paths)))) as executor:
+            results = list(executor.map(publish, paths))
+    finally:
+        client.close()
+
+    uploaded = sum(1 for result in results if result.uploaded)
+    logging.info(f"Templates published: {uploaded}, unchanged: {len(results) - uploaded}")
+    return results
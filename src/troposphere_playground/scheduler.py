@@ -0,0 +1,166 @@
+"""Orders stack deployments from the exports and imports of their templates
+"""
+
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Set
+
+
+class DanglingImportError(Exception):
+    """Raised when a stack imports a value that no stack exports"""
+
+    def __init__(self, dangling: Dict[str, List[str]]) -> None:
+        self.dangling = dangling
+        details = "; ".join(
+            f"{stack} imports {', '.join(names)}" for stack, names in dangling.items()
+        )
+        super().__init__(f"Imports without a matching export: {details}")
+
+
+class DependencyCycleError(Exception):
+    """Raised when stacks import each other's exports in a cycle"""
+
+    def __init__(self, stacks: List[str]) -> None:
+        self.stacks = stacks
+        super().__init__(f"Cyclic cross-stack dependencies between: {', '.join(stacks)}")
+
+
+def load_template(path: Path) -> Dict[str, Any]:
+    """Parses a synthesized YAML or JSON template file into its dict form
+
+    Args:
+        path (Path): the template filepath
+
+    Returns:
+        Dict[str, Any]: the template, with intrinsic functions in their long form
+    """
+    # cfn-flip pulls in PyYAML, only paid for once templates are loaded
+    import cfn_flip
+
+    template, _ = cfn_flip.load(Path(path).read_text())
+    return template
+
+
+def _import_values(node: Any) -> Iterator[str]:
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key == "Fn::ImportValue" and isinstance(value, str):
+                yield value
+            else:
+                yield from _import_values(value)
+    elif isinstance(node, list):
+        for item in node:
+            yield from _import_values(item)
+
+
+def template_exports(template: Dict[str, Any]) -> Set[str]:
+    """Returns the names of the values exported by the template's outputs"""
+    return {
+        output["Export"]["Name"]
+        for output in template.get("Outputs", {}).values()
+        if isinstance(output.get("Export", {}).get("Name"), str)
+    }
+
+
+def template_imports(template: Dict[str, Any]) -> Set[str]:
+    """Returns the names of the exported values the template imports"""
+    return set(_import_values(template.get("Resources", {}))) | set(
+        _import_values(template.get("Outputs", {}))
+    )
+
+
+def stack_dependencies(
+    templates: Dict[str, Dict[str, Any]], check_imports: bool = True
+) -> Dict[str, Set[str]]:
+    """Maps each stack to the stacks exporting the values it imports
+
+    Args:
+        templates (Dict[str, Dict[str, Any]]): the templates, keyed by stack name
+        check_imports (bool): whether every import must be exported by one of
+            the templates, False to ignore the imports of stacks outside the
+            selection when only a subset of the stacks is planned
+
+    Raises:
+        DanglingImportError: when an imported value is not exported by any stack
+            and imports are checked
+
+    Returns:
+        Dict[str, Set[str]]: the dependencies of each stack
+    """
+    exporters = {
+        name: stack for stack, template in templates.items()
+        for name in template_exports(template)
+    }
+
+    dependencies = {}
+    dangling = {}
+    for stack, template in templates.items():
+        imports = template_imports(template)
+        missing = sorted(imports - exporters.keys())
+        if missing:
+            dangling[stack] = missing
+        dependencies[stack] = {
+            exporters[name] for name in imports if name in exporters
+        } - {stack}
+
+    if dangling and check_imports:
+        raise DanglingImportError(dangling)
+    return dependencies
+
+
+def deploy_levels(dependencies: Dict[str, Set[str]]) -> List[List[str]]:
+    """Sorts the stacks topologically into levels that can be deployed in parallel
+
+    Every stack of a level only depends on stacks of the previous levels.
+
+    Args:
+        dependencies (Dict[str, Set[str]]): the dependencies of each stack
+
+    Raises:
+        DependencyCycleError: when the dependencies contain a cycle
+
+    Returns:
+        List[List[str]]: the deploy levels, each sorted by stack name
+    """
+    remaining = {stack: set(requires) for stack, requires in dependencies.items()}
+    dependents: Dict[str, Set[str]] = {stack: set() for stack in remaining}
+    for stack, requires in remaining.items():
+        for required in requires:
+            dependents[required].add(stack)
+
+    levels = []
+    ready = sorted(stack for stack, requires in remaining.items() if not requires)
+    while ready:
+        levels.append(ready)
+        next_ready = []
+        for stack in ready:
+            for dependent in dependents[stack]:
+                remaining[dependent].discard(stack)
+                if not remaining[dependent]:
+                    next_ready.append(dependent)
+        ready = sorted(next_ready)
+
+    deployed = {stack for level in levels for stack in level}
+    if len(deployed) < len(remaining):
+        raise DependencyCycleError(sorted(remaining.keys() - deployed))
+    return levels
+
+
+def deploy_plan(paths: List[Path], check_imports: bool = True) -> Dict[str, Any]:
+    """Builds the deploy plan of the synthesized template files
+
+    Args:
+        paths (List[Path]): the template filepaths, each named after its stack
+        check_imports (bool): whether every import must be exported by one of
+            the templates, False when only a subset of the stacks is planned
+
+    Returns:
+        Dict[str, Any]: the deploy levels and the dependencies of each stack
+    """
+    templates = {Path(path).stem: load_template(path) for path in paths}
+    dependencies = stack_dependencies(templates, check_imports)
+    return {
+        "levels": deploy_levels(dependencies),
+        "dependencies": {
+            stack: sorted(requires) for stack, requires in sorted(dependencies.items())
+        },
+    }
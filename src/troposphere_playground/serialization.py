@@ -0,0 +1,134 @@
+"""Streams templates to a file handle, one resource at a time
+
+The YAML output is byte-identical to `Template.to_yaml()`, and the minified
+JSON output to the compact form of `Template.to_json()`. Instead of rendering
+the whole template into one dict and one string first, each resource is
+rendered and written on its own, so only a single resource's serialized form
+is held in memory at a time. Minified JSON is encoded straight from the
+rendered dicts with the C accelerated encoder, which outruns `to_json()`.
+
+Indented JSON is written with `Template.to_json()`: its encoder falls back to
+pure Python, and was measured faster than an indented per-resource writer on
+the stacks' templates. Templates rendered to a string rather than streamed
+use `to_yaml()` and `to_json()` for the same reason.
+
+troposphere and cfn-flip are imported on first use, so importing the output
+formats doesn't slow down the CLI startup.
+"""
+
+import io
+import json
+from functools import partial
+from typing import TYPE_CHECKING, Any, Callable, Dict, TextIO
+
+if TYPE_CHECKING:
+    from troposphere import Template
+
+RESOURCES_HEADER = "Resources:\n"
+# Output formats, with the extension of their template files
+OUTPUT_FORMATS = {"yaml": ".yaml", "json": ".json", "json-min": ".json"}
+
+
+def _yaml_section(key: str, value: Any) -> str:
+    import cfn_flip
+
+    # Same JSON round trip as Template.to_yaml, for identical key order and styles
+    return cfn_flip.to_yaml(json.dumps({key: value}, sort_keys=True))
+
+
+def template_sections(template: "Template") -> Dict[str, Any]:
+    """Renders every top-level section of the template but its resources"""
+    resources = template.resources
+    template.resources = {}
+    try:
+        sections = template.to_dict()
+    finally:
+        template.resources = resources
+    return sections
+
+
+def write_yaml(template: "Template", stream: TextIO) -> None:
+    """Writes the template as YAML to the stream, resource by resource
+
+    Args:
+        template (Template): the troposphere template
+        stream (TextIO): the file handle to write to
+    """
+    from troposphere import encode_to_dict
+
+    sections = template_sections(template)
+    for key in sorted(sections):
+        if key != "Resources" or not template.resources:
+            stream.write(_yaml_section(key, sections[key]))
+            continue
+
+        stream.write(RESOURCES_HEADER)
+        for title in sorted(template.resources):
+            resource = encode_to_dict(template.resources[title])
+            stream.write(_yaml_section(key, {title: resource})[len(RESOURCES_HEADER):])
+
+
+def write_minified_json(template: "Template", stream: TextIO) -> None:
+    """Writes the template as minified JSON to the stream, resource by resource
+
+    Args:
+        template (Template): the troposphere template
+        stream (TextIO): the file handle to write to
+    """
+    from troposphere import encode_to_dict
+
+    encode = partial(json.dumps, sort_keys=True, separators=(",", ":"))
+    sections = template_sections(template)
+    stream.write("{")
+    for index, key in enumerate(sorted(sections)):
+        if index:
+            stream.write(",")
+        stream.write(f"{json.dumps(key)}:")
+        if key != "Resources" or not template.resources:
+            stream.write(encode(sections[key]))
+            continue
+
+        stream.write("{")
+        for resource_index, title in enumerate(sorted(template.resources)):
+            if resource_index:
+                stream.write(",")
+            resource = encode_to_dict(template.resources[title])
+            stream.write(f"{json.dumps(title)}:{encode(resource)}")
+        stream.write("}")
+    stream.write("}")
+
+
+def write_json(template: "Template", stream: TextIO) -> None:
+    """Writes the template as indented JSON to the stream, like `Template.to_json()`"""
+    stream.write(template.to_json())
+
+
+def template_writer(output_format: str) -> Callable[["Template", TextIO], None]:
+    """Returns the function streaming templates in the output format
+
+    Raises:
+        ValueError: when the output format is unknown
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(
+            f"Unknown output format '{output_format}', expected one of {', '.join(OUTPUT_FORMATS)}"
+        )
+    return {"yaml": write_yaml, "json": write_json, "json-min": write_minified_json}[
+        output_format
+    ]
+
+
+def render(template: "Template", output_format: str) -> str:
+    """Renders the template to a string in the output format
+
+    Raises:
+        ValueError: when the output format is unknown
+    """
+    write_template = template_writer(output_format)
+    if output_format == "yaml":
+        return template.to_yaml()
+    if output_format == "json":
+        return template.to_json()
+    stream = io.StringIO()
+    write_template(template, stream)
+    return stream.getvalue()
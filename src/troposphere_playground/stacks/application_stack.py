@@ -1,40 +1,124 @@
-import logging
+from dataclasses import asdict
+from typing import Optional
+
 from troposphere import ImportValue
 
+from constants import (
+    AZ_PRIVATE_NUMBER,
+    AZ_PUBLIC_NUMBER,
+    ECR_REPO_NAME,
+    FARGATE_CPU,
+    FARGATE_MEMORY,
+    LOG_MAX_BUFFER_SIZE,
+    LOG_RETENTION_DAYS,
+    SCALING_CPU_TARGET,
+    SCALING_MAX_CAPACITY,
+    SCALING_MEMORY_TARGET,
+    SCALING_MIN_CAPACITY,
+    SCALING_REQUESTS_TARGET,
+)
+
+from httpd_config import validate_image_task_size
+from intrinsics import intrinsic
 from stacks.base_stack import BaseStack
+from utils import az_name, export_name
 from constructs.fargate_construct import FargateConstruct, FargateConstructProps
-from constructs.alb_construct import AlbConstruct, AlbConstructProps
+from constructs.alb_construct import AlbConstruct, AlbConstructProps, AlbProfile
+from constructs.scaling_construct import ScalingConstruct, ScalingConstructProps
 
 
 class AppStack(BaseStack):
-    def __init__(self, template_name: str, template_description: str):
-        super().__init__(template_name, template_description)
+    def __init__(
+        self,
+        template_name: str,
+        template_description: str,
+        ecr_repo_name: str = ECR_REPO_NAME,
+        image_digest: Optional[str] = None,
+        cpu: str = FARGATE_CPU,
+        memory: str = FARGATE_MEMORY,
+        min_capacity: int = SCALING_MIN_CAPACITY,
+        max_capacity: int = SCALING_MAX_CAPACITY,
+        alb_profile: Optional[AlbProfile] = None,
+        **kwargs,
+    ):
+        super().__init__(template_name, template_description, **kwargs)
+        self.ecr_repo_name = ecr_repo_name
+        # The pushed image digest, the containers run the ECR_IMAGE_VERSION tag without it
+        self.image_digest = image_digest
+        # Task size, and bounds of the task count the service scales within
+        self.cpu = cpu
+        self.memory = memory
+        self.min_capacity = min_capacity
+        self.max_capacity = max_capacity
+        # The load balancer settings, the ALB_* constants when None
+        self.alb_profile = alb_profile or AlbProfile()
 
-        self.vpc = ImportValue("TropoVPC")
-        self.alb_subnet_1 = ImportValue("TropoAlbSubnet1")
-        self.alb_subnet_2 = ImportValue("TropoAlbSubnet2")
-        self.private_subnet = ImportValue("TropoPrivateSubnet")
+        self.vpc = intrinsic(ImportValue, export_name(self.tag_prefix, "VPC"))
+        self.alb_subnets = [
+            intrinsic(ImportValue, export_name(self.tag_prefix, f"AlbSubnet{number}"))
+            for number in range(1, AZ_PUBLIC_NUMBER + 1)
+        ]
+        self.private_subnets = [
+            intrinsic(ImportValue, export_name(self.tag_prefix, az_name("PrivateSubnet", number)))
+            for number in range(1, AZ_PRIVATE_NUMBER + 1)
+        ]
 
-    def synth(self) -> str:
-        logging.info(f"Synthesizing {self.template_name} stack...")
+    def cache_parameters(self):
+        return {
+            **super().cache_parameters(),
+            "ecr_repo_name": self.ecr_repo_name,
+            "image_digest": self.image_digest,
+            "cpu": self.cpu,
+            "memory": self.memory,
+            "min_capacity": self.min_capacity,
+            "max_capacity": self.max_capacity,
+            "alb_profile": asdict(self.alb_profile),
+        }
 
-        alb = AlbConstruct(
-            template=self.template,
-            props=AlbConstructProps(
+    def stack_definition(self):
+        validate_image_task_size(self.cpu, self.memory, self.alb_profile.idle_timeout)
+        alb = self.constructs.define(
+            AlbConstruct,
+            AlbConstructProps(
                 vpc=self.vpc,
-                alb_subnet_1=self.alb_subnet_1,
-                alb_subnet_2=self.alb_subnet_2,
+                alb_subnets=self.alb_subnets,
+                profile=self.alb_profile,
+                tag_prefix=self.tag_prefix,
             ),
         )
 
-        fargate = FargateConstruct(
-            template=self.template,
-            props=FargateConstructProps(
+        fargate = self.constructs.define(
+            FargateConstruct,
+            FargateConstructProps(
                 vpc=self.vpc,
-                fargate_subnet=self.private_subnet,
-                alb_target_group=alb.fargate_target_group,
-                alb_security_group=alb.alb_security_group,
+                fargate_subnets=self.private_subnets,
+                alb_target_group=alb["fargate_target_group"],
+                alb_security_group=alb["alb_security_group"],
+                ecr_repo_name=self.ecr_repo_name,
+                image_digest=self.image_digest,
+                cpu=self.cpu,
+                memory=self.memory,
+                # The ScalingConstruct keeps the count within the capacity bounds
+                desired_count=None,
+                log_retention_days=LOG_RETENTION_DAYS,
+                log_max_buffer_size=LOG_MAX_BUFFER_SIZE,
+                tag_prefix=self.tag_prefix,
             ),
         )
 
-        return self.template.to_yaml()
+        self.constructs.define(
+            ScalingConstruct,
+            ScalingConstructProps(
+                cluster=fargate["cluster"],
+                fargate_service=fargate["fargate_service"],
+                alb=alb["alb"],
+                alb_target_group=alb["fargate_target_group"],
+                alb_listener=alb["listener"],
+                min_capacity=self.min_capacity,
+                max_capacity=self.max_capacity,
+                cpu_target=SCALING_CPU_TARGET,
+                memory_target=SCALING_MEMORY_TARGET,
+                requests_target=SCALING_REQUESTS_TARGET,
+                tag_prefix=self.tag_prefix,
+            ),
+        )
@@ -1,37 +1,132 @@
 import logging
+from functools import partial
+from typing import Any, Dict, Optional
 from troposphere import Template
 
-from utils import export_cf_template_to_file
+from constants import EXPORT_FOLDER, OUTPUT_FORMAT, TAG_PREFIX
+
+from cache import SynthesisCache
+from constructs.registry import ConstructRegistry
+from instrumentation import phase
+from serialization import OUTPUT_FORMATS, render, template_writer
+from utils import ExportResult, export_cf_template_stream, export_cf_template_to_file
 
 
 class BaseStack:
     """The base stack to be used as a boilerplate"""
 
-    def __init__(self, template_name, template_description) -> None:
+    def __init__(
+        self,
+        template_name,
+        template_description,
+        tag_prefix: str = TAG_PREFIX,
+        export_folder: str = EXPORT_FOLDER,
+        output_format: str = OUTPUT_FORMAT,
+    ) -> None:
         """The constructor
 
         Args:
             template_name (str): the name of the template that will be used for the output filename
             template_description (str): a short description
+            tag_prefix (str): the prefix of the resources tags and cross-stack exports
+            export_folder (str): the folder the template is exported to
+            output_format (str): the template format, "yaml", "json" or "json-min"
+
+        Raises:
+            ValueError: when the output format is unknown
         """
         self.template_name = template_name
+        self.template_description = template_description
+        self.tag_prefix = tag_prefix
+        self.export_folder = export_folder
+        self.output_format = output_format
+        self.write_template = template_writer(output_format)
         self.template = Template()
         self.template.set_version("2010-09-09")
         self.template.set_description(template_description)
+        self.constructs = ConstructRegistry(self.template)
 
-    def synth(self) -> str:
-        """Synthesizes the YAML CF template's contents using Troposphere
+    def cache_parameters(self) -> Dict[str, Any]:
+        """The constructor arguments the synthesized template depends on
 
         Returns:
-            str: the YAML template as a string
+            Dict[str, Any]: the arguments, used as part of the synthesis cache key
         """
+        return {
+            "template_name": self.template_name,
+            "template_description": self.template_description,
+            "tag_prefix": self.tag_prefix,
+            "output_format": self.output_format,
+        }
+
+    def stack_definition(self):
+        """Adds the stack's resources and outputs to the template using Troposphere"""
         pass
 
-    def export(self):
-        """Exports the YAML CF template content to a file, named after the template's name"""
+    def synth(self) -> str:
+        """Synthesizes the CF template's contents using Troposphere
+
+        Returns:
+            str: the template as a string, in the stack's output format
+        """
+        logging.info(f"Synthesizing {self.template_name} stack...")
+        self.stack_definition()
+        self.constructs.compact()
+        return render(self.template, self.output_format)
+
+    def export(self, cache: Optional[SynthesisCache] = None) -> ExportResult:
+        """Exports the CF template content to a file, named after the template's name
+
+        The template is streamed to the file resource by resource rather than
+        synthesized into a single string first.
+
+        Args:
+            cache (SynthesisCache): when given, synthesis is skipped if the cache
+                already holds the template content
+
+        Returns:
+            ExportResult: the template absolute filepath and whether it was written
+        """
         logging.info(f"Exporting {self.template_name} stack...")
-        pathname = export_cf_template_to_file(
-            template_content=self.synth(),
-            template_filename=f"{self.template_name}.yaml",
+        with phase(self.template_name, "stack") as phase_args:
+            result = self._export(cache)
+            phase_args["resources"] = len(self.template.resources)
+            phase_args["outputs"] = len(self.template.outputs)
+            phase_args["written"] = result.written
+
+        if result.written:
+            logging.info(f"Exported {self.template_name} stack to {result.path}")
+        else:
+            logging.info(f"Unchanged {self.template_name} stack at {result.path}")
+        return result
+
+    def _export(self, cache: Optional[SynthesisCache]) -> ExportResult:
+        suffix = OUTPUT_FORMATS[self.output_format]
+        template_filename = f"{self.template_name}{suffix}"
+        template_content = None
+        if cache is not None:
+            with phase(self.template_name, "cache") as phase_args:
+                cache_key = cache.key(self)
+                template_content = cache.get(cache_key, suffix)
+                phase_args["hit"] = template_content is not None
+
+        if template_content is not None:
+            logging.info(f"Using cached {self.template_name} stack")
+            return export_cf_template_to_file(
+                template_content=template_content,
+                template_filename=template_filename,
+                export_folder=self.export_folder,
+            )
+
+        logging.info(f"Synthesizing {self.template_name} stack...")
+        with phase(self.template_name, "definition"):
+            self.stack_definition()
+            self.constructs.compact()
+        result = export_cf_template_stream(
+            template_filename=template_filename,
+            write_template=partial(self.write_template, self.template),
+            export_folder=self.export_folder,
         )
-        logging.info(f"Exported {self.template_name} stack to {pathname}")
+        if cache is not None:
+            cache.put_file(cache_key, result.path)
+        return result
@@ -1,6 +1,5 @@
-import logging
 from stacks.base_stack import BaseStack
-from troposphere import ImportValue, Join, Ref, AWS_ACCOUNT_ID, AWS_REGION, Output
+from troposphere import ImportValue, Join, Ref, Output
 from troposphere.ecr import Repository
 
 
@@ -9,25 +8,40 @@ from awacs.aws import Allow, AWSPrincipal, PolicyDocument, Statement
 
 
 from constants import ECR_REPO_NAME
-from utils import tag
+from intrinsics import ACCOUNT_ID, REGION, intrinsic
+from utils import export_name, tag
 
 
 class EcrStack(BaseStack):
-    def __init__(self, template_name: str, template_description: str):
-        super().__init__(template_name, template_description)
+    def __init__(
+        self,
+        template_name: str,
+        template_description: str,
+        ecr_repo_name: str = ECR_REPO_NAME,
+        **kwargs,
+    ):
+        super().__init__(template_name, template_description, **kwargs)
+        self.ecr_repo_name = ecr_repo_name
 
-        self.vpc = ImportValue("TropoVPC")
-        self.public_subnet_1 = ImportValue("TropoPublicSubnet1")
-        self.public_subnet_2 = ImportValue("TropoPublicSubnet2")
-        self.private_subnet = ImportValue("TropoPrivateSubnet")
+        self.vpc = intrinsic(ImportValue, export_name(self.tag_prefix, "VPC"))
+        self.public_subnet_1 = intrinsic(
+            ImportValue, export_name(self.tag_prefix, "PublicSubnet1")
+        )
+        self.public_subnet_2 = intrinsic(
+            ImportValue, export_name(self.tag_prefix, "PublicSubnet2")
+        )
+        self.private_subnet = intrinsic(
+            ImportValue, export_name(self.tag_prefix, "PrivateSubnet")
+        )
 
-    def synth(self) -> str:
-        logging.info(f"Synthesizing {self.template_name} stack...")
+    def cache_parameters(self):
+        return {**super().cache_parameters(), "ecr_repo_name": self.ecr_repo_name}
 
+    def stack_definition(self):
         repository = self.template.add_resource(
             Repository(
                 "TropoRepository",
-                RepositoryName=ECR_REPO_NAME,
+                RepositoryName=self.ecr_repo_name,
                 RepositoryPolicyText=PolicyDocument(
                     Version="2008-10-17",
                     Statement=[
@@ -36,11 +50,12 @@ class EcrStack(BaseStack):
                             Effect=Allow,
                             Principal=AWSPrincipal(
                                 [
-                                    Join(
+                                    intrinsic(
+                                        Join,
                                         "",
                                         [
                                             "arn:aws:iam::",
-                                            Ref(AWS_ACCOUNT_ID),
+                                            ACCOUNT_ID,
                                             ":root",
                                         ],
                                     )
@@ -58,7 +73,7 @@ class EcrStack(BaseStack):
                         ),
                     ],
                 ),
-                Tags=tag("ecr"),
+                Tags=tag("ecr", self.tag_prefix),
             )
         )
 
@@ -70,14 +85,12 @@ class EcrStack(BaseStack):
                 Value=Join(
                     "",
                     [
-                        Ref(AWS_ACCOUNT_ID),
+                        ACCOUNT_ID,
                         ".dkr.ecr.",
-                        Ref(AWS_REGION),
+                        REGION,
                         ".amazonaws.com/",
                         Ref(repository),
                     ],
                 ),
             )
         )
-
-        return self.template.to_yaml()
@@ -0,0 +1,104 @@
+"""The registry of the stacks the application can synthesize
+
+Stack modules, and the troposphere/awacs submodules they depend on, are only
+imported when a stack is built, so selecting a single stack doesn't pay the
+import cost of the others.
+"""
+
+import importlib
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from constants import EXPORT_FOLDER, OUTPUT_FORMAT, TAG_PREFIX
+
+if TYPE_CHECKING:
+    from stacks.base_stack import BaseStack
+
+
+@dataclass(frozen=True)
+class StackSpec:
+    module: str
+    class_name: str
+    template_description: str
+    # The constructor overrides the stack accepts, besides the tag prefix
+    parameters: Tuple[str, ...] = ()
+
+    def build(
+        self,
+        name: str,
+        tag_prefix: str = TAG_PREFIX,
+        export_folder: str = EXPORT_FOLDER,
+        output_format: str = OUTPUT_FORMAT,
+        **overrides: Any,
+    ) -> "BaseStack":
+        """Imports the stack module and instantiates the stack
+
+        Args:
+            name (str): the registry name of the stack, used as template name suffix
+            tag_prefix (str): the prefix of the template name, resources tags and exports
+            export_folder (str): the folder the template is exported to
+            output_format (str): the template format, "yaml", "json" or "json-min"
+            **overrides: constructor overrides, those the stack doesn't accept are ignored
+
+        Returns:
+            BaseStack: the stack, ready to be synthesized
+        """
+        stack_class = getattr(importlib.import_module(self.module), self.class_name)
+        return stack_class(
+            template_name=f"{tag_prefix}-{name}",
+            template_description=self.template_description,
+            tag_prefix=tag_prefix,
+            export_folder=export_folder,
+            output_format=output_format,
+            **{key: value for key, value in overrides.items() if key in self.parameters},
+        )
+
+
+STACK_REGISTRY: Dict[str, StackSpec] = {
+    "vpc": StackSpec(
+        module="stacks.vpc_stack",
+        class_name="VpcStack",
+        template_description="Base network infrastructure",
+        parameters=("vpc_cidr",),
+    ),
+    "ecr": StackSpec(
+        module="stacks.ecr_stack",
+        class_name="EcrStack",
+        template_description="ECR Repository",
+        parameters=("ecr_repo_name",),
+    ),
+    "app": StackSpec(
+        module="stacks.application_stack",
+        class_name="AppStack",
+        template_description="Application infrastructure",
+        parameters=(
+            "ecr_repo_name",
+            "image_digest",
+            "cpu",
+            "memory",
+            "min_capacity",
+            "max_capacity",
+            "alb_profile",
+        ),
+    ),
+}
+
+
+def build_stacks(
+    names: Optional[List[str]] = None, output_format: str = OUTPUT_FORMAT, **overrides: Any
+) -> List["BaseStack"]:
+    """Builds the selected stacks, in registry order
+
+    Args:
+        names (List[str]): the registry names of the stacks, None for all of them
+        output_format (str): the template format, "yaml", "json" or "json-min"
+        **overrides: constructor overrides, passed to the stacks accepting them
+
+    Returns:
+        List[BaseStack]: the stacks
+    """
+    return [
+        spec.build(name, output_format=output_format, **overrides)
+        for name, spec in STACK_REGISTRY.items()
+        if names is None or name in names
+    ]
@@ -1,5 +1,6 @@
-import logging
-from troposphere import Output, Ref, Export, AWS_REGION, Join, GetAtt
+from typing import Tuple
+
+from troposphere import Output, Ref, Export, Join, GetAtt
 from troposphere.ec2 import (
     Route,
     VPCGatewayAttachment,
@@ -15,149 +16,190 @@ from troposphere.ec2 import (
     SubnetNetworkAclAssociation,
 )
 
-from constants import VPC_CIDR
+from cidr import allocate_subnets
+from constants import (
+    AZ_LETTERS,
+    AZ_PRIVATE_NUMBER,
+    AZ_PUBLIC_NUMBER,
+    VPC_CIDR,
+    VPC_INTERFACE_ENDPOINTS,
+)
+from constructs.endpoints_construct import EndpointsConstruct, EndpointsConstructProps
+from intrinsics import REGION, intrinsic
 from stacks.base_stack import BaseStack
-from utils import tag
+from utils import az_name, export_name, tag
 
 
 class VpcStack(BaseStack):
     """The networking stack containing the VPC and other basic network resources"""
 
-    def __init__(self, template_name: str, template_description: str):
-        super().__init__(template_name, template_description)
-
-    def synth(self) -> str:
-        logging.info(f"Synthesizing {self.template_name} stack...")
-        # Create VPC
-        vpc = self.template.add_resource(
-            VPC(
-                "VPC",
-                CidrBlock=VPC_CIDR,
-                EnableDnsSupport="true",
-                EnableDnsHostnames="true",
-                Tags=tag("vpc"),
+    def __init__(
+        self,
+        template_name: str,
+        template_description: str,
+        vpc_cidr: str = VPC_CIDR,
+        **kwargs,
+    ):
+        super().__init__(template_name, template_description, **kwargs)
+        self.vpc_cidr = vpc_cidr
+        if AZ_PRIVATE_NUMBER > AZ_PUBLIC_NUMBER:
+            raise ValueError(
+                f"AZ_PRIVATE_NUMBER ({AZ_PRIVATE_NUMBER}) exceeds AZ_PUBLIC_NUMBER "
+                f"({AZ_PUBLIC_NUMBER}), each private subnet needs a public one for its NAT"
             )
-        )
-        # Create Internet Gateway
-        internet_gateway = self.template.add_resource(
-            InternetGateway("InternetGateway", Tags=tag("ig"))
-        )
-        # Attach Internet Gateway to the VPC
-        self.template.add_resource(
-            VPCGatewayAttachment(
-                "AttachGateway", VpcId=Ref(vpc), InternetGatewayId=Ref(internet_gateway)
-            )
-        )
 
-        # Public Route Table
-        public_route_table = self.template.add_resource(
-            RouteTable(
-                "MainRouteTable", VpcId=Ref(vpc), Tags=tag("public-route-table-main")
-            )
-        )
-        # Create default route 0.0.0.0/0 in the Public RouteTable
-        public_route = self.template.add_resource(
-            Route(
-                "PublicRoute",
-                DependsOn="AttachGateway",
-                GatewayId=Ref(internet_gateway),
-                DestinationCidrBlock="0.0.0.0/0",
-                RouteTableId=Ref(public_route_table),
-            )
-        )
+    def cache_parameters(self):
+        return {**super().cache_parameters(), "vpc_cidr": self.vpc_cidr}
 
-        # Load Balancer Subnets
-        alb_subnet_1 = self.template.add_resource(
-            Subnet(
-                "LoadBalancer1",
-                CidrBlock="10.0.0.0/28",
-                VpcId=Ref(vpc),
-                Tags=tag("alb-subnet-1"),
-                AvailabilityZone=Join("", [Ref(AWS_REGION), "a"]),
-            )
-        )
-        alb_subnet_2 = self.template.add_resource(
-            Subnet(
-                "LoadBalancer2",
-                CidrBlock="10.0.0.16/28",
-                VpcId=Ref(vpc),
-                Tags=tag("alb-subnet-2"),
-                AvailabilityZone=Join("", [Ref(AWS_REGION), "b"]),
-            )
-        )
+    def private_subnet(
+        self, number: int, cidr: str, vpc: Ref, alb_subnet: Subnet
+    ) -> Tuple[Subnet, RouteTable]:
+        """Adds the private subnet of an AZ, with its NAT gateway and route table
 
-        # Private subnet
+        The NAT gateway is in the AZ's public subnet, so egress never crosses AZs.
+        """
+        az_letter = AZ_LETTERS[number - 1]
         fargate_subnet = self.template.add_resource(
             Subnet(
-                "FargateSubnet",
-                CidrBlock="10.0.0.128/28",
-                VpcId=Ref(vpc),
-                Tags=tag("fargate-subnet"),
-                AvailabilityZone=Join("", [Ref(AWS_REGION), "a"]),
+                az_name("FargateSubnet", number),
+                CidrBlock=cidr,
+                VpcId=vpc,
+                Tags=tag(az_name("fargate-subnet", number, "-"), self.tag_prefix),
+                AvailabilityZone=intrinsic(Join, "", [REGION, az_letter]),
             )
         )
 
         # NAT
         nat_ip = self.template.add_resource(
             EIP(
-                "NatIp",
+                az_name("NatIp", number),
                 Domain="vpc",
             )
         )
-
         nat_gateway = self.template.add_resource(
             NatGateway(
-                "NatGateway",
+                az_name("NatGateway", number),
                 AllocationId=GetAtt(nat_ip, "AllocationId"),
-                SubnetId=Ref(alb_subnet_1),
+                SubnetId=Ref(alb_subnet),
             )
         )
 
         # Private route table
         private_route_table = self.template.add_resource(
             RouteTable(
-                "PrivateRouteTable",
-                VpcId=Ref(vpc),
+                az_name("PrivateRouteTable", number),
+                VpcId=vpc,
             )
         )
-        private_nat_route = self.template.add_resource(
+        self.template.add_resource(
             Route(
-                "PrivateNatRoute",
+                az_name("PrivateNatRoute", number),
                 RouteTableId=Ref(private_route_table),
                 DestinationCidrBlock="0.0.0.0/0",
                 NatGatewayId=Ref(nat_gateway),
             )
         )
-
         self.template.add_resource(
             SubnetRouteTableAssociation(
-                "PrivateRouteTableAssociation",
+                az_name("PrivateRouteTableAssociation", number),
                 SubnetId=Ref(fargate_subnet),
                 RouteTableId=Ref(private_route_table),
             )
         )
+        return fargate_subnet, private_route_table
 
-        # Associate ALB subnets with the public RouteTable
-        self.template.add_resource(
-            SubnetRouteTableAssociation(
-                "AlbSubnet1RouteTableAssociation",
-                SubnetId=Ref(alb_subnet_1),
-                RouteTableId=Ref(public_route_table),
+    def stack_definition(self):
+        # Create VPC
+        vpc = self.template.add_resource(
+            VPC(
+                "VPC",
+                CidrBlock=self.vpc_cidr,
+                EnableDnsSupport="true",
+                EnableDnsHostnames="true",
+                Tags=tag("vpc", self.tag_prefix),
             )
         )
+        # Create Internet Gateway
+        internet_gateway = self.template.add_resource(
+            InternetGateway("InternetGateway", Tags=tag("ig", self.tag_prefix))
+        )
+        # Attach Internet Gateway to the VPC
         self.template.add_resource(
-            SubnetRouteTableAssociation(
-                "AlbSubnet2RouteTableAssociation",
-                SubnetId=Ref(alb_subnet_2),
+            VPCGatewayAttachment(
+                "AttachGateway", VpcId=Ref(vpc), InternetGatewayId=Ref(internet_gateway)
+            )
+        )
+
+        # Public Route Table
+        public_route_table = self.template.add_resource(
+            RouteTable(
+                "MainRouteTable",
+                VpcId=Ref(vpc),
+                Tags=tag("public-route-table-main", self.tag_prefix),
+            )
+        )
+        # Create default route 0.0.0.0/0 in the Public RouteTable
+        public_route = self.template.add_resource(
+            Route(
+                "PublicRoute",
+                DependsOn="AttachGateway",
+                GatewayId=Ref(internet_gateway),
+                DestinationCidrBlock="0.0.0.0/0",
                 RouteTableId=Ref(public_route_table),
             )
         )
 
+        # A public subnet per AZ for the load balancer, and a private subnet
+        # per AZ reaching the internet through the NAT gateway of its AZ
+        subnets = allocate_subnets(self.vpc_cidr, AZ_PUBLIC_NUMBER, AZ_PRIVATE_NUMBER)
+
+        # Load Balancer Subnets
+        alb_subnets = [
+            self.template.add_resource(
+                Subnet(
+                    f"LoadBalancer{index + 1}",
+                    CidrBlock=cidr,
+                    VpcId=Ref(vpc),
+                    Tags=tag(f"alb-subnet-{index + 1}", self.tag_prefix),
+                    AvailabilityZone=intrinsic(Join, "", [REGION, AZ_LETTERS[index]]),
+                )
+            )
+            for index, cidr in enumerate(subnets.public)
+        ]
+
+        fargate_subnets, private_route_tables = zip(
+            *(
+                self.private_subnet(number, cidr, Ref(vpc), alb_subnets[number - 1])
+                for number, cidr in enumerate(subnets.private, 1)
+            )
+        )
+
+        self.constructs.define(
+            EndpointsConstruct,
+            EndpointsConstructProps(
+                vpc=vpc.title,
+                private_subnets=[subnet.title for subnet in fargate_subnets],
+                private_route_tables=[route_table.title for route_table in private_route_tables],
+                interface_services=VPC_INTERFACE_ENDPOINTS,
+                tag_prefix=self.tag_prefix,
+            ),
+        )
+
+        # Associate ALB subnets with the public RouteTable
+        for number, alb_subnet in enumerate(alb_subnets, 1):
+            self.template.add_resource(
+                SubnetRouteTableAssociation(
+                    f"AlbSubnet{number}RouteTableAssociation",
+                    SubnetId=Ref(alb_subnet),
+                    RouteTableId=Ref(public_route_table),
+                )
+            )
+
         public_network_acl = self.template.add_resource(
             NetworkAcl(
                 "PublicNetworkAcl",
                 VpcId=Ref(vpc),
-                Tags=tag("acl"),
+                Tags=tag("acl", self.tag_prefix),
             )
         )
 
@@ -185,48 +227,39 @@ class VpcStack(BaseStack):
             )
         )
 
-        self.template.add_resource(
-            SubnetNetworkAclAssociation(
-                "PublicSubnet1NetworkAclAssociation",
-                SubnetId=Ref(alb_subnet_1),
-                NetworkAclId=Ref(public_network_acl),
+        for number, alb_subnet in enumerate(alb_subnets, 1):
+            self.template.add_resource(
+                SubnetNetworkAclAssociation(
+                    f"PublicSubnet{number}NetworkAclAssociation",
+                    SubnetId=Ref(alb_subnet),
+                    NetworkAclId=Ref(public_network_acl),
+                )
             )
-        )
-        self.template.add_resource(
-            SubnetNetworkAclAssociation(
-                "PublicSubnet2NetworkAclAssociation",
-                SubnetId=Ref(alb_subnet_2),
-                NetworkAclId=Ref(public_network_acl),
-            )
-        )
 
         self.template.add_output(
-            [
-                Output(
-                    "TropoVPC",
-                    Description="The Tropo service VPC",
-                    Value=Ref(vpc),
-                    Export=Export("TropoVPC"),
-                ),
-                Output(
-                    "TropoAlbSubnet1",
-                    Description="The Tropo service AlbSubnet1",
-                    Value=Ref(alb_subnet_1),
-                    Export=Export("TropoAlbSubnet1"),
-                ),
+            Output(
+                export_name(self.tag_prefix, "VPC"),
+                Description="The Tropo service VPC",
+                Value=Ref(vpc),
+                Export=Export(export_name(self.tag_prefix, "VPC")),
+            )
+        )
+        for number, alb_subnet in enumerate(alb_subnets, 1):
+            self.template.add_output(
                 Output(
-                    "TropoAlbSubnet2",
-                    Description="The Tropo service AlbSubnet1",
-                    Value=Ref(alb_subnet_2),
-                    Export=Export("TropoAlbSubnet2"),
-                ),
+                    export_name(self.tag_prefix, f"AlbSubnet{number}"),
+                    Description=f"The Tropo service AlbSubnet{number}",
+                    Value=Ref(alb_subnet),
+                    Export=Export(export_name(self.tag_prefix, f"AlbSubnet{number}")),
+                )
+            )
+        for number, fargate_subnet in enumerate(fargate_subnets, 1):
+            name = az_name("PrivateSubnet", number)
+            self.template.add_output(
                 Output(
-                    "TropoPrivateSubnet",
-                    Description="The Tropo service PrivateSubnet",
+                    export_name(self.tag_prefix, name),
+                    Description=f"The Tropo service {name}",
                     Value=Ref(fargate_subnet),
-                    Export=Export("TropoPrivateSubnet"),
-                ),
-            ]
-        )
-
-        return self.template.to_yaml()
+                    Export=Export(export_name(self.tag_prefix, name)),
+                )
+            )
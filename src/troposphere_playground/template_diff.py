@@ -0,0 +1,238 @@
+"""Structural diff of synthesized templates, resource by resource
+
+Each resource is reduced to a digest of its canonical JSON form, so resources
+whose digests match are skipped without looking at their properties, and only
+the modified ones are compared property by property. The diff is linear in the
+number of resources.
+"""
+
+import hashlib
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, List, Optional
+
+from troposphere import Template
+
+from scheduler import load_template
+
+# Properties whose update makes CloudFormation replace the resource, by type,
+# for every type the stacks emit. Task definitions are immutable, so any change
+# to them registers a new one. Changes to types missing from the table may
+# require a replacement, they are never assumed to be updated in place.
+ANY_PROPERTY = frozenset({"*"})
+REPLACEMENT_PROPERTIES: Dict[str, FrozenSet[str]] = {
+    "AWS::ApplicationAutoScaling::ScalableTarget": frozenset(
+        {"ResourceId", "ScalableDimension", "ServiceNamespace"}
+    ),
+    "AWS::ApplicationAutoScaling::ScalingPolicy": frozenset(
+        {"PolicyName", "ResourceId", "ScalableDimension", "ScalingTargetId", "ServiceNamespace"}
+    ),
+    "AWS::EC2::EIP": frozenset({"Domain", "NetworkBorderGroup", "PublicIpv4Pool"}),
+    "AWS::EC2::InternetGateway": frozenset(),
+    "AWS::EC2::NatGateway": frozenset(
+        {"AllocationId", "ConnectivityType", "PrivateIpAddress", "SubnetId"}
+    ),
+    "AWS::EC2::NetworkAcl": frozenset({"VpcId"}),
+    "AWS::EC2::NetworkAclEntry": frozenset({"Egress", "NetworkAclId", "RuleNumber"}),
+    "AWS::EC2::Route": frozenset(
+        {
+            "DestinationCidrBlock",
+            "DestinationIpv6CidrBlock",
+            "DestinationPrefixListId",
+            "RouteTableId",
+        }
+    ),
+    "AWS::EC2::RouteTable": frozenset({"VpcId"}),
+    "AWS::EC2::SecurityGroup": frozenset({"GroupDescription", "GroupName", "VpcId"}),
+    "AWS::EC2::Subnet": frozenset(
+        {
+            "AvailabilityZone",
+            "AvailabilityZoneId",
+            "CidrBlock",
+            "Ipv4IpamPoolId",
+            "Ipv4NetmaskLength",
+            "OutpostArn",
+            "VpcId",
+        }
+    ),
+    "AWS::EC2::SubnetNetworkAclAssociation": frozenset({"NetworkAclId", "SubnetId"}),
+    "AWS::EC2::SubnetRouteTableAssociation": frozenset({"SubnetId"}),
+    "AWS::EC2::VPC": frozenset(
+        {"CidrBlock", "InstanceTenancy", "Ipv4IpamPoolId", "Ipv4NetmaskLength"}
+    ),
+    "AWS::EC2::VPCEndpoint": frozenset({"ServiceName", "VpcEndpointType", "VpcId"}),
+    "AWS::EC2::VPCGatewayAttachment": frozenset({"VpcId"}),
+    "AWS::ECR::Repository": frozenset({"EncryptionConfiguration", "RepositoryName"}),
+    "AWS::ECS::Cluster": frozenset({"ClusterName"}),
+    "AWS::ECS::Service": frozenset(
+        {
+            "Cluster",
+            "DeploymentController",
+            "LaunchType",
+            "Role",
+            "SchedulingStrategy",
+            "ServiceName",
+        }
+    ),
+    "AWS::ECS::TaskDefinition": ANY_PROPERTY,
+    "AWS::ElasticLoadBalancingV2::Listener": frozenset({"LoadBalancerArn"}),
+    "AWS::ElasticLoadBalancingV2::LoadBalancer": frozenset({"Name", "Scheme", "Type"}),
+    "AWS::ElasticLoadBalancingV2::TargetGroup": frozenset(
+        {"IpAddressType", "Name", "Port", "Protocol", "ProtocolVersion", "TargetType", "VpcId"}
+    ),
+    "AWS::IAM::Policy": frozenset(),
+    "AWS::IAM::Role": frozenset({"Path", "RoleName"}),
+    "AWS::Logs::LogGroup": frozenset({"LogGroupClass", "LogGroupName"}),
+}
+
+
+@dataclass
+class ResourceChange:
+    """A resource modified in place, or replaced, by the new template"""
+
+    logical_id: str
+    resource_type: str
+    properties: List[str]
+    # None when the resource type isn't in REPLACEMENT_PROPERTIES
+    replacement: Optional[bool]
+
+    @property
+    def action(self) -> str:
+        if self.replacement is None:
+            return "may replace"
+        return "replace" if self.replacement else "update"
+
+
+@dataclass
+class TemplateDiff:
+    """The resources and outputs that differ between two templates"""
+
+    added: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    modified: List[ResourceChange] = field(default_factory=list)
+    outputs: List[str] = field(default_factory=list)
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.added or self.removed or self.modified or self.outputs)
+
+    @property
+    def replacements(self) -> List[str]:
+        return [change.logical_id for change in self.modified if change.replacement]
+
+    @property
+    def possible_replacements(self) -> List[str]:
+        """The modified resources of types whose replacing properties aren't known"""
+        return [change.logical_id for change in self.modified if change.replacement is None]
+
+    def summary(self) -> str:
+        return (
+            f"{len(self.added)} added, {len(self.removed)} removed, "
+            f"{len(self.modified)} modified ({len(self.replacements)} replaced, "
+            f"{len(self.possible_replacements)} may be replaced), "
+            f"{len(self.outputs)} outputs changed"
+        )
+
+
+def _digest(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode()).hexdigest()
+
+
+def section_digests(section: Dict[str, Any]) -> Dict[str, str]:
+    """Returns the digest of every entry of a template section, by logical ID"""
+    return {logical_id: _digest(value) for logical_id, value in section.items()}
+
+
+def _changed_properties(previous: Dict[str, Any], current: Dict[str, Any]) -> List[str]:
+    """The properties and resource attributes that differ, attributes first"""
+    attributes = sorted(
+        key
+        for key in (previous.keys() | current.keys()) - {"Properties"}
+        if previous.get(key) != current.get(key)
+    )
+    previous_properties = previous.get("Properties", {})
+    current_properties = current.get("Properties", {})
+    properties = sorted(
+        key
+        for key in previous_properties.keys() | current_properties.keys()
+        if previous_properties.get(key) != current_properties.get(key)
+    )
+    return attributes + properties
+
+
+def _requires_replacement(resource_type: str, changed: List[str]) -> Optional[bool]:
+    """Whether the changes replace the resource, None when its type isn't known"""
+    if "Type" in changed:
+        return True
+    replacing = REPLACEMENT_PROPERTIES.get(resource_type)
+    if replacing is None:
+        return None
+    if replacing is ANY_PROPERTY:
+        return any(key not in ("DependsOn", "Metadata") for key in changed)
+    return any(key in replacing for key in changed)
+
+
+def diff_templates(previous: Dict[str, Any], current: Dict[str, Any]) -> TemplateDiff:
+    """Diffs two templates in their dict form
+
+    Args:
+        previous (Dict[str, Any]): the previously deployed template
+        current (Dict[str, Any]): the freshly synthesized template
+
+    Returns:
+        TemplateDiff: the added, removed and modified resources, in logical ID order
+    """
+    previous_resources = previous.get("Resources", {})
+    current_resources = current.get("Resources", {})
+    previous_digests = section_digests(previous_resources)
+    current_digests = section_digests(current_resources)
+
+    diff = TemplateDiff(
+        added=sorted(current_digests.keys() - previous_digests.keys()),
+        removed=sorted(previous_digests.keys() - current_digests.keys()),
+    )
+    for logical_id in sorted(current_digests.keys() & previous_digests.keys()):
+        if current_digests[logical_id] == previous_digests[logical_id]:
+            continue
+        resource = current_resources[logical_id]
+        changed = _changed_properties(previous_resources[logical_id], resource)
+        resource_type = resource.get("Type", "")
+        diff.modified.append(
+            ResourceChange(
+                logical_id=logical_id,
+                resource_type=resource_type,
+                properties=changed,
+                replacement=_requires_replacement(resource_type, changed),
+            )
+        )
+
+    previous_outputs = section_digests(previous.get("Outputs", {}))
+    current_outputs = section_digests(current.get("Outputs", {}))
+    diff.outputs = sorted(
+        name
+        for name in previous_outputs.keys() | current_outputs.keys()
+        if previous_outputs.get(name) != current_outputs.get(name)
+    )
+    return diff
+
+
+def diff_template(template: Template, previous_path: Path) -> TemplateDiff:
+    """Diffs a synthesized template against a previous artifact
+
+    Args:
+        template (Template): the freshly synthesized template
+        previous_path (Path): the previous template file, all resources are
+            added when it doesn't exist
+
+    Returns:
+        TemplateDiff: the changes the template makes to the previous artifact
+    """
+    previous = load_template(previous_path) if Path(previous_path).exists() else {}
+    return diff_templates(previous, template.to_dict())
+
+
+def diff_files(previous_path: Path, current_path: Path) -> TemplateDiff:
+    """Diffs two template files, a missing previous file having no resources"""
+    previous = load_template(previous_path) if Path(previous_path).exists() else {}
+    return diff_templates(previous, load_template(current_path))
@@ -1,28 +1,184 @@
+import hashlib
+import os
+import re
+import tempfile
+from dataclasses import dataclass
 from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO, Callable, TextIO
 
-from constants import EXPORT_FOLDER
-from troposphere import Tags, AWS_STACK_ID, Ref
+from constants import EXPORT_FOLDER, STREAM_BUFFER_SIZE
+from instrumentation import phase
 from constants import TAG_PREFIX
 
+if TYPE_CHECKING:
+    from intrinsics import Interned
 
-def export_cf_template_to_file(template_filename: str, template_content: str) -> str:
+
+@dataclass
+class ExportResult:
+    """The outcome of exporting a template file"""
+
+    path: Path
+    written: bool
+
+
+def file_digest(path: Path) -> str:
+    """Returns the SHA-256 hex digest of a file's content, or "" if it does not exist"""
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return ""
+    return digest.hexdigest()
+
+
+class DigestWriter:
+    """A text stream encoding to a binary file while hashing what it writes"""
+
+    def __init__(self, binary_file: BinaryIO) -> None:
+        self.binary_file = binary_file
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, text: str) -> int:
+        data = text.encode()
+        self.digest.update(data)
+        self.size += len(data)
+        self.binary_file.write(data)
+        return len(text)
+
+
+def _replace(tmp_name: str, path: Path) -> None:
+    """Renames the temporary file over the path, keeping an existing file's permissions"""
+    try:
+        mode = path.stat().st_mode & 0o777
+    except FileNotFoundError:
+        mode = 0o644
+    os.chmod(tmp_name, mode)
+    os.replace(tmp_name, path)
+
+
+def write_file_atomically(path: Path, content: bytes) -> None:
+    """Writes the content to a temporary file, then renames it over the path
+
+    Readers never observe a partially written file.
+    """
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as tmp_file:
+            tmp_file.write(content)
+        _replace(tmp_name, path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+
+def export_path(template_filename: str, export_folder: str = EXPORT_FOLDER) -> Path:
+    """Returns the absolute filepath of a template in the export folder"""
+    (Path().cwd() / Path(export_folder)).mkdir(parents=True, exist_ok=True)
+    return Path().cwd() / export_folder / Path(template_filename)
+
+
+def export_cf_template_to_file(
+    template_filename: str, template_content: str, export_folder: str = EXPORT_FOLDER
+) -> ExportResult:
     """Creates a YAML CF template file in the EXPORT_FOLDER folder
 
+    The file is left untouched, including its modification time, when it already
+    holds the same content.
+
     Args:
         template_filename (str): the template filename
         template_content (str): the template content from the synthesization
+        export_folder (str): the folder to export to, relative to the working directory
 
     Returns:
-        str: the template absolute filepath
+        ExportResult: the template absolute filepath and whether it was written
     """
-    (Path().cwd() / Path(EXPORT_FOLDER)).mkdir(parents=True, exist_ok=True)
-    template_file = Path().cwd() / EXPORT_FOLDER / Path(template_filename)
-    if not template_file.exists():
-        template_file.touch()
+    template_file = export_path(template_filename, export_folder)
+
+    with phase(template_filename, "write") as phase_args:
+        content = template_content.encode()
+        phase_args["bytes"] = len(content)
+        if file_digest(template_file) == hashlib.sha256(content).hexdigest():
+            phase_args["written"] = False
+            return ExportResult(path=template_file, written=False)
+
+        write_file_atomically(template_file, content)
+        phase_args["written"] = True
+        return ExportResult(path=template_file, written=True)
+
 
-    template_file.write_text(template_content)
-    return template_file
+def export_cf_template_stream(
+    template_filename: str,
+    write_template: Callable[[TextIO], None],
+    export_folder: str = EXPORT_FOLDER,
+) -> ExportResult:
+    """Streams a CF template file into the EXPORT_FOLDER folder
 
+    The content is written to a temporary file as it is rendered, then renamed
+    over the template file unless the template file already holds the same content.
 
-def tag(tag_name: str) -> Tags:
-    return Tags(Application=Ref(AWS_STACK_ID), Name=f"{TAG_PREFIX}-{tag_name}")
+    Args:
+        template_filename (str): the template filename
+        write_template (Callable[[TextIO], None]): writes the template content to
+            the given text stream
+        export_folder (str): the folder to export to, relative to the working directory
+
+    Returns:
+        ExportResult: the template absolute filepath and whether it was written
+    """
+    template_file = export_path(template_filename, export_folder)
+
+    fd, tmp_name = tempfile.mkstemp(dir=template_file.parent, prefix=f".{template_file.name}.")
+    try:
+        with os.fdopen(fd, "wb", buffering=STREAM_BUFFER_SIZE) as tmp_file:
+            stream = DigestWriter(tmp_file)
+            with phase(template_filename, "serialization"):
+                write_template(stream)
+        with phase(template_filename, "write", bytes=stream.size) as phase_args:
+            phase_args["written"] = stream.digest.hexdigest() != file_digest(template_file)
+            if not phase_args["written"]:
+                os.unlink(tmp_name)
+                return ExportResult(path=template_file, written=False)
+            _replace(tmp_name, template_file)
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+        raise
+    return ExportResult(path=template_file, written=True)
+
+
+def tag(tag_name: str, tag_prefix: str = TAG_PREFIX) -> "Interned":
+    """Returns the shared tag set of a resource"""
+    # Imported here, the CLI uses the other helpers before loading troposphere
+    from troposphere import Tags
+
+    from intrinsics import STACK_ID, intrinsic
+
+    return intrinsic(Tags, Application=STACK_ID, Name=f"{tag_prefix}-{tag_name}")
+
+
+def export_name(tag_prefix: str, name: str) -> str:
+    """Returns the cross-stack export name of a value, e.g. "TropoVPC" for "tropo" and "VPC"
+
+    Args:
+        tag_prefix (str): the resources tag prefix, which scopes the exports
+        name (str): the exported value name
+
+    Returns:
+        str: the export name
+    """
+    words = re.split(r"[^0-9A-Za-z]+", tag_prefix)
+    return "".join(word.capitalize() for word in words) + name
+
+
+def az_name(name: str, number: int, separator: str = "") -> str:
+    """Names a resource of the nth private AZ, e.g. "NatGateway2"
+
+    The first AZ keeps the unnumbered names of the single AZ layout, so that
+    its deployed resources are updated rather than replaced.
+    """
+    return name if number == 1 else f"{name}{separator}{number}"
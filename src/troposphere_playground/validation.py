@@ -0,0 +1,231 @@
+"""Offline validation of synthesized templates, before CloudFormation sees them
+
+Each template is indexed (resources, parameters, outputs and exports), then
+every `Ref`, `Fn::GetAtt`, `Fn::Sub` variable and `DependsOn` is checked
+against that index in a single walk, along with the CloudFormation template
+limits. `Fn::ImportValue` names are checked against the exports of all the
+validated stacks once every template has been walked, as is the uniqueness of
+export names.
+"""
+
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Set
+
+from scheduler import load_template
+
+# CloudFormation quotas, templates over 51,200 bytes have to be deployed from S3
+TEMPLATE_MAX_BYTES = 1024 * 1024
+MAX_RESOURCES = 500
+MAX_OUTPUTS = 200
+MAX_PARAMETERS = 200
+
+PSEUDO_PARAMETERS = frozenset(
+    {
+        "AWS::AccountId",
+        "AWS::NotificationARNs",
+        "AWS::NoValue",
+        "AWS::Partition",
+        "AWS::Region",
+        "AWS::StackId",
+        "AWS::StackName",
+        "AWS::URLSuffix",
+    }
+)
+
+_SUB_VARIABLE = re.compile(r"\$\{(?!!)([^}]+)\}")
+
+
+class TemplateValidationError(Exception):
+    """Raised when synthesized templates would be rejected by CloudFormation"""
+
+    def __init__(self, issues: List["ValidationIssue"]) -> None:
+        self.issues = issues
+        details = "; ".join(str(issue) for issue in issues)
+        super().__init__(f"{len(issues)} template validation issues: {details}")
+
+
+@dataclass
+class ValidationIssue:
+    stack: str
+    location: str
+    message: str
+
+    def __str__(self) -> str:
+        return f"{self.stack} {self.location}: {self.message}"
+
+
+@dataclass
+class TemplateReport:
+    """The issues found in a single template, and its cross-stack references"""
+
+    stack: str
+    issues: List[ValidationIssue] = field(default_factory=list)
+    exports: List[str] = field(default_factory=list)
+    imports: Dict[str, List[str]] = field(default_factory=dict)
+
+
+class _TemplateIndex:
+    def __init__(self, template: Dict[str, Any]) -> None:
+        self.resources: Set[str] = set(template.get("Resources", {}))
+        self.parameters: Set[str] = set(template.get("Parameters", {}))
+
+    def refable(self, name: str) -> bool:
+        return name in self.resources or name in self.parameters or name in PSEUDO_PARAMETERS
+
+
+def _walk(node: Any, location: str, index: _TemplateIndex, report: TemplateReport) -> None:
+    """Checks the intrinsic functions of a template node, recursively"""
+    if isinstance(node, list):
+        for item in node:
+            _walk(item, location, index, report)
+        return
+    if not isinstance(node, dict):
+        return
+
+    for key, value in node.items():
+        if key == "Ref" and isinstance(value, str):
+            if not index.refable(value):
+                report.issues.append(
+                    ValidationIssue(report.stack, location, f"Ref to unknown '{value}'")
+                )
+            continue
+        if key == "Fn::GetAtt":
+            target = value.split(".", 1)[0] if isinstance(value, str) else next(iter(value), None)
+            if isinstance(target, str) and target not in index.resources:
+                report.issues.append(
+                    ValidationIssue(
+                        report.stack, location, f"GetAtt of unknown resource '{target}'"
+                    )
+                )
+        elif key == "Fn::ImportValue" and isinstance(value, str):
+            report.imports.setdefault(value, []).append(location)
+            continue
+        elif key == "Fn::Sub":
+            body, variables = (value, {}) if isinstance(value, str) else value
+            if isinstance(body, str):
+                for variable in _SUB_VARIABLE.findall(body):
+                    name = variable.split(".", 1)[0]
+                    if variable not in variables and not index.refable(name):
+                        report.issues.append(
+                            ValidationIssue(
+                                report.stack, location, f"Sub of unknown '{variable}'"
+                            )
+                        )
+        _walk(value, location, index, report)
+
+
+def validate_template(
+    stack: str, template: Dict[str, Any], size: int = 0
+) -> TemplateReport:
+    """Validates a single template in its dict form
+
+    Args:
+        stack (str): the stack name, used in the reported issues
+        template (Dict[str, Any]): the template, with intrinsics in their long form
+        size (int): the size of the template body in bytes
+
+    Returns:
+        TemplateReport: the issues found, and the exports and imports of the template
+    """
+    report = TemplateReport(stack=stack)
+    index = _TemplateIndex(template)
+    resources = template.get("Resources", {})
+    outputs = template.get("Outputs", {})
+
+    if size > TEMPLATE_MAX_BYTES:
+        report.issues.append(
+            ValidationIssue(stack, "Template", f"{size} bytes, over {TEMPLATE_MAX_BYTES}")
+        )
+    for section, count, limit in (
+        ("Resources", len(resources), MAX_RESOURCES),
+        ("Outputs", len(outputs), MAX_OUTPUTS),
+        ("Parameters", len(index.parameters), MAX_PARAMETERS),
+    ):
+        if count > limit:
+            report.issues.append(ValidationIssue(stack, section, f"{count}, over {limit}"))
+    if not resources:
+        report.issues.append(ValidationIssue(stack, "Resources", "no resources"))
+
+    for logical_id, resource in resources.items():
+        location = f"Resources.{logical_id}"
+        depends_on = resource.get("DependsOn", [])
+        for dependency in [depends_on] if isinstance(depends_on, str) else depends_on:
+            if dependency not in index.resources:
+                report.issues.append(
+                    ValidationIssue(
+                        stack, location, f"DependsOn unknown resource '{dependency}'"
+                    )
+                )
+        _walk(resource.get("Properties", {}), location, index, report)
+
+    for name, output in outputs.items():
+        location = f"Outputs.{name}"
+        _walk(output.get("Value"), location, index, report)
+        export = output.get("Export", {}).get("Name")
+        if isinstance(export, str):
+            report.exports.append(export)
+        else:
+            _walk(export, location, index, report)
+    return report
+
+
+def validate_file(path: Path) -> TemplateReport:
+    """Validates a template file, used as the process pool task"""
+    path = Path(path)
+    return validate_template(path.stem, load_template(path), size=path.stat().st_size)
+
+
+def cross_stack_issues(reports: Iterable[TemplateReport]) -> List[ValidationIssue]:
+    """Checks the imports of every template against the exports of all of them"""
+    reports = list(reports)
+    exporters: Dict[str, str] = {}
+    issues = []
+    for report in reports:
+        for export in report.exports:
+            if export in exporters:
+                issues.append(
+                    ValidationIssue(
+                        report.stack,
+                        "Outputs",
+                        f"export '{export}' already exported by {exporters[export]}",
+                    )
+                )
+            exporters.setdefault(export, report.stack)
+    for report in reports:
+        for name, locations in report.imports.items():
+            if name not in exporters:
+                issues.extend(
+                    ValidationIssue(report.stack, location, f"ImportValue of unknown '{name}'")
+                    for location in locations
+                )
+    return issues
+
+
+def validate_files(paths: List[Path], jobs: int = 1, check_imports: bool = True) -> None:
+    """Validates the templates of a set of stacks deployed together
+
+    Args:
+        paths (List[Path]): the template filepaths
+        jobs (int): the number of worker processes, 1 validates sequentially
+        check_imports (bool): whether every import must be exported by one of
+            the templates, False when only a subset of the stacks is validated
+
+    Raises:
+        TemplateValidationError: when any template has issues
+    """
+    if jobs <= 1 or len(paths) <= 1:
+        reports = [validate_file(path) for path in paths]
+    else:
+        # Only paid for when running in parallel
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=min(jobs, len(paths))) as executor:
+            reports = list(executor.map(validate_file, paths))
+
+    issues = [issue for report in reports for issue in report.issues]
+    if check_imports:
+        issues.extend(cross_stack_issues(reports))
+    if issues:
+        raise TemplateValidationError(issues)
@@ -0,0 +1,214 @@
+"""Watches the package sources and re-synthesizes the stacks affected by changes
+
+The package modules are polled for modification time changes. A change to a
+module re-synthesizes only the stacks whose module imports it, directly or
+transitively. Changed modules and their dependents are reloaded in place, so
+every other module, troposphere included, stays imported between rounds.
+
+Stacks are exported with the options of a normal run, output format,
+synthesis cache and image digest, and the watched templates are validated
+after every round. Changes to the modules the stacks and the validation are
+built from are reloaded, changes to any other module, e.g. `main` or
+`publish`, only take effect once the watch is restarted.
+"""
+
+import importlib
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+import validation
+from cache import SynthesisCache, clear_module_digests, module_imports, package_modules
+from constants import OUTPUT_FORMAT
+from stacks import registry
+
+PACKAGE_DIR = Path(__file__).resolve().parent
+# The modules the watcher calls into, besides the stack modules
+PIPELINE_MODULES = frozenset({"stacks.registry", "validation"})
+
+
+class DependencyGraph:
+    """The imports between the modules of the package"""
+
+    def __init__(self, package_dir: Path = PACKAGE_DIR) -> None:
+        self.modules = package_modules(package_dir)
+        self.imports = {
+            name: module_imports(path, self.modules) for name, path in self.modules.items()
+        }
+
+    def dependents(self, changed: Set[str]) -> Set[str]:
+        """Returns the changed modules and every module importing them, transitively"""
+        affected = set(changed)
+        pending = list(changed)
+        while pending:
+            module = pending.pop()
+            for name, imports in self.imports.items():
+                if module in imports and name not in affected:
+                    affected.add(name)
+                    pending.append(name)
+        return affected
+
+    def dependencies(self, modules: Set[str]) -> Set[str]:
+        """Returns the modules and every module they import, transitively"""
+        closure = set(modules)
+        pending = list(modules)
+        while pending:
+            for dependency in self.imports.get(pending.pop(), ()):
+                if dependency not in closure:
+                    closure.add(dependency)
+                    pending.append(dependency)
+        return closure
+
+    def reload_order(self, modules: Set[str]) -> List[str]:
+        """Sorts the modules so that each comes after the modules it imports"""
+        ordered: List[str] = []
+
+        def visit(name: str, visiting: Set[str]) -> None:
+            if name in ordered or name in visiting:
+                return
+            visiting.add(name)
+            for dependency in sorted(self.imports.get(name, ())):
+                if dependency in modules:
+                    visit(dependency, visiting)
+            ordered.append(name)
+
+        for name in sorted(modules):
+            visit(name, set())
+        return ordered
+
+
+def affected_stacks(graph: DependencyGraph, changed: Set[str], names: List[str]) -> List[str]:
+    """Returns the registry names of the stacks depending on the changed modules"""
+    affected = graph.dependents(changed)
+    return [name for name in names if registry.STACK_REGISTRY[name].module in affected]
+
+
+class Watcher:
+    """Polls the package sources and re-synthesizes the affected stacks"""
+
+    def __init__(
+        self,
+        stack_names: Optional[List[str]] = None,
+        output_format: str = OUTPUT_FORMAT,
+        cache: Optional[SynthesisCache] = None,
+        image_digest: Optional[str] = None,
+        interval: float = 0.5,
+        package_dir: Path = PACKAGE_DIR,
+    ) -> None:
+        """The constructor
+
+        Args:
+            stack_names (List[str]): the registry names of the watched stacks, None for all
+            output_format (str): the template format, "yaml", "json" or "json-min"
+            cache (SynthesisCache): the synthesis cache, None to always synthesize
+            image_digest (str): the pushed image digest, None for the ECR_IMAGE_VERSION tag
+            interval (float): the polling interval in seconds
+            package_dir (Path): the package folder to watch
+        """
+        self.stack_names = stack_names or list(registry.STACK_REGISTRY)
+        self.output_format = output_format
+        self.cache = cache
+        self.image_digest = image_digest
+        self.interval = interval
+        self.package_dir = package_dir
+        self.mtimes = self.snapshot()
+        # The exported template of every watched stack
+        self.paths: Dict[str, Path] = {}
+
+    def snapshot(self) -> Dict[Path, int]:
+        mtimes = {}
+        for path in self.package_dir.rglob("*.py"):
+            try:
+                mtimes[path] = path.stat().st_mtime_ns
+            except FileNotFoundError:
+                continue
+        return mtimes
+
+    def poll(self) -> Set[Path]:
+        """Returns the source files created, modified or deleted since the last poll"""
+        mtimes = self.snapshot()
+        changed = {
+            path
+            for path in mtimes.keys() | self.mtimes.keys()
+            if mtimes.get(path) != self.mtimes.get(path)
+        }
+        self.mtimes = mtimes
+        return changed
+
+    def synthesize(self, stack_names: List[str]) -> None:
+        """Exports the stacks, then validates the templates of every watched stack
+
+        Raises:
+            TemplateValidationError: when any watched template has issues
+        """
+        for name in stack_names:
+            stack = registry.STACK_REGISTRY[name].build(
+                name, output_format=self.output_format, image_digest=self.image_digest
+            )
+            self.paths[name] = stack.export(cache=self.cache).path
+        if self.cache is not None:
+            self.cache.evict()
+        # Looked up on the module, which may have been reloaded
+        validation.validate_files(
+            [self.paths[name] for name in self.stack_names if name in self.paths],
+            check_imports=set(self.stack_names) == set(registry.STACK_REGISTRY),
+        )
+
+    def resynthesize(self, changed_files: Set[Path]) -> List[str]:
+        """Reloads the changed modules and re-synthesizes the affected stacks
+
+        Args:
+            changed_files (Set[Path]): the changed source files
+
+        Returns:
+            List[str]: the registry names of the re-synthesized stacks
+        """
+        graph = DependencyGraph(self.package_dir)
+        changed = {
+            name for name, path in graph.modules.items() if path in changed_files
+        }
+        stack_names = affected_stacks(graph, changed, self.stack_names)
+
+        # Only the modules the stacks and the validation are built from, not the entry points
+        stack_modules = {registry.STACK_REGISTRY[name].module for name in self.stack_names}
+        stale = graph.dependents(changed) & graph.dependencies(stack_modules | PIPELINE_MODULES)
+        all_stack_modules = {entry.module for entry in registry.STACK_REGISTRY.values()}
+        outside = changed - graph.dependencies(all_stack_modules | PIPELINE_MODULES)
+        if outside:
+            logging.warning(
+                f"Restart the watch to pick up the changes to {', '.join(sorted(outside))}"
+            )
+        for name in graph.reload_order(stale):
+            if name in sys.modules:
+                importlib.reload(sys.modules[name])
+        clear_module_digests()
+
+        self.synthesize(stack_names)
+        return stack_names
+
+    def run(self) -> None:
+        """Synthesizes the watched stacks, then re-synthesizes them on changes until interrupted"""
+        try:
+            self.synthesize(self.stack_names)
+        except Exception as e:
+            # Kept watching, the next change may fix it
+            logging.exception(f"Stack YAML generation failed: {e}")
+        logging.info(f"Watching {self.package_dir} for changes...")
+
+        while True:
+            time.sleep(self.interval)
+            changed_files = self.poll()
+            if not changed_files:
+                continue
+            start = time.perf_counter()
+            try:
+                stack_names = self.resynthesize(changed_files)
+            except Exception as e:
+                logging.exception(f"Stack YAML generation failed: {e}")
+                continue
+            logging.info(
+                f"Re-synthesized {', '.join(stack_names) or 'no stacks'} "
+                f"in {time.perf_counter() - start:.3f}s"
+            )
@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# The package modules import each other as top-level modules (e.g. `constants`),
+# the same way they resolve when running `main.py` directly.
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "troposphere_playground"))
@@ -0,0 +1,54 @@
+"""A docker CLI stand-in with an in-memory registry, for the image build stage
+
+It answers the commands the build stage runs: builds tag a local image after
+the content of its build context, pushes copy it to the registry and report
+its digest, and inspections look it up there.
+"""
+
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, List
+
+from image_build import ImageBuildError
+
+
+class RegistryStandIn:
+    def __init__(self) -> None:
+        self.images: Dict[str, str] = {}
+        self.registry: Dict[str, str] = {}
+        self.commands: List[List[str]] = []
+        self.lock = threading.Lock()
+
+    def commands_named(self, name: str) -> List[List[str]]:
+        return [command for command in self.commands if command[0] == name]
+
+    def __call__(self, args: List[str]) -> str:
+        with self.lock:
+            self.commands.append(args)
+        if args[0] == "build":
+            context = Path(args[-1])
+            digest = hashlib.sha256()
+            for path in sorted(context.rglob("*")):
+                # Hidden files are left out, as by the .dockerignore
+                hidden = any(part.startswith(".") for part in path.relative_to(context).parts)
+                if path.is_file() and not hidden:
+                    digest.update(path.read_bytes())
+            tags = [args[index + 1] for index, arg in enumerate(args) if arg == "--tag"]
+            for tag in tags:
+                self.images[tag] = digest.hexdigest()
+            return ""
+        if args[0] == "push":
+            reference = args[1]
+            if reference not in self.images:
+                raise ImageBuildError(f"An image does not exist locally with the tag: {reference}")
+            digest = "sha256:" + hashlib.sha256(self.images[reference].encode()).hexdigest()
+            with self.lock:
+                self.registry[reference] = digest
+            return f"{reference.rsplit(':', 1)[1]}: digest: {digest} size: 1234\n"
+        if args[:3] == ["buildx", "imagetools", "inspect"]:
+            reference = args[-1]
+            if reference not in self.registry:
+                raise ImageBuildError(f"{reference}: not found")
+            return self.registry[reference] + "\n"
+        raise ImageBuildError(f"Unexpected command docker {' '.join(args)}")
@@ -0,0 +1,93 @@
+"""A local S3-compatible stand-in serving the requests the publish stage sends
+
+Objects are kept in memory, addressed in path style. Requests must be signed
+and their payload must match the signed content digest, the signature itself
+isn't verified.
+"""
+
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+from urllib.parse import unquote, urlsplit
+
+
+class S3StandIn(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.objects: Dict[Tuple[str, str], Tuple[bytes, Dict[str, str]]] = {}
+        self.requests: List[Tuple[str, str]] = []
+        self.connections = 0
+        # The number of upcoming requests to drop without a response
+        self.disconnects = 0
+        self.lock = threading.Lock()
+
+    @property
+    def endpoint(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def __enter__(self) -> "S3StandIn":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: S3StandIn
+
+    def setup(self) -> None:
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _reply(self, status: int, body: bytes = b"", headers: Dict[str, str] = None) -> None:
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _handle(self) -> None:
+        url = urlsplit(self.path)
+        bucket, _, key = unquote(url.path).lstrip("/").partition("/")
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with self.server.lock:
+            self.server.requests.append((self.command, key))
+            if self.server.disconnects:
+                self.server.disconnects -= 1
+                self.close_connection = True
+                return
+
+        if not self.headers.get("Authorization", "").startswith("AWS4-HMAC-SHA256 Credential="):
+            return self._reply(403, b"<Error><Code>AccessDenied</Code></Error>")
+        if self.headers.get("x-amz-content-sha256") != hashlib.sha256(body).hexdigest():
+            return self._reply(400, b"<Error><Code>XAmzContentSHA256Mismatch</Code></Error>")
+
+        if self.command == "HEAD":
+            if (bucket, key) not in self.server.objects:
+                return self._reply(404)
+            return self._reply(200, headers=self.server.objects[bucket, key][1])
+        if self.command == "PUT":
+            self.server.objects[bucket, key] = (body, self._object_headers())
+            return self._reply(200, headers={"ETag": f'"{hashlib.md5(body).hexdigest()}"'})
+        return self._reply(501)
+
+    def _object_headers(self) -> Dict[str, str]:
+        return {
+            name: value
+            for name, value in self.headers.items()
+            if name.lower().startswith("x-amz-meta-") or name.lower() == "content-type"
+        }
+
+    do_HEAD = do_PUT = do_POST = _handle
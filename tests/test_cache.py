@@ -0,0 +1,89 @@
+import os
+
+import pytest
+
+from cache import SynthesisCache, dependency_versions, module_imports
+from stacks.ecr_stack import EcrStack
+from stacks.vpc_stack import VpcStack
+
+
+class TestSynthesisCache:
+    def test_cache_hit_skips_synth(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        cache = SynthesisCache()
+        first = VpcStack(template_name="test-vpc", template_description="vpc")
+        content = first.export(cache=cache).path.read_text()
+
+        second = VpcStack(template_name="test-vpc", template_description="vpc")
+        monkeypatch.setattr(
+            second, "stack_definition", lambda: pytest.fail("synthesized")
+        )
+
+        assert second.export(cache=cache).path.read_text() == content
+
+    def test_key_depends_on_stack_inputs(self):
+        cache = SynthesisCache()
+        key = cache.key(VpcStack(template_name="vpc", template_description="vpc"))
+
+        assert key == cache.key(VpcStack(template_name="vpc", template_description="vpc"))
+        assert key != cache.key(VpcStack(template_name="vpc", template_description="new"))
+        assert key != cache.key(VpcStack(template_name="new", template_description="vpc"))
+        assert key != cache.key(EcrStack(template_name="vpc", template_description="vpc"))
+
+    def test_key_depends_on_constants(self, monkeypatch):
+        cache = SynthesisCache()
+        stack = VpcStack(template_name="vpc", template_description="vpc")
+        key = cache.key(stack)
+
+        monkeypatch.setattr("constants.VPC_CIDR", "10.1.0.0/24")
+
+        assert cache.key(stack) != key
+
+    def test_key_depends_on_dependency_versions(self, monkeypatch):
+        cache = SynthesisCache()
+        stack = VpcStack(template_name="vpc", template_description="vpc")
+        key = cache.key(stack)
+
+        versions = {**dependency_versions(), "awacs": "0.0.1"}
+        monkeypatch.setattr("cache.dependency_versions", lambda: versions)
+
+        assert cache.key(stack) != key
+
+    def test_entries_have_the_template_format_extension(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        cache = SynthesisCache(folder=tmp_path / "cache")
+        stack = VpcStack(
+            template_name="test-vpc", template_description="vpc", output_format="json"
+        )
+        content = stack.export(cache=cache).path.read_text()
+
+        assert [entry.name for entry in (tmp_path / "cache").iterdir()] == [
+            f"{cache.key(stack)}.json"
+        ]
+        assert cache.get(cache.key(stack), ".json") == content
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        cache = SynthesisCache(folder=tmp_path, max_bytes=25)
+        cache.put("old", "x" * 10, ".yaml")
+        cache.put("used", "x" * 10, ".json")
+        os.utime(tmp_path / "old.yaml", (1, 1))
+        os.utime(tmp_path / "used.json", (2, 2))
+        assert cache.get("used", ".json") is not None
+
+        cache.put("new", "x" * 10, ".yaml")
+        # Stored entries are only evicted at the end of the run
+        assert (tmp_path / "old.yaml").exists()
+        cache.evict()
+
+        assert cache.get("old", ".yaml") is None
+        assert cache.get("used", ".json") is not None
+        assert cache.get("new", ".yaml") is not None
+
+
+def test_module_imports_include_function_imports(tmp_path):
+    modules = {name: tmp_path / f"{name}.py" for name in ("main", "fanout", "utils")}
+    modules["main"].write_text(
+        "import utils\n\n\ndef run():\n    from fanout import fan_out\n"
+    )
+
+    assert module_imports(modules["main"], modules) == {"utils", "fanout"}
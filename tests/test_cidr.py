@@ -0,0 +1,42 @@
+import pytest
+
+from cidr import allocate_many, allocate_subnets, find_overlaps, format_cidr, parse_cidr
+
+
+class TestAllocateSubnets:
+    def test_matches_the_original_layout(self):
+        plan = allocate_subnets("10.0.0.0/24", 2, 1)
+        assert plan.public == ["10.0.0.0/28", "10.0.0.16/28"]
+        assert plan.private == ["10.0.0.128/28"]
+
+    def test_round_trips_addresses(self):
+        assert format_cidr(*parse_cidr("172.31.240.0/20")) == "172.31.240.0/20"
+
+    @pytest.mark.parametrize("cidr", ["10.0.0.0", "10.0.0/24", "10.0.0.256/24", "10.0.0.1/24"])
+    def test_rejects_invalid_cidr_blocks(self, cidr):
+        with pytest.raises(ValueError):
+            parse_cidr(cidr)
+
+    def test_rejects_subnets_over_capacity(self):
+        assert len(allocate_subnets("10.0.0.0/24", 8, 8).private) == 8
+        with pytest.raises(ValueError, match="only fits 8"):
+            allocate_subnets("10.0.0.0/24", 9, 1)
+
+
+class TestOverlaps:
+    def test_finds_overlapping_blocks(self):
+        assert find_overlaps(["10.0.0.0/24", "10.1.0.0/24", "10.0.0.128/25"]) == [
+            ("10.0.0.0/24", "10.0.0.128/25")
+        ]
+        assert find_overlaps(["10.0.0.0/25", "10.0.0.128/25"]) == []
+
+    def test_allocates_many_vpcs(self):
+        vpc_cidrs = [f"10.{index >> 8}.{index & 255}.0/24" for index in range(2048)]
+        plans = allocate_many(vpc_cidrs, 3, 3)
+        assert len(plans) == 2048
+        assert plans[-1].private[-1] == "10.7.255.160/28"
+        assert find_overlaps(cidr for plan in plans for cidr in plan.public + plan.private) == []
+
+    def test_rejects_overlapping_vpcs(self):
+        with pytest.raises(ValueError, match="10.0.0.0/16 and 10.0.4.0/24"):
+            allocate_many(["10.0.0.0/16", "10.1.0.0/24", "10.0.4.0/24"], 3, 3)
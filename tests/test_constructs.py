@@ -0,0 +1,318 @@
+import dataclasses
+
+import pytest
+from troposphere import Template
+from troposphere.ec2 import SecurityGroup, Subnet
+
+from constructs.alb_construct import AlbConstruct, AlbConstructProps, AlbProfile
+from constructs.base_construct import BaseConstruct, BaseConstructProps
+from constructs.fargate_construct import FargateConstructProps
+from constructs.fragments import fragment_cache
+from constructs.registry import ConstructRegistry, compact
+from instrumentation import Tracer, start_tracing, stop_tracing
+from stacks.application_stack import AppStack
+
+
+def alb_props(tag_prefix="tropo"):
+    return AlbConstructProps(
+        tag_prefix=tag_prefix,
+        vpc="vpc-1",
+        alb_subnets=["subnet-1", "subnet-2"],
+        profile=AlbProfile(),
+    )
+
+
+class TestConstructProps:
+    def test_props_are_slotted_and_frozen(self):
+        props = alb_props()
+
+        assert not hasattr(props, "__dict__")
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            props.vpc = "vpc-2"
+
+    def test_default_prefix_keeps_the_deployed_load_balancer_names(self):
+        resources = TestScalingConstruct.resources()
+
+        assert resources["ApplicationLB"]["Properties"]["Name"] == "ApplicationLB"
+        assert resources["FargateTargetGroup"]["Properties"]["Name"] == "FargateTarget"
+        tenant = TestScalingConstruct.resources(tag_prefix="acme")
+        assert tenant["ApplicationLB"]["Properties"]["Name"] == "acme-alb"
+        assert tenant["FargateTargetGroup"]["Properties"]["Name"] == "acme-fargate"
+
+    @pytest.mark.parametrize("tag_prefix", ["a" * 25, "acme_corp", "internal"])
+    def test_rejects_prefixes_making_invalid_load_balancer_names(self, tag_prefix):
+        with pytest.raises(ValueError, match="Invalid load balancer name"):
+            alb_props(tag_prefix)
+
+
+class TestConstructRegistry:
+    def test_keeps_only_the_exposed_resources(self):
+        template = Template()
+        registry = ConstructRegistry(template)
+
+        alb = registry.define(AlbConstruct, alb_props())
+
+        assert AlbConstruct.exposed_names() == (
+            "alb_security_group",
+            "alb",
+            "fargate_target_group",
+            "listener",
+        )
+        assert alb["alb"] == "ApplicationLB"
+        assert registry["AlbConstruct"] is alb
+        with pytest.raises(ValueError, match="already defined"):
+            registry.define(AlbConstruct, alb_props())
+
+    def test_compacted_resources_share_their_names(self):
+        subnets = [
+            Subnet(f"Subnet{index}", CidrBlock="10.0.0.0/28", VpcId="vpc-1")
+            for index in range(2)
+        ]
+
+        compact(subnets)
+
+        assert subnets[0].propnames is subnets[1].propnames
+        subnets[0].MapPublicIpOnLaunch = True
+        with pytest.raises(AttributeError):
+            subnets[1].NotAProperty = True
+
+    def test_other_troposphere_releases_are_left_untouched(self, monkeypatch):
+        monkeypatch.setattr("troposphere.__version__", "99.0.0")
+        subnet = Subnet("Subnet", CidrBlock="10.0.0.0/28", VpcId="vpc-1")
+        propnames = subnet.propnames
+
+        compact([subnet])
+
+        assert subnet.propnames is propnames
+
+    @pytest.mark.parametrize("render", [Template.to_yaml, Template.to_json])
+    def test_compaction_leaves_templates_identical(self, monkeypatch, render):
+        def app_template():
+            stack = AppStack("tropo-app", "app")
+            stack.stack_definition()
+            stack.constructs.compact()
+            return render(stack.template)
+
+        compacted = app_template()
+        monkeypatch.setattr("constructs.registry.COMPACTABLE_VERSIONS", frozenset())
+
+        assert app_template() == compacted
+
+
+class ShoutingConstruct(BaseConstruct):
+    __slots__ = ("group",)
+    fragment_parameters = ("tag_prefix",)
+
+    def construct_definition(self):
+        self.group = self.template.add_resource(
+            SecurityGroup("Group", GroupDescription=self.props.tag_prefix.upper())
+        )
+
+
+def traced_reuse(define):
+    tracer = Tracer(trace_memory=False)
+    start_tracing(tracer)
+    try:
+        outputs = define()
+    finally:
+        stop_tracing()
+    reused = [event["args"]["reused"] for event in tracer.events if event["cat"] == "construct"]
+    return outputs, reused
+
+
+class TestFragmentCache:
+    @pytest.fixture(autouse=True)
+    def empty_cache(self):
+        fragment_cache.clear()
+        yield
+        fragment_cache.clear()
+
+    @staticmethod
+    def app_template(tag_prefix, **kwargs):
+        stack = AppStack(f"{tag_prefix}-app", "app", tag_prefix=tag_prefix, **kwargs)
+        stack.stack_definition()
+        return stack.template.to_yaml()
+
+    def test_reused_fragments_match_fresh_definitions(self):
+        tenants = ["tropo", "acme", "Bravo-Co", "tropo2", "acme"]
+
+        reused, flags = traced_reuse(
+            lambda: [
+                self.app_template(tenant, ecr_repo_name=f"{tenant}-repo") for tenant in tenants
+            ]
+        )
+
+        fresh = []
+        for tenant in tenants:
+            fragment_cache.clear()
+            fresh.append(self.app_template(tenant, ecr_repo_name=f"{tenant}-repo"))
+        assert reused == fresh
+        assert "Value: Bravo-Co-fargate-service" in reused[2]
+        # The ALB construct picks its names after the prefix value, so is always defined
+        assert flags == [False] * 3 + [False, True, True] * 4
+
+    def test_other_props_make_other_shapes(self):
+        _, flags = traced_reuse(
+            lambda: [
+                self.app_template("acme"),
+                self.app_template("globex", cpu="512", memory="1024"),
+            ]
+        )
+
+        # The task size only goes into the Fargate construct
+        assert flags == [False] * 5 + [True]
+
+    def test_constants_are_part_of_the_key(self, monkeypatch):
+        self.app_template("acme")
+        monkeypatch.setattr("constants.LOG_RETENTION_DAYS", 30)
+
+        _, flags = traced_reuse(lambda: self.app_template("globex"))
+
+        assert flags == [False] * 3
+
+    def test_transformed_parameters_are_never_reused(self):
+        def group_descriptions():
+            descriptions = []
+            for tag_prefix in ("acme", "globex", "initech"):
+                template = Template()
+                ConstructRegistry(template).define(
+                    ShoutingConstruct, BaseConstructProps(tag_prefix=tag_prefix)
+                )
+                descriptions.append(template.to_dict()["Resources"]["Group"]["Properties"])
+            return descriptions
+
+        descriptions, flags = traced_reuse(group_descriptions)
+
+        assert [properties["GroupDescription"] for properties in descriptions] == [
+            "ACME",
+            "GLOBEX",
+            "INITECH",
+        ]
+        assert flags == [False] * 3
+
+
+class TestScalingConstruct:
+    @staticmethod
+    def resources(**kwargs):
+        stack = AppStack("tropo-app", "app", **kwargs)
+        stack.stack_definition()
+        return stack.template.to_dict()["Resources"]
+
+    def test_scales_within_the_capacity_bounds(self):
+        resources = self.resources(min_capacity=2, max_capacity=10)
+
+        target = resources["FargateScalableTarget"]["Properties"]
+        assert (target["MinCapacity"], target["MaxCapacity"]) == (2, 10)
+        # Updates leave the count to the scalable target
+        assert "DesiredCount" not in resources["TropoService"]["Properties"]
+        metrics = {
+            policy["Properties"]["TargetTrackingScalingPolicyConfiguration"][
+                "PredefinedMetricSpecification"
+            ]["PredefinedMetricType"]
+            for policy in resources.values()
+            if policy["Type"] == "AWS::ApplicationAutoScaling::ScalingPolicy"
+        }
+        assert metrics == {
+            "ECSServiceAverageCPUUtilization",
+            "ECSServiceAverageMemoryUtilization",
+            "ALBRequestCountPerTarget",
+        }
+        assert resources["FargateRequestsScalingPolicy"]["DependsOn"] == "FargateListener"
+
+    def test_task_size_is_configurable(self):
+        properties = self.resources(cpu="256", memory="2048")["TropoServer"]["Properties"]
+
+        assert (properties["Cpu"], properties["Memory"]) == ("256", "2048")
+
+    @pytest.mark.parametrize(
+        "kwargs, message",
+        [
+            ({"cpu": "300"}, "Unsupported Fargate CPU '300'"),
+            ({"cpu": "256", "memory": "4096"}, "Unsupported Fargate memory '4096' for 256 CPU"),
+            ({"cpu": "8192", "memory": "18432"}, "Unsupported Fargate memory '18432'"),
+            ({"cpu": "1024", "memory": "3072"}, "httpd config is sized for a 256 CPU"),
+            ({"alb_profile": AlbProfile(idle_timeout=120)}, "under the 120s ALB idle timeout"),
+            ({"min_capacity": 5, "max_capacity": 2}, "Invalid scaling capacity 5-2"),
+        ],
+    )
+    def test_invalid_settings_fail_at_synth_time(self, kwargs, message):
+        with pytest.raises(ValueError, match=message):
+            self.resources(**kwargs)
+
+
+class TestFargateLogging:
+    def test_container_logs_without_blocking(self):
+        stack = AppStack("tropo-app", "app")
+        stack.stack_definition()
+        resources = stack.template.to_dict()["Resources"]
+
+        container = resources["TropoServer"]["Properties"]["ContainerDefinitions"][0]
+        options = container["LogConfiguration"]["Options"]
+        assert container["LogConfiguration"]["LogDriver"] == "awslogs"
+        assert options["awslogs-group"] == {"Ref": "TropoLogGroup"}
+        assert (options["mode"], options["max-buffer-size"]) == ("non-blocking", "25m")
+        assert resources["TropoLogGroup"]["Properties"]["RetentionInDays"] == 14
+
+    @pytest.mark.parametrize(
+        "kwargs, message",
+        [
+            ({"log_retention_days": 10}, "Unsupported log retention of 10 days"),
+            ({"log_max_buffer_size": "25 MB"}, "Invalid log max buffer size '25 MB'"),
+        ],
+    )
+    def test_invalid_log_settings_are_rejected(self, kwargs, message):
+        props = {
+            "tag_prefix": "tropo",
+            "vpc": "vpc-1",
+            "fargate_subnets": ["subnet-1"],
+            "alb_target_group": "FargateTargetGroup",
+            "alb_security_group": "ALBSecurityGroup",
+            "ecr_repo_name": "tropo-repository",
+            "image_digest": None,
+            "cpu": "256",
+            "memory": "512",
+            "desired_count": 1,
+            "log_retention_days": 14,
+            "log_max_buffer_size": "25m",
+        }
+        with pytest.raises(ValueError, match=message):
+            FargateConstructProps(**{**props, **kwargs})
+
+
+class TestAlbProfile:
+    @staticmethod
+    def resources(profile):
+        stack = AppStack("tropo-app", "app", alb_profile=profile)
+        stack.stack_definition()
+        return stack.template.to_dict()["Resources"]
+
+    def test_profile_sets_health_checks_and_attributes(self):
+        resources = self.resources(AlbProfile(deregistration_delay=10, http2=False))
+
+        target_group = resources["FargateTargetGroup"]["Properties"]
+        assert target_group["HealthCheckIntervalSeconds"] == "10"
+        assert target_group["HealthCheckPath"] == "/healthcheck"
+        assert {
+            attribute["Key"]: attribute["Value"]
+            for attribute in target_group["TargetGroupAttributes"]
+        } == {
+            "deregistration_delay.timeout_seconds": "10",
+            "load_balancing.algorithm.type": "least_outstanding_requests",
+            "slow_start.duration_seconds": "0",
+        }
+        attributes = resources["ApplicationLB"]["Properties"]["LoadBalancerAttributes"]
+        assert {"Key": "routing.http2.enabled", "Value": "false"} in attributes
+
+    @pytest.mark.parametrize(
+        "kwargs, message",
+        [
+            ({"health_check_interval": 5, "health_check_timeout": 5}, "must be shorter"),
+            ({"deregistration_delay": 4000}, "Invalid ALB deregistration_delay 4000"),
+            ({"slow_start": 10, "algorithm": "round_robin"}, "expected 0 or 30-900"),
+            ({"slow_start": 60}, "slow_start requires round_robin"),
+            ({"algorithm": "random"}, "Invalid ALB algorithm 'random'"),
+        ],
+    )
+    def test_invalid_profiles_are_rejected(self, kwargs, message):
+        with pytest.raises(ValueError, match=message):
+            AlbProfile(**kwargs)
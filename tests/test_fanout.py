@@ -0,0 +1,121 @@
+import json
+import shutil
+
+import pytest
+
+from fanout import ManifestError, fan_out, read_manifest
+from utils import tag
+
+
+def write_manifest(path, rows):
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows))
+    return path
+
+
+class TestReadManifest:
+    def test_reads_csv_without_empty_values(self, tmp_path):
+        manifest = tmp_path / "tenants.csv"
+        manifest.write_text("tenant,tag_prefix,vpc_cidr\nacme,,10.1.0.0/24\n")
+
+        assert list(read_manifest(manifest)) == [{"tenant": "acme", "vpc_cidr": "10.1.0.0/24"}]
+
+    @pytest.mark.parametrize(
+        "row",
+        [
+            {"tenant": "acme", "region": "eu-west-1"},
+            {"tenant": "../acme"},
+            {"tenant": "acme", "tag_prefix": "../acme"},
+            {"tenant": "acme_eu"},
+            {"tenant": "acme", "tag_prefix": "acme_eu"},
+            {"tenant": "a" * 25},
+            {"tenant": "acme", "tag_prefix": "internal"},
+            {},
+        ],
+    )
+    def test_rejects_invalid_rows(self, tmp_path, row):
+        manifest = write_manifest(tmp_path / "tenants.jsonl", [row])
+
+        with pytest.raises(ManifestError):
+            list(read_manifest(manifest))
+
+
+class TestFanOut:
+    def test_synthesizes_every_tenant_stack(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        manifest = write_manifest(
+            tmp_path / "tenants.jsonl",
+            [
+                {"tenant": "acme", "vpc_cidr": "10.1.0.0/24", "ecr_repo_name": "acme-repo"},
+                {"tenant": "globex", "tag_prefix": "gx"},
+            ],
+        )
+
+        summary = fan_out(manifest, jobs=2)
+
+        assert (summary.tenants, summary.written, summary.failures) == (2, 6, [])
+        vpc = (tmp_path / "dist" / "acme" / "acme-vpc.yaml").read_text()
+        assert "CidrBlock: 10.1.0.0/24" in vpc
+        assert "Name: AcmeVPC" in vpc
+        app = (tmp_path / "dist" / "globex" / "gx-app.yaml").read_text()
+        assert "!ImportValue 'GxVPC'" in app
+        assert "Value: gx-alb" in app
+
+    def test_tenants_get_their_own_account_wide_names(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        manifest = write_manifest(
+            tmp_path / "tenants.jsonl",
+            [{"tenant": "acme"}, {"tenant": "globex", "tag_prefix": "Gx"}],
+        )
+
+        fan_out(manifest, stack_names=["ecr", "app"])
+
+        for tenant, prefix in (("acme", "acme"), ("globex", "Gx")):
+            app = (tmp_path / "dist" / tenant / f"{prefix}-app.yaml").read_text()
+            assert f"Name: {prefix}-alb\n" in app
+            assert f"Name: {prefix}-fargate\n" in app
+            assert f"- {prefix.lower()}-repository\n" in app
+            ecr = (tmp_path / "dist" / tenant / f"{prefix}-ecr.yaml").read_text()
+            assert f"RepositoryName: {prefix.lower()}-repository" in ecr
+
+    def test_tenant_values_are_released_after_their_stacks(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        manifest = write_manifest(tmp_path / "tenants.jsonl", [{"tenant": "acme"}])
+        interned = tag("ecr", "acme")
+
+        fan_out(manifest, stack_names=["ecr"])
+
+        # Rebuilt rather than kept in the intern table for the rest of the run
+        assert tag("ecr", "acme") is not interned
+        assert tag("ecr", "acme").to_dict() == interned.to_dict()
+
+    def test_overlapping_tenant_vpcs_fail_before_synthesis(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        manifest = write_manifest(
+            tmp_path / "tenants.jsonl",
+            [
+                {"tenant": "acme", "vpc_cidr": "10.1.0.0/16"},
+                {"tenant": "globex", "vpc_cidr": "10.1.8.0/24"},
+            ],
+        )
+
+        overlap = "Overlapping VPC CIDR blocks: 10.1.0.0/16 and 10.1.8.0/24"
+        with pytest.raises(ManifestError, match=overlap):
+            fan_out(manifest)
+        assert not (tmp_path / "dist").exists()
+
+    def test_parallel_matches_sequential(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        manifest = write_manifest(
+            tmp_path / "tenants.jsonl", [{"tenant": f"tenant{index}"} for index in range(5)]
+        )
+        fan_out(manifest, stack_names=["vpc", "app"])
+        sequential = {
+            path: path.read_text() for path in sorted((tmp_path / "dist").rglob("*.yaml"))
+        }
+
+        shutil.rmtree(tmp_path / "dist")
+
+        summary = fan_out(manifest, stack_names=["vpc", "app"], jobs=3)
+
+        assert (summary.tenants, summary.written, summary.unchanged) == (5, 10, 0)
+        assert {path: path.read_text() for path in sequential} == sequential
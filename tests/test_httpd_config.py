@@ -0,0 +1,63 @@
+from pathlib import Path
+
+import pytest
+
+from constants import ALB_IDLE_TIMEOUT, HTTPD_CONFIG
+from httpd_config import mpm_settings, render_config, validate_image_task_size, write_config
+
+REPO_ROOT = Path(__file__).parent.parent
+
+
+class TestMpmSettings:
+    @pytest.mark.parametrize(
+        "cpu, memory, server_limit",
+        [("256", "512", 2), ("1024", "2048", 4), ("1024", "8192", 4), ("4096", "8192", 16)],
+    )
+    def test_workers_fit_the_task_size(self, cpu, memory, server_limit):
+        mpm = mpm_settings(cpu, memory)
+
+        assert mpm.server_limit == server_limit
+        assert mpm.max_request_workers == server_limit * 25
+
+    def test_unsupported_task_sizes_are_rejected(self):
+        with pytest.raises(ValueError, match="Unsupported Fargate memory"):
+            mpm_settings("256", "4096")
+
+
+class TestImageTaskSize:
+    def test_tasks_sized_like_the_image_are_accepted(self):
+        validate_image_task_size("256", "512")
+        validate_image_task_size("256", "2048")
+
+    @pytest.mark.parametrize("cpu, memory", [("1024", "3072"), ("4096", "8192")])
+    def test_tasks_calling_for_other_workers_are_rejected(self, cpu, memory):
+        with pytest.raises(ValueError, match="sized for a 256 CPU / 512 MiB task"):
+            validate_image_task_size(cpu, memory)
+
+    def test_load_balancers_idling_up_to_the_image_keep_alive_are_accepted(self):
+        validate_image_task_size("256", "512", idle_timeout=ALB_IDLE_TIMEOUT)
+        validate_image_task_size("256", "512", idle_timeout=30)
+
+    def test_load_balancers_idling_past_the_image_keep_alive_are_rejected(self):
+        with pytest.raises(ValueError, match="keeps idle connections for 65s"):
+            validate_image_task_size("256", "512", idle_timeout=ALB_IDLE_TIMEOUT + 1)
+
+
+class TestRenderConfig:
+    def test_config_tunes_the_task(self):
+        config = render_config("256", "512")
+
+        assert "MaxRequestWorkers 50\n" in config
+        assert f"KeepAliveTimeout {ALB_IDLE_TIMEOUT + 5}\n" in config
+        assert '<Location "/healthcheck">\n    Header set Cache-Control "no-store"' in config
+        assert "AddOutputFilterByType DEFLATE text/html" in config
+
+    def test_image_config_is_up_to_date(self):
+        # Regenerate it with `make httpd-config`
+        assert (REPO_ROOT / HTTPD_CONFIG).read_text() == render_config()
+
+    def test_unchanged_config_is_not_rewritten(self, tmp_path):
+        path = tmp_path / "httpd" / "tuning.conf"
+
+        assert write_config(path, render_config())
+        assert not write_config(path, render_config())
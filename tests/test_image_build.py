@@ -0,0 +1,140 @@
+import pytest
+
+from image_build import ImageBuildError, ImageCache, build_image, image_tag
+from stacks.application_stack import AppStack
+from tests.registry_stand_in import RegistryStandIn
+
+REGISTRY = "localhost:5000"
+REPOSITORIES = [f"{REGISTRY}/tenant{index}-repository" for index in range(3)]
+
+
+@pytest.fixture
+def dockerfile(tmp_path):
+    (tmp_path / "artifacts").mkdir()
+    (tmp_path / "artifacts" / "index.html").write_text("<h1>Hello</h1>\n")
+    path = tmp_path / "Dockerfile"
+    path.write_text("FROM httpd:2.4\nCOPY ./artifacts/ /usr/local/apache2/htdocs/\n")
+    return path
+
+
+@pytest.fixture
+def registry():
+    return RegistryStandIn()
+
+
+def build(dockerfile, registry, repositories=REPOSITORIES):
+    cache = ImageCache(folder=dockerfile.parent / ".synth-cache")
+    return build_image(repositories, dockerfile=dockerfile, runner=registry, cache=cache)
+
+
+class TestBuildImage:
+    def test_builds_once_and_pushes_to_every_repository(self, dockerfile, registry):
+        image = build(dockerfile, registry)
+
+        assert image.built
+        assert len(registry.commands_named("build")) == 1
+        assert sorted(image.pushed) == REPOSITORIES
+        assert {registry.registry[f"{repository}:{image.tag}"] for repository in REPOSITORIES} == {
+            image.digest
+        }
+        assert image.image(REPOSITORIES[0]) == f"{REPOSITORIES[0]}@{image.digest}"
+
+    def test_skips_unchanged_artifacts(self, dockerfile, registry):
+        first = build(dockerfile, registry)
+        registry.commands.clear()
+
+        second = build(dockerfile, registry)
+
+        assert (second.tag, second.digest, second.built) == (first.tag, first.digest, False)
+        assert registry.commands_named("build") == registry.commands_named("push") == []
+
+    def test_repushes_cached_images_missing_from_the_registry(self, dockerfile, registry):
+        first = build(dockerfile, registry)
+        del registry.registry[f"{REPOSITORIES[1]}:{first.tag}"]
+        registry.commands.clear()
+
+        second = build(dockerfile, registry)
+
+        assert second.pushed == [REPOSITORIES[1]]
+        assert registry.registry[f"{REPOSITORIES[1]}:{first.tag}"] == first.digest
+
+    def test_repushes_tags_pushed_over_since_cached(self, dockerfile, registry):
+        first = build(dockerfile, registry)
+        registry.registry[f"{REPOSITORIES[0]}:{first.tag}"] = "sha256:" + "00" * 32
+
+        second = build(dockerfile, registry)
+
+        assert second.pushed == [REPOSITORIES[0]]
+        assert registry.registry[f"{REPOSITORIES[0]}:{first.tag}"] == first.digest
+
+    def test_skips_images_already_in_the_registry(self, dockerfile, registry):
+        first = build(dockerfile, registry)
+        (dockerfile.parent / ".synth-cache" / "images.json").unlink()
+        registry.commands.clear()
+
+        second = build(dockerfile, registry)
+
+        assert second.digest == first.digest
+        assert registry.commands_named("build") == registry.commands_named("push") == []
+
+    def test_pushes_only_to_new_repositories(self, dockerfile, registry):
+        build(dockerfile, registry, REPOSITORIES[:2])
+        registry.commands.clear()
+
+        image = build(dockerfile, registry)
+
+        assert image.pushed == REPOSITORIES[2:]
+        assert registry.commands_named("push") == [["push", f"{REPOSITORIES[2]}:{image.tag}"]]
+
+    def test_changed_artifacts_get_a_new_tag(self, dockerfile, registry):
+        first = build(dockerfile, registry)
+        (dockerfile.parent / "artifacts" / "index.html").write_text("<h1>Bye</h1>\n")
+
+        second = build(dockerfile, registry)
+
+        assert second.built
+        assert second.tag != first.tag
+        assert second.digest != first.digest
+
+    def test_tag_ignores_files_outside_the_context_paths(self, dockerfile):
+        tag = image_tag(dockerfile)
+        (dockerfile.parent / "README.md").write_text("notes\n")
+
+        assert image_tag(dockerfile) == tag
+
+    def test_failed_push_is_reported(self, dockerfile, registry):
+        def failing_push(args):
+            if args[0] == "push":
+                raise ImageBuildError("denied: not authorized")
+            return registry(args)
+
+        with pytest.raises(ImageBuildError, match="denied"):
+            build(dockerfile, failing_push)
+
+    def test_failed_inspection_is_reported(self, dockerfile, registry):
+        def unauthorized(args):
+            if args[0] == "buildx":
+                raise ImageBuildError("ERROR: unexpected status: 401 Unauthorized")
+            return registry(args)
+
+        with pytest.raises(ImageBuildError, match="401 Unauthorized"):
+            build(dockerfile, unauthorized)
+        assert registry.commands_named("build") == []
+
+
+class TestImagePinning:
+    def image(self, **kwargs):
+        stack = AppStack("tropo-app", "app", **kwargs)
+        stack.stack_definition()
+        container = stack.template.to_dict()["Resources"]["TropoServer"]["Properties"][
+            "ContainerDefinitions"
+        ][0]
+        return container["Image"]["Fn::Join"][1]
+
+    def test_task_definition_is_pinned_to_the_digest(self):
+        digest = "sha256:" + "ab" * 32
+
+        assert self.image(image_digest=digest)[-3:] == ["tropo-repository", "@", digest]
+
+    def test_task_definition_uses_the_tag_without_digest(self):
+        assert self.image()[-3:] == ["tropo-repository", ":", "latest"]
@@ -0,0 +1,64 @@
+import json
+
+from instrumentation import Tracer, phase, start_tracing, stop_tracing
+from stacks.application_stack import AppStack
+
+
+class TestTracer:
+    def test_records_stack_phases(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        tracer = Tracer()
+        start_tracing(tracer)
+        try:
+            AppStack(template_name="test-app", template_description="app").export()
+        finally:
+            stop_tracing()
+
+        events = {(event["cat"], event["name"]): event for event in tracer.events}
+        assert set(events) == {
+            ("construct", "AlbConstruct"),
+            ("construct", "FargateConstruct"),
+            ("construct", "ScalingConstruct"),
+            ("definition", "test-app"),
+            ("serialization", "test-app.yaml"),
+            ("write", "test-app.yaml"),
+            ("stack", "test-app"),
+        }
+        assert events[("construct", "AlbConstruct")]["args"]["resources"] == 4
+        assert events[("stack", "test-app")]["args"]["resources"] == 16
+        stack = events[("stack", "test-app")]
+        for event in tracer.events:
+            assert event["peak_bytes"] <= stack["peak_bytes"]
+            assert stack["ts_us"] <= event["ts_us"]
+
+    def test_outer_phase_peak_includes_inner_phases(self):
+        tracer = Tracer()
+        start_tracing(tracer)
+        try:
+            with phase("outer", "test"):
+                with phase("inner", "test"):
+                    buffer = bytearray(1024 * 1024)
+                del buffer
+        finally:
+            stop_tracing()
+
+        inner, outer = tracer.events
+        assert inner["peak_bytes"] >= 1024 * 1024
+        assert outer["peak_bytes"] >= inner["peak_bytes"]
+
+    def test_phases_are_not_recorded_without_tracer(self):
+        with phase("ignored", "test") as args:
+            args["value"] = 1
+
+        assert stop_tracing() is None
+
+    def test_writes_chrome_trace(self, tmp_path):
+        tracer = Tracer(trace_memory=False)
+        with tracer.phase("stack", "stack", resources=3):
+            pass
+
+        tracer.write_chrome_trace(tmp_path / "trace.json")
+
+        (event,) = json.loads((tmp_path / "trace.json").read_text())["traceEvents"]
+        assert event["ph"] == "X"
+        assert event["args"] == {"resources": 3}
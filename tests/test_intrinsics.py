@@ -0,0 +1,67 @@
+import pickle
+
+import pytest
+from troposphere import AWS_REGION, AWS_STACK_ID, GetAtt, Join, Ref, Tags, Template
+from troposphere.ec2 import Subnet, VPC
+
+from intrinsics import REGION, STACK_ID, intrinsic
+from utils import tag
+
+
+def vpc_template(helper):
+    template = Template()
+    vpc = template.add_resource(VPC("VPC", CidrBlock="10.0.0.0/24", Tags=helper(Tags, Name="vpc")))
+    template.add_resource(
+        Subnet(
+            "Subnet",
+            CidrBlock="10.0.0.0/28",
+            VpcId=helper(Ref, vpc),
+            AvailabilityZone=helper(Join, "", [helper(Ref, AWS_REGION), "a"]),
+            Tags=helper(Tags, Application=helper(Ref, AWS_STACK_ID), Name="subnet"),
+        )
+    )
+    return template
+
+
+class TestIntrinsic:
+    def test_identical_values_are_shared(self):
+        assert intrinsic(Join, "", [REGION, "a"]) is intrinsic(Join, "", [Ref(AWS_REGION), "a"])
+        assert intrinsic(Join, "", [REGION, "a"]) is not intrinsic(Join, "", [REGION, "b"])
+        assert tag("vpc") is tag("vpc")
+
+    def test_equal_scalars_of_other_types_are_not_shared(self):
+        values = [intrinsic(Join, "", [REGION, value]) for value in (True, 1, 1.0, "1")]
+
+        assert len({id(value) for value in values}) == 4
+        assert [value.to_dict()["Fn::Join"][1][1] for value in values] == [True, 1, 1.0, "1"]
+        assert [type(value.to_dict()["Fn::Join"][1][1]) for value in values] == [
+            bool, int, float, str
+        ]
+
+    @pytest.mark.parametrize(
+        "helper_class, args, kwargs",
+        [
+            (Ref, (AWS_REGION,), {}),
+            (Join, ("", [REGION, ".amazonaws.com"]), {}),
+            (GetAtt, ("ApplicationLB", "DNSName"), {}),
+            (Tags, (), {"Application": STACK_ID, "Name": "tropo-vpc"}),
+        ],
+    )
+    def test_renders_like_the_helper(self, helper_class, args, kwargs):
+        interned = intrinsic(helper_class, *args, **kwargs)
+
+        assert interned.to_dict() == helper_class(*args, **kwargs).to_dict()
+
+    def test_templates_are_byte_identical(self):
+        def fresh(helper_class, *args, **kwargs):
+            return helper_class(*args, **kwargs)
+
+        interned = vpc_template(intrinsic)
+
+        assert interned.to_yaml() == vpc_template(fresh).to_yaml()
+        assert interned.to_json() == vpc_template(fresh).to_json()
+
+    def test_interned_values_can_be_pickled(self):
+        value = pickle.loads(pickle.dumps(tag("vpc")))
+
+        assert value.to_dict() == tag("vpc").to_dict()
@@ -0,0 +1,59 @@
+import pytest
+
+from scheduler import (
+    DanglingImportError,
+    DependencyCycleError,
+    deploy_levels,
+    stack_dependencies,
+)
+
+
+def template(exports=(), imports=()):
+    return {
+        "Outputs": {
+            name: {"Value": "x", "Export": {"Name": name}} for name in exports
+        },
+        "Resources": {
+            f"Resource{index}": {"Properties": {"VpcId": {"Fn::ImportValue": name}}}
+            for index, name in enumerate(imports)
+        },
+    }
+
+
+class TestScheduler:
+    def test_levels_follow_imports(self):
+        dependencies = stack_dependencies(
+            {
+                "app": template(imports=["Vpc", "Repo"]),
+                "vpc": template(exports=["Vpc"]),
+                "ecr": template(exports=["Repo"], imports=["Vpc"]),
+                "dns": template(),
+            }
+        )
+
+        assert dependencies["app"] == {"vpc", "ecr"}
+        assert deploy_levels(dependencies) == [["dns", "vpc"], ["ecr"], ["app"]]
+
+    def test_dangling_import_fails(self):
+        with pytest.raises(DanglingImportError) as error:
+            stack_dependencies({"app": template(imports=["Missing"])})
+
+        assert error.value.dangling == {"app": ["Missing"]}
+
+    def test_cycle_fails(self):
+        with pytest.raises(DependencyCycleError) as error:
+            deploy_levels({"a": {"b"}, "b": {"a"}, "c": set()})
+
+        assert error.value.stacks == ["a", "b"]
+
+    def test_partial_plan_ignores_imports_from_unselected_stacks(self):
+        dependencies = stack_dependencies(
+            {
+                "app": template(imports=["Vpc", "Repo"]),
+                "ecr": template(exports=["Repo"]),
+            },
+            check_imports=False,
+        )
+
+        assert dependencies == {"app": {"ecr"}, "ecr": set()}
+        assert deploy_levels(dependencies) == [["ecr"], ["app"]]
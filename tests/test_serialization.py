@@ -0,0 +1,72 @@
+import io
+import json
+
+import pytest
+from troposphere import Output, Ref, Template
+from troposphere.ec2 import SecurityGroup
+
+from serialization import render, template_writer, write_yaml
+from stacks.ecr_stack import EcrStack
+from stacks.registry import build_stacks
+
+
+def streamed(template):
+    stream = io.StringIO()
+    write_yaml(template, stream)
+    return stream.getvalue()
+
+
+class TestWriteYaml:
+    @pytest.mark.parametrize("stack", build_stacks(), ids=lambda stack: stack.template_name)
+    def test_matches_to_yaml_for_stacks(self, stack):
+        stack.stack_definition()
+
+        assert streamed(stack.template) == stack.template.to_yaml()
+
+    def test_matches_to_yaml_for_multiline_and_unicode_values(self):
+        template = Template(Description="first line\nsecond line")
+        group = template.add_resource(
+            SecurityGroup("Group", GroupDescription="größer\nthan\n\"quoted\"")
+        )
+        template.add_output(Output("GroupId", Value=Ref(group)))
+
+        assert streamed(template) == template.to_yaml()
+
+    def test_matches_to_yaml_for_empty_template(self):
+        assert streamed(Template()) == Template().to_yaml()
+
+
+class TestWriteJson:
+    @pytest.mark.parametrize("stack", build_stacks(), ids=lambda stack: stack.template_name)
+    def test_matches_to_json_for_stacks(self, stack):
+        stack.stack_definition()
+
+        assert render(stack.template, "json") == stack.template.to_json()
+        assert render(stack.template, "json-min") == json.dumps(
+            stack.template.to_dict(), sort_keys=True, separators=(",", ":")
+        )
+
+    def test_matches_to_json_for_multiline_and_unicode_values(self):
+        template = Template(Description="first line\nsecond line")
+        group = template.add_resource(
+            SecurityGroup("Group", GroupDescription="größer\nthan\n\"quoted\"")
+        )
+        template.add_output(Output("GroupId", Value=Ref(group)))
+
+        assert render(template, "json") == template.to_json()
+
+    def test_matches_to_json_for_empty_template(self):
+        assert render(Template(), "json") == Template().to_json()
+
+    def test_unknown_format_is_rejected(self):
+        with pytest.raises(ValueError, match="Unknown output format 'toml'"):
+            template_writer("toml")
+
+    def test_export_writes_json_file(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        stack = EcrStack("tropo-ecr", "ecr", output_format="json-min")
+
+        stack.export()
+
+        exported = tmp_path / "dist" / "tropo-ecr.json"
+        assert json.loads(exported.read_text()) == stack.template.to_dict()
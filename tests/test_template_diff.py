@@ -0,0 +1,109 @@
+import pytest
+
+from stacks.application_stack import AppStack
+from stacks.ecr_stack import EcrStack
+from stacks.vpc_stack import VpcStack
+from template_diff import ANY_PROPERTY, REPLACEMENT_PROPERTIES, diff_template, diff_templates
+
+
+def template(**resources):
+    return {"Resources": resources}
+
+
+def task_definition(cpu):
+    return {"Type": "AWS::ECS::TaskDefinition", "Properties": {"Cpu": cpu}}
+
+
+def target_group(port="80", interval="120"):
+    return {
+        "Type": "AWS::ElasticLoadBalancingV2::TargetGroup",
+        "Properties": {"Port": port, "HealthCheckIntervalSeconds": interval},
+    }
+
+
+class TestTemplateDiff:
+    def test_reports_added_removed_and_modified_resources(self):
+        diff = diff_templates(
+            template(FargateTargetGroup=target_group(), OldGroup=target_group()),
+            template(FargateTargetGroup=target_group(interval="60"), NewGroup=target_group()),
+        )
+
+        assert diff.added == ["NewGroup"]
+        assert diff.removed == ["OldGroup"]
+        assert [change.logical_id for change in diff.modified] == ["FargateTargetGroup"]
+        assert diff.modified[0].properties == ["HealthCheckIntervalSeconds"]
+        assert diff.replacements == []
+
+    def test_flags_replacements(self):
+        diff = diff_templates(
+            template(FargateTargetGroup=target_group(), TaskDefinition=task_definition("256")),
+            template(
+                FargateTargetGroup=target_group(port="8080"),
+                TaskDefinition=task_definition("512"),
+            ),
+        )
+
+        assert diff.replacements == ["FargateTargetGroup", "TaskDefinition"]
+
+    def test_synthesized_template_matches_its_artifact(self, monkeypatch, tmp_path):
+        monkeypatch.chdir(tmp_path)
+        result = VpcStack("tropo-vpc", "vpc").export()
+
+        stack = VpcStack("tropo-vpc", "vpc")
+        stack.stack_definition()
+        assert not diff_template(stack.template, result.path).changed
+
+        stack = VpcStack("tropo-vpc", "vpc", vpc_cidr="10.1.0.0/24")
+        stack.stack_definition()
+        diff = diff_template(stack.template, result.path)
+        assert "VPC" in diff.replacements and "LoadBalancer1" in diff.replacements
+        assert not diff.added and not diff.removed and not diff.outputs
+
+
+def change(resource_type, key):
+    return diff_templates(
+        template(Resource={"Type": resource_type, "Properties": {key: "a"}}),
+        template(Resource={"Type": resource_type, "Properties": {key: "b"}}),
+    ).modified[0]
+
+
+class TestReplacementProperties:
+    def test_covers_every_emitted_resource_type(self, monkeypatch):
+        monkeypatch.setattr("stacks.vpc_stack.AZ_PRIVATE_NUMBER", 2)
+        emitted = set()
+        for stack in (
+            VpcStack("tropo-vpc", "vpc"),
+            EcrStack("tropo-ecr", "ecr"),
+            AppStack("tropo-app", "app"),
+        ):
+            stack.stack_definition()
+            emitted |= {
+                resource["Type"] for resource in stack.template.to_dict()["Resources"].values()
+            }
+
+        assert emitted - REPLACEMENT_PROPERTIES.keys() == set()
+
+    @pytest.mark.parametrize("resource_type", sorted(REPLACEMENT_PROPERTIES))
+    def test_replacing_properties_replace_the_resource(self, resource_type):
+        replacing = REPLACEMENT_PROPERTIES[resource_type]
+        if replacing is ANY_PROPERTY:
+            assert change(resource_type, "Cpu").replacement
+            return
+        for key in replacing:
+            assert change(resource_type, key).replacement, key
+        assert change(resource_type, "Tags").replacement is False
+
+    def test_listener_moving_to_another_load_balancer_is_replaced(self):
+        listener = change("AWS::ElasticLoadBalancingV2::Listener", "LoadBalancerArn")
+
+        assert (listener.replacement, listener.action) == (True, "replace")
+
+    def test_unknown_types_may_be_replaced(self):
+        diff = diff_templates(
+            template(Resource={"Type": "AWS::SQS::Queue", "Properties": {"QueueName": "a"}}),
+            template(Resource={"Type": "AWS::SQS::Queue", "Properties": {"QueueName": "b"}}),
+        )
+
+        assert diff.modified[0].action == "may replace"
+        assert diff.possible_replacements == ["Resource"] and diff.replacements == []
+        assert "1 may be replaced" in diff.summary()
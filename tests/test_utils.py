@@ -0,0 +1,25 @@
+import os
+
+from utils import export_cf_template_to_file
+
+
+class TestExportCfTemplateToFile:
+    def test_writes_new_and_changed_content(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+
+        created = export_cf_template_to_file("stack.yaml", "first")
+        changed = export_cf_template_to_file("stack.yaml", "second")
+
+        assert created.written and changed.written
+        assert changed.path.read_text() == "second"
+        assert [path.name for path in (tmp_path / "dist").iterdir()] == ["stack.yaml"]
+
+    def test_skips_unchanged_content(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        result = export_cf_template_to_file("stack.yaml", "content")
+        os.utime(result.path, (1, 1))
+
+        unchanged = export_cf_template_to_file("stack.yaml", "content")
+
+        assert not unchanged.written
+        assert unchanged.path.stat().st_mtime == 1
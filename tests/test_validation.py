@@ -0,0 +1,82 @@
+import pytest
+
+from stacks.registry import build_stacks
+from validation import (
+    MAX_RESOURCES,
+    TemplateValidationError,
+    cross_stack_issues,
+    validate_files,
+    validate_template,
+)
+
+
+def messages(report):
+    return [f"{issue.location}: {issue.message}" for issue in report.issues]
+
+
+class TestValidateTemplate:
+    def test_flags_dangling_references(self):
+        report = validate_template(
+            "app",
+            {
+                "Resources": {
+                    "Listener": {
+                        "Type": "AWS::ElasticLoadBalancingV2::Listener",
+                        "DependsOn": "ApplicationLB",
+                        "Properties": {
+                            "LoadBalancerArn": {"Ref": "ApplicationLb"},
+                            "Certificates": [{"Fn::GetAtt": ["Certificate", "Arn"]}],
+                            "Port": {"Fn::Sub": "${AWS::Region}-${Port}"},
+                        },
+                    },
+                },
+                "Outputs": {"Region": {"Value": {"Ref": "AWS::Region"}}},
+            },
+        )
+
+        assert messages(report) == [
+            "Resources.Listener: DependsOn unknown resource 'ApplicationLB'",
+            "Resources.Listener: Ref to unknown 'ApplicationLb'",
+            "Resources.Listener: GetAtt of unknown resource 'Certificate'",
+            "Resources.Listener: Sub of unknown 'Port'",
+        ]
+
+    def test_checks_limits(self):
+        resources = {f"Topic{index}": {"Type": "AWS::SNS::Topic"} for index in range(501)}
+        report = validate_template("big", {"Resources": resources}, size=2 * 1024 * 1024)
+
+        assert messages(report) == [
+            "Template: 2097152 bytes, over 1048576",
+            f"Resources: 501, over {MAX_RESOURCES}",
+        ]
+
+    def test_checks_imports_across_stacks(self):
+        def template(export=None, imported=None):
+            resource = {"Type": "AWS::SNS::Topic"}
+            if imported:
+                resource["Properties"] = {"TopicName": {"Fn::ImportValue": imported}}
+            outputs = {"Out": {"Value": "x", "Export": {"Name": export}}} if export else {}
+            return {"Resources": {"Topic": resource}, "Outputs": outputs}
+
+        reports = [
+            validate_template("vpc", template(export="TropoVPC")),
+            validate_template("ecr", template(export="TropoVPC", imported="TropoVpc")),
+        ]
+
+        assert [str(issue) for issue in cross_stack_issues(reports)] == [
+            "ecr Outputs: export 'TropoVPC' already exported by vpc",
+            "ecr Resources.Topic: ImportValue of unknown 'TropoVpc'",
+        ]
+
+
+class TestValidateFiles:
+    @pytest.mark.parametrize("jobs", [1, 3])
+    def test_synthesized_stacks_are_valid(self, monkeypatch, tmp_path, jobs):
+        monkeypatch.chdir(tmp_path)
+        paths = [stack.export().path for stack in build_stacks()]
+
+        validate_files(paths, jobs=jobs)
+
+        with pytest.raises(TemplateValidationError, match="ImportValue of unknown 'TropoVPC'"):
+            validate_files([path for path in paths if "vpc" not in path.name])
+        validate_files([path for path in paths if "vpc" not in path.name], check_imports=False)
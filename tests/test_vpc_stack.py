@@ -0,0 +1,61 @@
+import pytest
+
+from stacks.vpc_stack import VpcStack
+
+
+@pytest.fixture(autouse=True)
+def two_private_azs(monkeypatch):
+    monkeypatch.setattr("stacks.vpc_stack.AZ_PRIVATE_NUMBER", 2)
+
+
+def vpc_template():
+    stack = VpcStack(template_name="tropo-vpc", template_description="vpc")
+    stack.stack_definition()
+    return stack.template.to_dict()
+
+
+class TestPrivateSubnets:
+    def test_each_az_egresses_through_its_own_nat_gateway(self):
+        resources = vpc_template()["Resources"]
+
+        for subnet, nat_gateway, route_table, public_subnet in [
+            ("FargateSubnet", "NatGateway", "PrivateRouteTable", "LoadBalancer1"),
+            ("FargateSubnet2", "NatGateway2", "PrivateRouteTable2", "LoadBalancer2"),
+        ]:
+            zone = resources[subnet]["Properties"]["AvailabilityZone"]
+            assert resources[public_subnet]["Properties"]["AvailabilityZone"] == zone
+            assert resources[nat_gateway]["Properties"]["SubnetId"] == {"Ref": public_subnet}
+            routes = [
+                resource["Properties"]
+                for resource in resources.values()
+                if resource["Type"] == "AWS::EC2::Route"
+                and resource["Properties"]["RouteTableId"] == {"Ref": route_table}
+            ]
+            assert routes == [
+                {
+                    "DestinationCidrBlock": "0.0.0.0/0",
+                    "NatGatewayId": {"Ref": nat_gateway},
+                    "RouteTableId": {"Ref": route_table},
+                }
+            ]
+
+    def test_exports_every_private_subnet(self):
+        outputs = vpc_template()["Outputs"]
+
+        assert outputs["TropoPrivateSubnet"]["Value"] == {"Ref": "FargateSubnet"}
+        assert outputs["TropoPrivateSubnet2"]["Value"] == {"Ref": "FargateSubnet2"}
+
+
+class TestEndpoints:
+    def test_private_subnets_reach_aws_services_without_nat(self):
+        resources = vpc_template()["Resources"]
+
+        s3 = resources["S3Endpoint"]["Properties"]
+        assert s3["VpcEndpointType"] == "Gateway"
+        assert s3["RouteTableIds"] == [{"Ref": "PrivateRouteTable"}, {"Ref": "PrivateRouteTable2"}]
+        for title in ("EcrApiEndpoint", "EcrDkrEndpoint", "LogsEndpoint"):
+            endpoint = resources[title]["Properties"]
+            assert endpoint["VpcEndpointType"] == "Interface"
+            assert endpoint["PrivateDnsEnabled"] is True
+            assert endpoint["SubnetIds"] == [{"Ref": "FargateSubnet"}, {"Ref": "FargateSubnet2"}]
+            assert endpoint["SecurityGroupIds"] == [{"Ref": "EndpointSecurityGroup"}]
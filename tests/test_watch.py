@@ -0,0 +1,124 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+from watch import DependencyGraph, Watcher, affected_stacks
+
+SRC_CORE = Path(__file__).parent.parent / "src" / "troposphere_playground"
+STACKS = ["vpc", "ecr", "app"]
+
+
+class TestDependencyGraph:
+    def test_construct_change_only_affects_its_stacks(self):
+        graph = DependencyGraph()
+
+        assert affected_stacks(graph, {"constructs.fargate_construct"}, STACKS) == ["app"]
+        assert affected_stacks(graph, {"stacks.vpc_stack"}, STACKS) == ["vpc"]
+        assert affected_stacks(graph, {"constants"}, STACKS) == STACKS
+
+    def test_reload_order_puts_dependencies_first(self):
+        graph = DependencyGraph()
+
+        order = graph.reload_order(graph.dependents({"utils"}))
+
+        assert order.index("utils") < order.index("constructs.alb_construct")
+        assert order.index("constructs.alb_construct") < order.index("stacks.application_stack")
+        assert order.index("stacks.base_stack") < order.index("stacks.vpc_stack")
+
+
+class TestWatcher:
+    def test_poll_reports_changed_files(self, tmp_path):
+        module = tmp_path / "module.py"
+        module.write_text("VALUE = 1\n")
+        watcher = Watcher(package_dir=tmp_path)
+        assert watcher.poll() == set()
+
+        os.utime(module, ns=(1, 1))
+        created = tmp_path / "created.py"
+        created.write_text("")
+
+        assert watcher.poll() == {module, created}
+        assert watcher.poll() == set()
+
+    def test_source_change_resynthesizes_the_dependent_stack(self, tmp_path):
+        # A copy of the package, so that its modules can be edited and reloaded
+        package_dir = tmp_path / "package"
+        shutil.copytree(SRC_CORE, package_dir, ignore=shutil.ignore_patterns("__pycache__"))
+        code = """
+import json, sys
+from pathlib import Path
+from cache import SynthesisCache
+from watch import Watcher
+watcher = Watcher(["vpc", "ecr"], output_format="json", cache=SynthesisCache())
+watcher.synthesize(watcher.stack_names)
+vpc_mtime = Path("dist/tropo-vpc.json").stat().st_mtime_ns
+source = Path(sys.argv[1])
+source.write_text(source.read_text().replace("The docker repository URL", "Changed"))
+print(json.dumps({
+    "resynthesized": watcher.resynthesize(watcher.poll()),
+    "vpc_unchanged": Path("dist/tropo-vpc.json").stat().st_mtime_ns == vpc_mtime,
+    "description": json.loads(Path("dist/tropo-ecr.json").read_text())["Outputs"][
+        "RepositoryURL"]["Description"],
+}))
+"""
+        process = subprocess.run(
+            [sys.executable, "-c", code, str(package_dir / "stacks" / "ecr_stack.py")],
+            cwd=tmp_path,
+            env={**os.environ, "PYTHONPATH": str(package_dir)},
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+
+        assert json.loads(process.stdout) == {
+            "resynthesized": ["ecr"],
+            "vpc_unchanged": True,
+            "description": "Changed",
+        }
+
+    def test_validation_changes_are_reloaded_and_entry_points_ask_for_a_restart(self, tmp_path):
+        package_dir = tmp_path / "package"
+        shutil.copytree(SRC_CORE, package_dir, ignore=shutil.ignore_patterns("__pycache__"))
+        code = """
+import json, logging, sys
+from pathlib import Path
+from watch import Watcher
+warnings = []
+logging.warning = warnings.append
+watcher = Watcher(["ecr"])
+watcher.synthesize(watcher.stack_names)
+validation = Path(sys.argv[1], "validation.py")
+original = validation.read_text()
+validation.write_text(original.replace(
+    "    if issues:\\n", "    issues.append('edited')\\n    if issues:\\n"))
+try:
+    watcher.resynthesize(watcher.poll())
+    validation_reloaded = False
+except Exception as e:
+    validation_reloaded = "edited" in str(e)
+validation.write_text(original)
+main = Path(sys.argv[1], "main.py")
+main.write_text(main.read_text() + "\\n")
+print(json.dumps({
+    "validation_reloaded": validation_reloaded,
+    "resynthesized": watcher.resynthesize(watcher.poll()),
+    "warnings": warnings,
+}))
+"""
+        process = subprocess.run(
+            [sys.executable, "-c", code, str(package_dir)],
+            cwd=tmp_path,
+            env={**os.environ, "PYTHONPATH": str(package_dir)},
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+
+        assert json.loads(process.stdout) == {
+            "validation_reloaded": True,
+            "resynthesized": [],
+            "warnings": ["Restart the watch to pick up the changes to main"],
+        }